@@ -0,0 +1,35 @@
+"""
+Deterministic synthetic test videos generated offline with ffmpeg's testsrc2 source
+"""
+import os
+import subprocess
+from typing import Optional
+from imageio_ffmpeg import get_ffmpeg_exe
+
+
+CODEC_SETTINGS = {
+    'h264': ("libx264", ".mp4", ["-preset", "ultrafast"]),
+    'hevc': ("libx265", ".mp4", ["-preset", "ultrafast", "-x265-params", "log-level=error"]),
+    'vp9': ("libvpx-vp9", ".webm", ["-deadline", "realtime", "-cpu-used", "8"]),
+}
+
+
+def synthetic_video(directory: str, width: int, height: int, duration: float, fps: float = 25,
+                    codec: str = "h264", gop: Optional[int] = None) -> str:
+    """Path of a testsrc2 clip with these parameters, generating it on first use"""
+    encoder, ext, options = CODEC_SETTINGS[codec]
+    gop = gop or int(fps * 2)
+    name = f"testsrc_{width}x{height}_{duration:g}s_{fps:g}fps_{codec}_gop{gop}{ext}"
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return path
+    
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, "partial_" + name)
+    cmd = [get_ffmpeg_exe(), "-v", "error", "-y",
+           "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps:g}:duration={duration:g}",
+           "-c:v", encoder, "-g", str(gop), "-pix_fmt", "yuv420p", "-threads", "1"] + options + [
+           "-fflags", "+bitexact", "-flags:v", "+bitexact", "-map_metadata", "-1", tmp_path]
+    subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+    os.replace(tmp_path, path)
+    return path
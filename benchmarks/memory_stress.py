@@ -0,0 +1,122 @@
+"""
+Stress previews and cuts on a long synthetic video and check that memory growth stays within the budget
+
+Usage: python -m benchmarks.memory_stress [--duration 600] [--size 1920x1080] [--fps 5] [--budget-mb 128]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.fixtures import synthetic_video
+from src.core.memory_budget import current_rss, format_megabytes, get_memory_budget
+from src.core.reader_pool import get_reader_pool
+from src.core.task_manager import get_task_manager
+from src.core.thumbnail_manager import ThumbnailManager
+from src.core.video_processor import MODE_EXACT, MODE_SHARPEST, VideoProcessor
+
+
+class RssSampler:
+    """Polls the resident set size on a background thread and keeps the maximum"""
+    
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = current_rss() or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss() or 0)
+    
+    def reset(self):
+        self.peak = current_rss() or 0
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_cut(video: str, output: str, duration: float, mode: str, sample_step: int = 1) -> int:
+    errors = []
+    saved = [0]
+    task = VideoProcessor().cut_video_to_images(
+        video, output, duration, 0.0,
+        lambda *args: None, lambda count, directory: saved.__setitem__(0, count), errors.append,
+        mode=mode, sample_step=sample_step
+    )
+    task.wait()
+    if errors:
+        raise RuntimeError(errors[0])
+    return saved[0]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=600, help="synthetic video length in seconds")
+    parser.add_argument("--size", default="1920x1080")
+    parser.add_argument("--fps", type=float, default=5)
+    parser.add_argument("--budget-mb", type=float, default=128)
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "smv_benchmark_fixtures"),
+                        help="directory where generated videos are cached")
+    args = parser.parse_args(argv)
+    
+    if current_rss() is None:
+        print("RSS cannot be measured on this platform", file=sys.stderr)
+        return 2
+    width, _, height = args.size.lower().partition("x")
+    print(f"Generating {args.size} {args.duration:g}s test video...")
+    video = synthetic_video(args.fixtures, int(width), int(height), args.duration, args.fps)
+    budget = get_memory_budget()
+    budget.limit_bytes = int(args.budget_mb * 1024 * 1024)
+    thumbnails = ThumbnailManager(photo_factory=lambda image: image)
+    
+    def run_previews(out: str):
+        for i in range(10):
+            offset = args.duration * i / 12
+            thumbnails.generate_preview_thumbnails(video, args.duration / 20, offset, lambda previews: None).wait()
+    
+    phases = [
+        ("previews", run_previews),
+        ("thumbnail", lambda out: thumbnails.extract_local_thumbnail(video, lambda thumb: None)),
+        ("exact cut", lambda out: run_cut(video, out, args.duration / 200, MODE_EXACT)),
+        ("sharpest cut", lambda out: run_cut(video, out, args.duration / 50, MODE_SHARPEST, sample_step=2)),
+    ]
+    
+    ok = True
+    gc.collect()
+    baseline = current_rss()
+    print(f"Baseline RSS {format_megabytes(baseline)}, budget {format_megabytes(budget.limit_bytes)}")
+    with RssSampler() as sampler, tempfile.TemporaryDirectory() as out:
+        for name, phase in phases:
+            gc.collect()
+            start_rss = current_rss()
+            sampler.reset()
+            started = time.perf_counter()
+            phase(out)
+            elapsed = time.perf_counter() - started
+            growth = sampler.peak - start_rss
+            within = growth <= budget.limit_bytes
+            ok = ok and within
+            print(f"{name:<14}{elapsed:>8.2f}s  peak growth {format_megabytes(growth):>10}  "
+                  f"{'ok' if within else 'OVER BUDGET'}")
+    print(f"RSS after all phases {format_megabytes(current_rss())} ({format_megabytes(current_rss() - baseline)} "
+          f"above baseline)")
+    print(budget.report())
+    if budget.peak_reserved > budget.limit_bytes:
+        print(f"Reserved buffers peaked at {format_megabytes(budget.peak_reserved)}, OVER BUDGET")
+        ok = False
+    
+    get_task_manager().shutdown()
+    get_reader_pool().close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
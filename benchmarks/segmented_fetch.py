@@ -0,0 +1,121 @@
+"""
+Benchmark the segmented fetcher against a local throttled HTTP server
+
+Usage: python -m benchmarks.segmented_fetch [--size-mb 32] [--rate-kb 2048] [--connections 8]
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.core.segmented_fetcher import SegmentedFetcher
+
+
+class ThrottledFileHandler(BaseHTTPRequestHandler):
+    """Serves one in-memory payload with Range support and a per-connection rate cap"""
+    
+    payload = b""
+    rate = 1024 * 1024
+    fail_after = None
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        size = len(self.payload)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("ETag", '"benchmark"')
+        self.end_headers()
+        
+        chunk = 64 * 1024
+        sent = 0
+        position = start
+        started = time.monotonic()
+        try:
+            while position <= end:
+                if self.fail_after is not None and sent >= self.fail_after:
+                    return
+                data = self.payload[position:min(position + chunk, end + 1)]
+                self.wfile.write(data)
+                position += len(data)
+                sent += len(data)
+                expected = sent / self.rate
+                elapsed = time.monotonic() - started
+                if expected > elapsed:
+                    time.sleep(expected - elapsed)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(payload: bytes, rate: int):
+    ThrottledFileHandler.payload = payload
+    ThrottledFileHandler.rate = rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledFileHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_fetch(url: str, dest: str, connections: int) -> float:
+    fetcher = SegmentedFetcher(max_connections=connections, min_segment_size=256 * 1024)
+    started = time.monotonic()
+    fetcher.fetch(url, dest)
+    return time.monotonic() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--rate-kb", type=int, default=2048, help="per-connection cap in KB/s")
+    parser.add_argument("--connections", type=int, default=8)
+    args = parser.parse_args(argv)
+    
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    digest = hashlib.sha256(payload).hexdigest()
+    server = start_server(payload, args.rate_kb * 1024)
+    url = f"http://127.0.0.1:{server.server_address[1]}/video.mp4"
+    
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for connections in (1, args.connections):
+            dest = os.path.join(tmp, f"single_{connections}.mp4")
+            elapsed = run_fetch(url, dest, connections)
+            with open(dest, "rb") as f:
+                valid = hashlib.sha256(f.read()).hexdigest() == digest
+            ok = ok and valid
+            print(f"{connections:>2} connection(s): {elapsed:6.2f}s, "
+                  f"{args.size_mb / elapsed:6.2f} MB/s, checksum {'ok' if valid else 'MISMATCH'}")
+        
+        dest = os.path.join(tmp, "resumed.mp4")
+        ThrottledFileHandler.fail_after = len(payload) // (args.connections * 2)
+        try:
+            run_fetch(url, dest, args.connections)
+        except Exception as e:
+            print(f"Interrupted first attempt as expected: {type(e).__name__}")
+        ThrottledFileHandler.fail_after = None
+        elapsed = run_fetch(url, dest, args.connections)
+        with open(dest, "rb") as f:
+            valid = hashlib.sha256(f.read()).hexdigest() == digest
+        ok = ok and valid
+        print(f"Resumed download: {elapsed:6.2f}s, checksum {'ok' if valid else 'MISMATCH'}")
+    
+    server.shutdown()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
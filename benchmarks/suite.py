@@ -0,0 +1,273 @@
+"""
+Reproducible benchmark suite over deterministic synthetic videos, with JSON results and run-to-run comparison
+
+Usage: python -m benchmarks.suite run [--preset quick|full] [--repeat 3] [--output results.json]
+       python -m benchmarks.suite compare baseline.json candidate.json [--threshold 0.10]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from imageio_ffmpeg import get_ffmpeg_exe, get_ffmpeg_version
+from benchmarks.fixtures import synthetic_video
+from benchmarks.memory_stress import RssSampler
+from src.core.memory_budget import current_rss, format_megabytes
+from src.core.reader_pool import ReaderPool
+from src.core.task_manager import get_task_manager
+from src.core.thumbnail_manager import ThumbnailManager
+from src.core.video_processor import MODE_EXACT, MODE_SHARPEST, VideoProcessor
+
+
+SCHEMA_VERSION = 1
+
+# (width, height, duration, fps, codec, gop)
+FIXTURE_PRESETS = {
+    'quick': [
+        (320, 240, 20, 25, "h264", 50),
+        (1280, 720, 20, 30, "h264", 60),
+    ],
+    'full': [
+        (320, 240, 20, 25, "h264", 50),
+        (1280, 720, 20, 30, "h264", 60),
+        (1280, 720, 60, 30, "h264", 300),
+        (1280, 720, 20, 30, "hevc", 60),
+        (1280, 720, 20, 30, "vp9", 60),
+        (1920, 1080, 60, 30, "h264", 60),
+    ],
+}
+
+# Metric name -> True when larger values are better
+METRICS = {
+    'seconds': False,
+    'time_to_first_frame': False,
+    'frames_per_second': True,
+    'peak_rss_growth': False,
+}
+
+
+def fixture_name(width: int, height: int, duration: float, fps: float, codec: str, gop: int) -> str:
+    return f"{width}x{height}_{duration:g}s_{fps:g}fps_{codec}_gop{gop}"
+
+
+class Measurement:
+    """Wall time, time to first frame and peak RSS growth of one benchmark call"""
+    
+    def __init__(self, sampler: RssSampler):
+        self.sampler = sampler
+        self.frames = 0
+        self.first_frame: Optional[float] = None
+        self.seconds = 0.0
+        self.peak_rss_growth = 0
+        self._started = 0.0
+        self._start_rss = 0
+    
+    def frame_done(self, count: int = 1):
+        """Record that count more frames have been produced"""
+        if count > 0 and self.first_frame is None:
+            self.first_frame = time.perf_counter() - self._started
+        self.frames += count
+    
+    def __enter__(self) -> "Measurement":
+        gc.collect()
+        self._start_rss = current_rss() or 0
+        self.sampler.reset()
+        self._started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._started
+        self.peak_rss_growth = max(0, self.sampler.peak - self._start_rss)
+    
+    def as_dict(self) -> dict:
+        return {
+            'seconds': self.seconds,
+            'frames': self.frames,
+            'frames_per_second': self.frames / self.seconds if self.frames and self.seconds else None,
+            'time_to_first_frame': self.first_frame,
+            'peak_rss_growth': self.peak_rss_growth,
+        }
+
+
+def bench_video_info(video: str, out: str, measurement: Measurement):
+    processor = VideoProcessor(reader_pool=ReaderPool(idle_timeout=0))
+    duration, error = processor.get_video_info(video)
+    if error:
+        raise RuntimeError(error)
+
+
+def bench_previews(video: str, out: str, measurement: Measurement, duration: float):
+    pool = ReaderPool(idle_timeout=0)
+    thumbnails = ThumbnailManager(reader_pool=pool, photo_factory=lambda image: image)
+    previews = []
+    
+    def on_progress(progress: float):
+        if progress > 0:
+            measurement.frame_done()
+    
+    try:
+        thumbnails.generate_preview_thumbnails(video, duration / 8, duration / 16, previews.extend,
+                                               progress_callback=on_progress).wait()
+    finally:
+        pool.close()
+    if not previews:
+        raise RuntimeError("No previews were generated")
+
+
+def bench_cut(video: str, out: str, measurement: Measurement, duration: float, mode: str, sample_step: int = 1):
+    pool = ReaderPool(idle_timeout=0)
+    errors = []
+    saved = [0]
+    
+    def on_progress(progress: float, message: str, current: int, total: int):
+        measurement.frame_done(current - saved[0])
+        saved[0] = max(saved[0], current)
+    
+    try:
+        VideoProcessor(reader_pool=pool).cut_video_to_images(
+            video, out, duration, 0.0, on_progress, lambda count, directory: None, errors.append,
+            mode=mode, sample_step=sample_step
+        ).wait()
+    finally:
+        pool.close()
+    if errors:
+        raise RuntimeError(errors[0])
+
+
+def benchmarks_for(duration: float) -> List[Tuple[str, Callable[[str, str, Measurement], None]]]:
+    """Benchmarks run against every fixture, scaled to its duration"""
+    return [
+        ("video_info", bench_video_info),
+        ("previews", lambda video, out, m: bench_previews(video, out, m, duration)),
+        ("cut_exact", lambda video, out, m: bench_cut(video, out, m, duration / 40, MODE_EXACT)),
+        ("cut_sharpest", lambda video, out, m: bench_cut(video, out, m, duration / 10, MODE_SHARPEST, 2)),
+    ]
+
+
+def summarize(runs: List[dict]) -> dict:
+    """Median of every metric across repeats (None when no repeat produced it)"""
+    summary = {'frames': runs[0]['frames'], 'repeats': len(runs)}
+    for metric in METRICS:
+        values = sorted(run[metric] for run in runs if run[metric] is not None)
+        summary[metric] = values[len(values) // 2] if values else None
+    return summary
+
+
+def run_suite(preset: str, repeat: int, fixtures_dir: str,
+              only: Optional[List[str]] = None, log: Callable[[str], None] = print) -> dict:
+    """Run every benchmark on every fixture of the preset and return the JSON-ready results"""
+    results = []
+    with RssSampler() as sampler:
+        for width, height, duration, fps, codec, gop in FIXTURE_PRESETS[preset]:
+            name = fixture_name(width, height, duration, fps, codec, gop)
+            log(f"Preparing {name}...")
+            video = synthetic_video(fixtures_dir, width, height, duration, fps, codec, gop)
+            for benchmark, run in benchmarks_for(duration):
+                if only and benchmark not in only:
+                    continue
+                runs = []
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory() as out:
+                        with Measurement(sampler) as measurement:
+                            run(video, out, measurement)
+                    runs.append(measurement.as_dict())
+                summary = summarize(runs)
+                results.append({'fixture': name, 'benchmark': benchmark, **summary})
+                log(format_result(results[-1]))
+    return {
+        'schema': SCHEMA_VERSION,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'preset': preset,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'ffmpeg': get_ffmpeg_version(),
+            'ffmpeg_exe': os.path.basename(get_ffmpeg_exe()),
+        },
+        'results': results,
+    }
+
+
+def format_result(result: dict) -> str:
+    fps = result['frames_per_second']
+    first = result['time_to_first_frame']
+    return (f"  {result['benchmark']:<13}{result['seconds']:>8.3f}s"
+            f"  {'' if fps is None else f'{fps:.1f} fps':>11}"
+            f"  {'' if first is None else f'first {first * 1000:.0f} ms':>15}"
+            f"  peak +{format_megabytes(result['peak_rss_growth'])}")
+
+
+def compare_results(baseline: dict, candidate: dict, threshold: float) -> List[dict]:
+    """Every metric that got worse by more than threshold (relative) between two runs of the same fixture/benchmark"""
+    before: Dict[Tuple[str, str], dict] = {(r['fixture'], r['benchmark']): r for r in baseline['results']}
+    regressions = []
+    for result in candidate['results']:
+        old = before.get((result['fixture'], result['benchmark']))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old_value, new_value = old.get(metric), result.get(metric)
+            if not old_value or new_value is None:
+                continue
+            change = (new_value - old_value) / old_value
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({'fixture': result['fixture'], 'benchmark': result['benchmark'],
+                                    'metric': metric, 'baseline': old_value, 'candidate': new_value,
+                                    'change': change})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = commands.add_parser("run", help="run the suite and write JSON results")
+    run_parser.add_argument("--preset", choices=sorted(FIXTURE_PRESETS), default="quick")
+    run_parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the median is reported")
+    run_parser.add_argument("--only", nargs="+", metavar="BENCHMARK", help="run only these benchmarks")
+    run_parser.add_argument("--output", "-o", help="write results to this JSON file")
+    run_parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "smv_benchmark_fixtures"),
+                            help="directory where generated videos are cached")
+    
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative change treated as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+    
+    if args.command == "compare":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.candidate, "r", encoding="utf-8") as f:
+            candidate = json.load(f)
+        if baseline.get('environment') != candidate.get('environment'):
+            print("Warning: results come from different environments", file=sys.stderr)
+        regressions = compare_results(baseline, candidate, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['fixture']} {r['benchmark']} {r['metric']}: "
+                  f"{r['baseline']:.4g} -> {r['candidate']:.4g} ({r['change']:+.1%})")
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1 if regressions else 0
+    
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    try:
+        results = run_suite(args.preset, args.repeat, args.fixtures, args.only)
+    finally:
+        get_task_manager().shutdown()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,10 @@ if __name__ == "__main__":
     import sys
     
     
+    if len(sys.argv) > 1:
+        from src.cli import main
+        sys.exit(main(sys.argv[1:]))
+    
     if getattr(sys, 'frozen', False):
         print("Starting SMV-Extracter...")
         print("Please wait while the application loads...")
@@ -4,10 +4,19 @@ Main application class that coordinates all components
 import os
 from tkinter import messagebox
 from .ui.main_window import MainWindow
+from .core.autotuner import autotune_enabled, create_autotuner
 from .core.downloader import YouTubeDownloader
+from .core.encoders import create_encoder, format_calibration
+from .core.download_manager import DownloadManager, JOB_COMPLETED
+from .core.media_store import MediaStore
+from .core.memory_budget import get_memory_budget
+from .core.reader_pool import get_reader_pool
+from .core.segment_exporter import SegmentExporter
+from .core.task_manager import TASK_CANCELLED, get_task_manager
 from .core.video_processor import VideoProcessor
 from .core.thumbnail_manager import ThumbnailManager
-from .utils.helpers import format_duration, format_file_size, get_file_info
+from .utils.helpers import format_duration, format_file_size, format_speed, get_file_info
+from .utils.stall_detector import StallDetector, stall_threshold_from_env
 
 
 class SMVExtractorApp:
@@ -15,13 +24,27 @@ class SMVExtractorApp:
     
     def __init__(self):
         self.window = MainWindow()
+        self.task_manager = get_task_manager()
         self.downloader = YouTubeDownloader()
+        self.media_store = MediaStore()
+        # previews, thumbnails and cuts all probe through the shared pool, which then reuses stored probes
+        get_reader_pool().media_store = self.media_store
+        self.download_manager = DownloadManager(self.downloader, media_store=self.media_store)
         self.video_processor = VideoProcessor()
+        self.segment_exporter = SegmentExporter(self.task_manager)
         self.thumbnail_manager = ThumbnailManager()
+        threshold = stall_threshold_from_env()
+        self.stall_detector = StallDetector(self.window.get_root(), threshold) if threshold else None
+        self.autotuner = None
+        if autotune_enabled():
+            self.autotuner = create_autotuner(self.video_processor, self.download_manager,
+                                              log=self.window.logging_section.log_message)
         
         
         self.current_video_path = None
+        self.current_video_name = None
         self.current_video_duration = 0
+        self.cut_task = None
         
         self.setup_callbacks()
     
@@ -32,7 +55,8 @@ class SMVExtractorApp:
             url_change=self.on_url_change,
             download=self.on_download_video,
             cancel=self.on_cancel_download,
-            file_select=self.on_file_selected
+            file_select=self.on_file_selected,
+            cancel_job=self.on_cancel_download_job
         )
         
         
@@ -41,8 +65,13 @@ class SMVExtractorApp:
             offset_change=self.on_offset_change,
             refresh_preview=self.on_refresh_preview,
             choose_directory=self.on_directory_chosen,
-            cut_video=self.on_cut_video
+            cut_video=self.on_cut_video,
+            pause_cut=self.on_pause_cut,
+            stop_cut=self.on_stop_cut,
+            calibrate=self.on_calibrate_encoders
         )
+        
+        self.window.get_root().protocol("WM_DELETE_WINDOW", self.on_close)
     
     def on_url_change(self, url: str):
         """Handle URL entry changes"""
@@ -92,49 +121,81 @@ class SMVExtractorApp:
         
         self.window.input_section.set_download_state(True)
         self.window.logging_section.clear_log()
+        self.window.logging_section.reset_progress()
+        self.download_manager.clear_finished()
+        
+        def on_jobs(jobs):
+            self.thumbnail_manager.prefetch_thumbnails(job.thumbnail_url for job in jobs)
+            self._refresh_download_jobs()
+            if not self.download_manager.get_active_jobs():
+                self.window.input_section.set_download_state(False)
         
-        def on_progress(d):
+        def on_progress(job, d):
             if d['status'] == 'downloading':
-                downloaded = d.get('downloaded_bytes', 0)
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                speed = d.get('speed', 0)
-                eta = d.get('eta', 0)
-                
+                total = job.total_bytes
                 if total > 0:
-                    percent = (downloaded / total) * 100
-                    speed_str = f"{speed/1024/1024:.1f} MB/s" if speed else "Unknown"
+                    percent = (job.downloaded_bytes / total) * 100
+                    speed_str = format_speed(job.speed) if job.speed else "Unknown"
+                    eta = d.get('eta', 0)
                     eta_str = f"{eta}s" if eta else "Unknown"
                     
-                    self.window.logging_section.update_progress(percent)
+                    self.window.logging_section.update_progress(self.download_manager.get_overall_progress())
                     self.window.logging_section.log_message(
-                        f"Downloading: {percent:.1f}% - Speed: {speed_str} - ETA: {eta_str}"
+                        f"[{job.job_id}] {job.title}: {percent:.1f}% - Speed: {speed_str} - ETA: {eta_str}"
                     )
             elif d['status'] == 'finished':
                 filename = d.get('filename', 'Unknown')
                 self.window.logging_section.log_message(f"Download completed: {filename}")
-                
-                self.window.get_root().after(100, lambda: self.load_video_file(filename))
         
-        def on_completion(filename):
-            self.window.logging_section.update_progress(100)
-            self.window.input_section.set_download_state(False)
+        def on_completion(job):
+            if job.filename and job.state == JOB_COMPLETED:
+                self.window.get_root().after(100, lambda: self.load_video_file(job.filename))
+            self._on_download_job_done()
         
-        def on_error(error):
+        def on_error(job, error):
             self.window.logging_section.log_message(f"ERROR: {error}")
-            self.window.logging_section.reset_progress()
-            self.window.input_section.set_download_state(False)
+            self._on_download_job_done()
         
         def on_log(message):
             self.window.logging_section.log_message(message)
         
-        self.downloader.download_video(url, on_progress, on_completion, on_error, on_log)
+        self.download_manager.enqueue_url(url, on_jobs, on_progress, on_completion, on_error, on_log)
+        self._poll_download_throughput()
+    
+    def _on_download_job_done(self):
+        """Update progress and buttons after a download job finishes"""
+        self.window.logging_section.update_progress(self.download_manager.get_overall_progress())
+        self._refresh_download_jobs()
+        if self.download_manager.is_idle():
+            self.window.input_section.set_download_state(False)
+    
+    def _refresh_download_jobs(self):
+        """Show the unfinished downloads in the list the user cancels single items from"""
+        self.window.input_section.set_download_jobs(
+            [(job.job_id, job.title) for job in self.download_manager.get_active_jobs()])
+    
+    def _poll_download_throughput(self):
+        """Refresh the aggregate throughput display while downloads are active"""
+        active = len(self.download_manager.get_active_jobs())
+        rate = self.download_manager.get_throughput()
+        self.window.logging_section.set_throughput(f"{format_speed(rate)} ({active} active)")
+        self._refresh_download_jobs()
+        if active or rate > 0:
+            self.window.get_root().after(1000, self._poll_download_throughput)
     
     def on_cancel_download(self):
         """Handle download cancellation"""
-        self.downloader.cancel_download()
+        self.download_manager.cancel_all()
         self.window.input_section.set_download_state(False)
         self.window.logging_section.log_message("Download cancelled by user")
         self.window.logging_section.reset_progress()
+        self._refresh_download_jobs()
+    
+    def on_cancel_download_job(self, job_id: int):
+        """Cancel only the download selected in the list; the rest keep going"""
+        self.download_manager.cancel_job(job_id)
+        self.window.logging_section.log_message(f"[{job_id}] Download cancelled by user")
+        self._on_download_job_done()
     
     def on_file_selected(self, file_path: str):
         """Handle local file selection"""
@@ -146,10 +207,12 @@ class SMVExtractorApp:
             self.window.logging_section.log_message(f"Loading video file: {os.path.basename(file_path)}")
             
             
-            file_name, file_ext, file_size = get_file_info(file_path)
+            _, file_ext, file_size = get_file_info(file_path)
             size_str = format_file_size(file_size)
             
             
+            # the store only deduplicates and caches the probe; cuts keep the path and name the user sees
+            video_name = self.media_store.resolve_local(file_path).name_stem(file_path)
             duration, error = self.video_processor.get_video_info(file_path)
             if error:
                 self.window.logging_section.log_message(f"Warning: Could not read video metadata - {error}")
@@ -159,11 +222,12 @@ class SMVExtractorApp:
                 self.window.logging_section.log_message(f"Video loaded: {duration_str} duration, {size_str}")
             
             
-            self.window.details_section.update_details(file_name, duration_str, size_str, file_ext)
+            self.window.details_section.update_details(video_name + file_ext, duration_str, size_str, file_ext)
             self.window.details_section.set_placeholder_text("Local Video\nSelected")
             
             
             self.current_video_path = file_path
+            self.current_video_name = video_name
             self.current_video_duration = duration
             
             
@@ -178,16 +242,10 @@ class SMVExtractorApp:
             
             
             if duration > 0:
-                from moviepy import VideoFileClip
-                try:
-                    clip = VideoFileClip(file_path)
-                    self.thumbnail_manager.extract_local_thumbnail(
-                        clip, 
-                        lambda thumb: self.window.details_section.set_thumbnail(thumb)
-                    )
-                    clip.close()
-                except:
-                    pass
+                self.thumbnail_manager.extract_local_thumbnail(
+                    file_path,
+                    lambda thumb: self.window.details_section.set_thumbnail(thumb)
+                )
             
         except Exception as e:
             self.window.logging_section.log_message(f"ERROR: Could not read video file - {e}")
@@ -223,9 +281,14 @@ class SMVExtractorApp:
         
         self.thumbnail_manager.generate_preview_thumbnails(
             self.current_video_path, duration, offset, on_previews_ready,
-            progress_callback=on_progress_update
+            progress_callback=on_progress_update, profile_callback=self.on_profile
         )
     
+    def on_profile(self, profiler):
+        """Log a job's per-stage timing summary (only called when profiling is enabled)"""
+        for line in profiler.summary():
+            self.window.logging_section.log_message(line)
+    
     def on_directory_chosen(self, directory: str):
         """Handle export directory selection"""
         self.update_cut_button_state()
@@ -239,30 +302,96 @@ class SMVExtractorApp:
         
         duration = self.window.slicer_section.get_duration()
         offset = self.window.slicer_section.get_offset()
+        output_kind = self.window.slicer_section.get_output_kind()
         
         self.window.slicer_section.set_cut_button_text("Cutting...")
         self.window.slicer_section.update_cut_button_state(False)
+        self.window.slicer_section.set_cut_running(True)
         self.window.logging_section.reset_progress()
         
         def on_progress(progress_percent, message, current, total):
             self.window.logging_section.update_progress(progress_percent)
             self.window.logging_section.log_message(message)
         
+        what = "image cuts" if output_kind == "images" else "video segments"
+        result = {}
+        
         def on_completion(cuts_made, export_directory):
-            self.window.logging_section.log_message(f"✓ Successfully created {cuts_made} image cuts!")
-            self.window.logging_section.log_message(f"Files saved to: {export_directory}")
-            self.window.slicer_section.set_cut_button_text("Cut")
-            self.window.slicer_section.update_cut_button_state(True)
+            result['saved'] = (cuts_made, export_directory)
         
         def on_error(error):
-            self.window.logging_section.log_message(f"ERROR: Failed to cut video - {error}")
+            result['error'] = error
+        
+        def on_finish(task):
+            # runs for every outcome, including a cut cancelled before it started
+            cuts_made, export_directory = result.get('saved', (0, export_dir))
+            if task.state == TASK_CANCELLED:
+                self.window.logging_section.log_message(f"Cut stopped: kept {cuts_made} {what} in {export_directory}")
+            elif 'error' in result or task.error:
+                self.window.logging_section.log_message(
+                    f"ERROR: Failed to cut video - {result.get('error') or task.error}")
+            else:
+                self.window.logging_section.log_message(f"✓ Successfully created {cuts_made} {what}!")
+                self.window.logging_section.log_message(f"Files saved to: {export_directory}")
+                self.window.logging_section.log_message(get_memory_budget().report())
             self.window.slicer_section.set_cut_button_text("Cut")
             self.window.slicer_section.update_cut_button_state(True)
+            self.window.slicer_section.set_cut_running(False)
+        
+        if output_kind != "images":
+            self.cut_task = self.segment_exporter.export_segments(
+                self.current_video_path, export_dir, duration, offset,
+                on_progress, on_completion, on_error,
+                mode=output_kind, video_name=self.current_video_name
+            )
+            self.cut_task.add_done_callback(on_finish)
+            return
         
-        self.video_processor.cut_video_to_images(
+        self.cut_task = self.video_processor.cut_video_to_images(
             self.current_video_path, export_dir, duration, offset,
-            on_progress, on_completion, on_error
+            on_progress, on_completion, on_error,
+            mode=self.window.slicer_section.get_extraction_mode(),
+            sample_step=self.window.slicer_section.get_sample_step(),
+            encoder=create_encoder(self.window.slicer_section.get_output_format()),
+            profile_callback=self.on_profile, video_name=self.current_video_name
         )
+        self.cut_task.add_done_callback(on_finish)
+    
+    def on_pause_cut(self, paused: bool):
+        """Pause or resume the running cut job"""
+        if not self.cut_task:
+            return
+        if paused:
+            self.cut_task.pause()
+            self.window.logging_section.log_message("Cut paused")
+        else:
+            self.cut_task.resume()
+            self.window.logging_section.log_message("Cut resumed")
+    
+    def on_stop_cut(self):
+        """Cancel the running cut job"""
+        if self.cut_task:
+            self.cut_task.cancel()
+    
+    def on_calibrate_encoders(self):
+        """Compare encoder throughput and output size on frames of the current video"""
+        if not self.current_video_path:
+            self.window.logging_section.log_message("ERROR: Please select a video to calibrate on.")
+            self.window.slicer_section.reset_calibrate_button()
+            return
+        
+        self.window.logging_section.log_message("Calibrating image encoders...")
+        
+        def on_results(results):
+            for line in format_calibration(results):
+                self.window.logging_section.log_message(line)
+            self.window.slicer_section.reset_calibrate_button()
+        
+        def on_error(error):
+            self.window.logging_section.log_message(f"ERROR: Encoder calibration failed - {error}")
+            self.window.slicer_section.reset_calibrate_button()
+        
+        self.video_processor.calibrate_encoders(self.current_video_path, on_results, on_error)
     
     def update_cut_button_state(self):
         """Update cut button state based on current conditions"""
@@ -270,6 +399,21 @@ class SMVExtractorApp:
                   self.window.slicer_section.get_export_directory() is not None)
         self.window.slicer_section.update_cut_button_state(enabled)
     
+    def on_close(self):
+        """Cancel background work and close the window"""
+        if self.stall_detector:
+            # the session summary goes to the diagnostics log
+            self.stall_detector.stop()
+        if self.autotuner:
+            self.autotuner.stop()
+        self.task_manager.shutdown()
+        get_reader_pool().close()
+        self.window.get_root().destroy()
+    
     def run(self):
         """Start the application"""
+        if self.stall_detector:
+            self.stall_detector.start()
+        if self.autotuner:
+            self.autotuner.start()
         self.window.run()
@@ -0,0 +1,449 @@
+"""
+Command line interface for tasks that do not need the GUI
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+from .core.autotuner import create_autotuner
+from .core.distributed import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, Coordinator, LeaseQueue, Worker, run_worker
+from .core.encoders import ENCODERS, JpegEncoder, calibrate_encoders, compare_yuv420_path, create_encoder, format_calibration
+from .core.frame_index import FrameIndex, image_hash
+from .core.frame_reader import probe_video, sample_frames, supports_yuv420
+from .core.job_api import DEFAULT_HOST, DEFAULT_MAX_JOBS, DEFAULT_PORT, serve_jobs
+from .core.memory_budget import get_memory_budget
+from .core.reader_pool import get_reader_pool
+from .core.renditions import Rendition
+from .core.segment_exporter import SEGMENT_ACCURATE, SEGMENT_FAST, SegmentExporter
+from .core.sprite_sheets import DEFAULT_COLUMNS, DEFAULT_ROWS, DEFAULT_TILE_SIZE
+from .core.task_manager import get_task_manager
+from .core.timestamp_sources import CUE_END, CUE_MIDPOINT, CUE_START, load_timestamps
+from .core.video_processor import MODE_EXACT, MODE_SHARPEST, VideoProcessor
+from .core.watch_folder import DEFAULT_SETTLE_SECONDS, WatchDaemon, WatchedFolder, load_watch_config, run_daemon
+from .utils.profiling import PROFILE_CPROFILE, PROFILE_SAMPLE, PROFILE_STAGES
+
+
+def parse_option_value(value: str):
+    """Convert a key=value option string to int, float or bool where it looks like one"""
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_plan(spec: str) -> Tuple[float, float]:
+    """Parse 'DURATION:OFFSET' into a (duration, offset) pair"""
+    duration, _, offset = spec.partition(":")
+    try:
+        return float(duration), float(offset or 0.0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected DURATION:OFFSET, got '{spec}'")
+
+
+def parse_size(spec: str) -> Tuple[int, int]:
+    """Parse 'WIDTHxHEIGHT' into a pair of positive ints"""
+    width, _, height = spec.lower().partition("x")
+    try:
+        size = int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got '{spec}'")
+    if min(size) < 1:
+        raise argparse.ArgumentTypeError(f"Sizes must be positive, got '{spec}'")
+    return size
+
+
+def parse_rendition(spec: str, output_dir: str) -> Rendition:
+    """Parse 'name=web,format=webp,size=640x360,dir=web,quality=80' into a Rendition"""
+    options = {}
+    for part in spec.split(","):
+        key, _, value = part.partition("=")
+        if not value:
+            raise ValueError(f"Expected key=value in rendition spec, got '{part}'")
+        options[key.strip()] = value.strip()
+    
+    name = options.pop("name", "full")
+    directory = os.path.join(output_dir, options.pop("dir", ""))
+    format_name = options.pop("format", "jpeg")
+    max_size = None
+    if "size" in options:
+        width, _, height = options.pop("size").lower().partition("x")
+        max_size = (int(width), int(height or width))
+    encoder_options = {key: parse_option_value(value) for key, value in options.items()}
+    try:
+        encoder = create_encoder(format_name, **encoder_options)
+    except TypeError as e:
+        raise ValueError(f"Bad options for {format_name}: {e}")
+    return Rendition(name, os.path.normpath(directory), encoder, max_size)
+
+
+def run_calibrate(args: argparse.Namespace) -> int:
+    """Report encode throughput against output size for each encoder backend"""
+    frames = sample_frames(args.video, args.samples)
+    if not frames:
+        print("Could not decode any frames from the video", file=sys.stderr)
+        return 1
+    height, width = frames[0].shape[:2]
+    print(f"Calibrating on {len(frames)} frame(s) at {width}x{height}")
+    for line in format_calibration(calibrate_encoders(frames, min_time=args.min_time)):
+        print(line)
+    return 0
+
+
+def run_yuv_check(args: argparse.Namespace) -> int:
+    """Compare JPEG quality of the planar YUV fast path against the RGB path"""
+    info = probe_video(args.video)
+    if not supports_yuv420(info['width'], info['height']):
+        print(f"{info['width']}x{info['height']} has odd dimensions; extraction uses the RGB path")
+        return 0
+    encoder = JpegEncoder(quality=args.quality, yuv420_input=True)
+    rgb_frames = sample_frames(args.video, args.samples, info)
+    yuv_frames = sample_frames(args.video, args.samples, info, pix_fmt="yuv420p")
+    results = compare_yuv420_path(rgb_frames, yuv_frames, info['width'], info['height'], encoder)
+    if not results:
+        print("Could not decode any frames from the video", file=sys.stderr)
+        return 1
+    
+    print(f"{'Frame':<8}{'RGB PSNR':>10}{'YUV PSNR':>10}{'RGB size':>12}{'YUV size':>12}{'RGB ms':>9}{'YUV ms':>9}")
+    for i, result in enumerate(results):
+        print(f"{i + 1:<8}{result['rgb_psnr']:>10.2f}{result['yuv_psnr']:>10.2f}"
+              f"{result['rgb_bytes'] / 1024:>9.1f} KB{result['yuv_bytes'] / 1024:>9.1f} KB"
+              f"{result['rgb_time'] * 1000:>9.1f}{result['yuv_time'] * 1000:>9.1f}")
+    loss = sum(r['rgb_psnr'] - r['yuv_psnr'] for r in results) / len(results)
+    print(f"Mean PSNR difference (RGB - YUV): {loss:.2f} dB")
+    return 1 if loss > args.tolerance else 0
+
+
+def run_extract(args: argparse.Namespace) -> int:
+    """Extract frames from a video without the GUI"""
+    try:
+        renditions = [parse_rendition(spec, args.output) for spec in args.rendition or []]
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 2
+    encoder = create_encoder(args.format)
+    if args.memory_mb:
+        get_memory_budget().limit_bytes = int(args.memory_mb * 1024 * 1024)
+    frame_index = FrameIndex(args.index_db) if args.index or args.index_db else None
+    failed = []
+    autotuner = None
+    
+    def on_progress(progress_percent, message, current, total):
+        print(f"\r{message}", end="", flush=True)
+    
+    def on_completion(cuts_made, export_directory):
+        kind = 'segment' if args.segments else 'sprite sheet' if args.sprites else 'image'
+        print(f"\nCreated {cuts_made} {kind}(s) in {export_directory}")
+        print(get_memory_budget().report())
+    
+    def on_error(error):
+        failed.append(error)
+        print(f"\nERROR: {error}", file=sys.stderr)
+    
+    def on_profile(profiler):
+        print("\n".join(profiler.summary()))
+    
+    os.makedirs(args.output, exist_ok=True)
+    if args.segments:
+        task = SegmentExporter().export_segments(
+            args.video, args.output, args.duration, (args.offset or [0.0])[0],
+            on_progress, on_completion, on_error,
+            mode=args.segments
+        )
+    elif args.sprites:
+        task = VideoProcessor(profile_mode=args.profile).create_sprite_sheets(
+            args.video, args.output, args.duration, (args.offset or [0.0])[0],
+            on_progress, on_completion, on_error,
+            tile_size=args.tile, columns=args.grid[0], rows=args.grid[1], encoder=encoder
+        )
+    elif args.timestamps:
+        try:
+            entries = load_timestamps(args.timestamps, args.cue_point, args.time_column, args.label_column)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Could not read timestamps - {e}", file=sys.stderr)
+            return 2
+        task = VideoProcessor().extract_timestamps(
+            args.video, args.output, entries,
+            on_progress, on_completion, on_error,
+            encoder=encoder, renditions=renditions, frame_index=frame_index
+        )
+    else:
+        offsets = args.offset or [0.0]
+        processor = VideoProcessor(profile_mode=args.profile)
+        if args.autotune:
+            autotuner = create_autotuner(processor, log=lambda message: print(f"\n{message}"))
+            autotuner.start()
+        task = processor.cut_video_to_images(
+            args.video, args.output, args.duration, offsets[0],
+            on_progress, on_completion, on_error,
+            mode=args.mode, sample_step=args.sample_step,
+            encoder=encoder, renditions=renditions,
+            offsets=offsets, plans=args.plan, profile_callback=on_profile, frame_index=frame_index
+        )
+    try:
+        task.wait()
+    except KeyboardInterrupt:
+        task.cancel()
+        task.wait()
+    finally:
+        if autotuner:
+            autotuner.stop()
+        get_task_manager().shutdown()
+        get_reader_pool().close()
+        if frame_index is not None:
+            frame_index.close()
+    return 1 if failed else 0
+
+
+def run_index(args: argparse.Namespace) -> int:
+    """Add the frames of existing export directories or manifests to the similarity index"""
+    frame_index = FrameIndex(args.db)
+    try:
+        if args.prune:
+            print(f"Removed {frame_index.remove_missing()} entries whose files are gone")
+        for path in args.paths:
+            try:
+                added = frame_index.add_directory(path) if os.path.isdir(path) else frame_index.add_manifest(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"ERROR: Could not index {path} - {e}", file=sys.stderr)
+                return 2
+            print(f"Indexed {added} frame(s) from {path}")
+        print(f"{len(frame_index)} frame(s) in {frame_index.path}")
+    finally:
+        frame_index.close()
+    return 0
+
+
+def run_similar(args: argparse.Namespace) -> int:
+    """Print the indexed frames that look most like each query image"""
+    frame_index = FrameIndex(args.db)
+    try:
+        # load the hashes up front so the timings below cover only the lookup
+        len(frame_index)
+        for image in args.images:
+            try:
+                phash = image_hash(image)
+            except OSError as e:
+                print(f"ERROR: Could not read {image} - {e}", file=sys.stderr)
+                return 2
+            start = time.perf_counter()
+            matches = frame_index.nearest(phash, args.k, args.max_distance)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{image} ({phash:016x}): {len(matches)} match(es) in {elapsed:.1f} ms")
+            for match in matches:
+                print(f"  {match.distance:>2}  {match.timestamp:>9.3f}s  {match.video}  {match.path}")
+    finally:
+        frame_index.close()
+    return 0
+
+
+def run_watch(args: argparse.Namespace) -> int:
+    """Watch folders and extract frames from every finished video dropped into them"""
+    folders = []
+    if args.config:
+        try:
+            folders = load_watch_config(args.config)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Could not read watch config - {e}", file=sys.stderr)
+            return 2
+    if args.folders:
+        if not args.output:
+            print("ERROR: --output is required for folders given on the command line", file=sys.stderr)
+            return 2
+        preset = {'duration': args.duration, 'offsets': args.offset or [0.0], 'mode': args.mode,
+                  'sample_step': args.sample_step, 'format': args.format}
+        folders += [WatchedFolder(folder, os.path.join(args.output, os.path.basename(os.path.abspath(folder)))
+                                  if len(args.folders) > 1 else args.output, preset) for folder in args.folders]
+    if not folders:
+        print("ERROR: Give folders to watch or a --config file", file=sys.stderr)
+        return 2
+    missing = [folder.path for folder in folders if not os.path.isdir(folder.path)]
+    if missing:
+        print(f"ERROR: Not a directory: {', '.join(missing)}", file=sys.stderr)
+        return 2
+    
+    daemon = WatchDaemon(folders, state_path=args.state, settle_seconds=args.settle, workers=args.workers,
+                         force_polling=args.poll)
+    return run_daemon(daemon)
+
+
+def run_coordinate(args: argparse.Namespace) -> int:
+    """Split videos into timeline shards on a shared queue, then wait for workers and merge their manifests"""
+    queue = LeaseQueue(args.queue, lease_seconds=args.lease, max_attempts=args.attempts)
+    coordinator = Coordinator(queue)
+    job_ids = []
+    try:
+        for video in args.videos:
+            output = (os.path.join(args.output, os.path.splitext(os.path.basename(video))[0])
+                      if len(args.videos) > 1 else args.output)
+            job_ids.append(coordinator.submit(video, output, args.duration, args.offset or [0.0], args.mode,
+                                              args.sample_step, args.format, shards=args.shards))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not queue {video} - {e}", file=sys.stderr)
+        return 2
+    if args.no_wait:
+        return 0
+    try:
+        return 0 if coordinator.wait(job_ids) else 1
+    except KeyboardInterrupt:
+        print("Stopped waiting; queued shards stay on the queue for workers")
+        return 1
+    finally:
+        get_reader_pool().close()
+        queue.close()
+
+
+def run_worker_command(args: argparse.Namespace) -> int:
+    """Lease and extract shards from a shared queue"""
+    queue = LeaseQueue(args.queue, lease_seconds=args.lease, max_attempts=args.attempts)
+    return run_worker(Worker(queue, worker_id=args.id), exit_when_idle=args.exit_when_idle)
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    """Serve the local HTTP job API until interrupted"""
+    try:
+        return serve_jobs(args.host, args.port, args.max_jobs)
+    except OSError as e:
+        print(f"ERROR: Could not listen on {args.host}:{args.port} - {e}", file=sys.stderr)
+        return 2
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="SMV-Extracter", description="SMV Extractor command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    extract = subparsers.add_parser("extract", help="Extract frames from a video")
+    extract.add_argument("video", help="Video file to extract frames from")
+    extract.add_argument("output", help="Export directory")
+    extract.add_argument("--duration", type=float, default=2.0, help="Cut duration in seconds")
+    extract.add_argument("--offset", type=float, action="append",
+                         help="Start offset in seconds (repeat to sweep several offsets in one decode)")
+    extract.add_argument("--plan", type=parse_plan, action="append", metavar="DURATION:OFFSET",
+                         help="Extra (duration, offset) interval series; overrides --duration/--offset")
+    extract.add_argument("--timestamps", metavar="FILE",
+                         help="Extract frames at the times listed in an .srt, .vtt, .csv or .json file instead of intervals")
+    extract.add_argument("--cue-point", choices=[CUE_START, CUE_MIDPOINT, CUE_END], default=CUE_MIDPOINT,
+                         help="Which point of a subtitle cue to extract")
+    extract.add_argument("--time-column", help="CSV column / JSON key holding the time")
+    extract.add_argument("--label-column", help="CSV column / JSON key holding the label")
+    extract.add_argument("--segments", choices=[SEGMENT_FAST, SEGMENT_ACCURATE],
+                         help="Export duration-length video clips instead of images: 'fast' stream-copies "
+                              "from the nearest keyframe, 'accurate' re-encodes only the partial GOPs at each cut")
+    extract.add_argument("--sprites", action="store_true",
+                         help="Pack one tile per duration into sprite sheets with a WebVTT thumbnail track "
+                              "instead of writing individual images")
+    extract.add_argument("--tile", type=parse_size, default=DEFAULT_TILE_SIZE, metavar="WxH",
+                         help="Largest sprite tile size; frames keep their aspect ratio (default: 160x90)")
+    extract.add_argument("--grid", type=parse_size, default=(DEFAULT_COLUMNS, DEFAULT_ROWS), metavar="COLSxROWS",
+                         help="Tiles per sprite sheet (default: 10x10)")
+    extract.add_argument("--mode", choices=[MODE_EXACT, MODE_SHARPEST], default=MODE_EXACT,
+                         help="Frame selection mode")
+    extract.add_argument("--sample-step", type=int, default=1,
+                         help="Frames to advance between sharpness samples")
+    extract.add_argument("--format", choices=list(ENCODERS), default="jpeg",
+                         help="Image format when no renditions are given")
+    extract.add_argument("--rendition", action="append", metavar="SPEC",
+                         help="Output variant, e.g. name=web,format=webp,size=640x360,dir=web,quality=80 "
+                              "(repeatable; all renditions share one decode)")
+    extract.add_argument("--memory-mb", type=float,
+                         help="Memory budget for frame buffers in MB (default: $SMV_EXTRACTER_MEMORY_MB or 1024)")
+    extract.add_argument("--profile", choices=[PROFILE_STAGES, PROFILE_CPROFILE, PROFILE_SAMPLE],
+                         help="Time each extraction stage and print a summary; cprofile/sample also dump a profile "
+                              "(default: $SMV_EXTRACTER_PROFILE)")
+    extract.add_argument("--autotune", action="store_true",
+                         help="Start from this machine's tuned encode worker count and keep tuning during the run")
+    extract.add_argument("--index", action="store_true",
+                         help="Record a perceptual hash of every frame in the similarity index")
+    extract.add_argument("--index-db", metavar="FILE", help="Similarity index to record into (implies --index)")
+    extract.set_defaults(func=run_extract)
+    
+    watch = subparsers.add_parser("watch", help="Watch folders and extract frames from new videos")
+    watch.add_argument("folders", nargs="*", help="Folders to watch with the preset given by the options below")
+    watch.add_argument("--config", metavar="FILE",
+                       help='JSON file: {"folders": [{"path": ..., "output": ..., "preset": {"duration": 2, ...}}]}')
+    watch.add_argument("--output", help="Export directory for folders given on the command line")
+    watch.add_argument("--duration", type=float, default=2.0, help="Cut duration in seconds")
+    watch.add_argument("--offset", type=float, action="append", help="Start offset in seconds (repeatable)")
+    watch.add_argument("--mode", choices=[MODE_EXACT, MODE_SHARPEST], default=MODE_EXACT,
+                       help="Frame selection mode")
+    watch.add_argument("--sample-step", type=int, default=1, help="Frames to advance between sharpness samples")
+    watch.add_argument("--format", choices=list(ENCODERS), default="jpeg", help="Image format")
+    watch.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                       help="Seconds a file's size and mtime must stay unchanged before it is processed")
+    watch.add_argument("--workers", type=int, default=1, help="Videos extracted at the same time")
+    watch.add_argument("--poll", action="store_true", help="Poll the folders instead of using inotify")
+    watch.add_argument("--state", metavar="FILE", help="Processed-file state (default: in the app data directory)")
+    watch.set_defaults(func=run_watch)
+    
+    coordinate = subparsers.add_parser("coordinate", help="Queue videos as shards for distributed workers")
+    coordinate.add_argument("queue", help="Queue database (SQLite) on a mount every worker can reach")
+    coordinate.add_argument("videos", nargs="+", help="Videos to extract; paths must be valid on the workers too")
+    coordinate.add_argument("--output", required=True, help="Export directory (one subdirectory per video if several)")
+    coordinate.add_argument("--duration", type=float, default=2.0, help="Cut duration in seconds")
+    coordinate.add_argument("--offset", type=float, action="append", help="Start offset in seconds (repeatable)")
+    coordinate.add_argument("--mode", choices=[MODE_EXACT, MODE_SHARPEST], default=MODE_EXACT,
+                            help="Exact timestamps, or the sharpest frame of each interval")
+    coordinate.add_argument("--sample-step", type=int, default=1, help="Frames to advance between sharpness samples")
+    coordinate.add_argument("--format", choices=list(ENCODERS), default="jpeg", help="Image format")
+    coordinate.add_argument("--shards", type=int, default=4, help="Timeline shards per video")
+    coordinate.add_argument("--no-wait", action="store_true", help="Queue the shards and exit without merging")
+    
+    worker = subparsers.add_parser("worker", help="Extract shards leased from a shared queue")
+    worker.add_argument("queue", help="Queue database shared with the coordinator")
+    worker.add_argument("--id", help="Worker name in the queue (default: host-pid-random)")
+    worker.add_argument("--exit-when-idle", action="store_true", help="Exit once no shard is left to lease")
+    for parser_ in (coordinate, worker):
+        parser_.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                             help="Seconds a shard stays leased without a heartbeat before it is retried")
+        parser_.add_argument("--attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                             help="Leases a shard gets before it is marked failed")
+    coordinate.set_defaults(func=run_coordinate)
+    worker.set_defaults(func=run_worker_command)
+    
+    serve = subparsers.add_parser("serve", help="Run a local HTTP API for submitting and monitoring jobs")
+    serve.add_argument("--host", default=DEFAULT_HOST, help="Address to bind (default: localhost only)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    serve.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS,
+                       help="Jobs run at the same time; the rest wait in order")
+    serve.set_defaults(func=run_serve)
+    
+    index = subparsers.add_parser("index", help="Add extracted frames to the similarity index")
+    index.add_argument("paths", nargs="*", help="Export directories or *_manifest.json files to index")
+    index.add_argument("--prune", action="store_true", help="First drop entries whose frame files no longer exist")
+    
+    similar = subparsers.add_parser("similar", help="Find indexed frames that look like an image")
+    similar.add_argument("images", nargs="+", help="Query images")
+    similar.add_argument("-k", type=int, default=10, help="Matches to return per image")
+    similar.add_argument("--max-distance", type=int,
+                         help="Largest Hamming distance (of 64 bits) to accept; up to 11 uses the multi-index lookup")
+    for parser_ in (index, similar):
+        parser_.add_argument("--db", metavar="FILE", help="Index database (default: in the app data directory)")
+    index.set_defaults(func=run_index)
+    similar.set_defaults(func=run_similar)
+    
+    calibrate = subparsers.add_parser("calibrate", help="Compare image encoders on frames of a video")
+    calibrate.add_argument("video", help="Video file to sample frames from")
+    calibrate.add_argument("--samples", type=int, default=6, help="Number of frames to sample")
+    calibrate.add_argument("--min-time", type=float, default=0.5,
+                           help="Minimum seconds spent measuring each encoder")
+    calibrate.set_defaults(func=run_calibrate)
+    
+    yuv_check = subparsers.add_parser("yuv-check", help="Verify the YUV JPEG fast path against the RGB path")
+    yuv_check.add_argument("video", help="Video file to sample frames from")
+    yuv_check.add_argument("--samples", type=int, default=6, help="Number of frames to sample")
+    yuv_check.add_argument("--quality", type=int, default=95, help="JPEG quality")
+    yuv_check.add_argument("--tolerance", type=float, default=0.5,
+                           help="Largest acceptable mean PSNR loss in dB")
+    yuv_check.set_defaults(func=run_yuv_check)
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a CLI command and return the process exit code"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
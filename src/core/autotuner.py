@@ -0,0 +1,295 @@
+"""
+Adaptive worker-count tuning for extraction and downloads, persisted per machine profile
+"""
+import json
+import os
+import platform
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from .memory_budget import MemoryBudget, get_memory_budget
+from .video_processor import MAX_ENCODE_WORKERS
+from ..utils.helpers import get_app_data_dir
+
+
+AUTOTUNE_ENV = "SMV_EXTRACTER_AUTOTUNE"
+DEFAULT_WINDOW = 3.0
+# A setting must beat its neighbour by this fraction to be worth the extra workers
+MIN_GAIN = 0.05
+SAMPLES_PER_SETTING = 2
+REPROBE_WINDOWS = 20
+
+CPU_PRESSURE_LIMIT = 0.5
+LOAD_PER_CPU_LIMIT = 1.5
+DISK_QUEUE_LIMIT = 32
+MEMORY_PRESSURE_LIMIT = 0.9
+
+
+def autotune_enabled() -> bool:
+    """Whether the auto-tuner runs (on unless SMV_EXTRACTER_AUTOTUNE is 0/off/false/no)"""
+    return os.environ.get(AUTOTUNE_ENV, "1").strip().lower() not in ("0", "off", "false", "no")
+
+
+def _read_meminfo() -> Dict[str, int]:
+    values = {}
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                values[name] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def total_memory() -> Optional[int]:
+    """Physical memory in bytes, or None where it cannot be read"""
+    total = _read_meminfo().get("MemTotal")
+    if total:
+        return total
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def machine_profile() -> str:
+    """Key for persisted settings: OS, architecture, core count and memory size"""
+    memory = total_memory()
+    memory_part = f"{round(memory / 1024 ** 3)}gb" if memory else "unknown-mem"
+    return f"{platform.system().lower()}-{platform.machine().lower()}-{os.cpu_count() or 1}cpu-{memory_part}"
+
+
+class SystemPressure:
+    """CPU, disk queue and memory pressure signals; each is None where the platform does not expose it"""
+    
+    def __init__(self, memory_budget: Optional[MemoryBudget] = None):
+        self.memory_budget = memory_budget or get_memory_budget()
+    
+    def cpu(self) -> Optional[float]:
+        """Share of recent time runnable tasks waited for a CPU (Linux PSI), else 1-minute load per core"""
+        try:
+            with open("/proc/pressure/cpu", "r") as f:
+                fields = dict(item.split("=") for item in f.readline().split()[1:])
+            return float(fields["avg10"]) / 100
+        except (OSError, ValueError, KeyError):
+            pass
+        try:
+            # scaled so that LOAD_PER_CPU_LIMIT runnable tasks per core lands on CPU_PRESSURE_LIMIT
+            return os.getloadavg()[0] / (os.cpu_count() or 1) * CPU_PRESSURE_LIMIT / LOAD_PER_CPU_LIMIT
+        except (AttributeError, OSError):
+            return None
+    
+    def disk_queue(self) -> Optional[int]:
+        """I/O requests currently in flight across block devices"""
+        try:
+            with open("/proc/diskstats", "r") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        in_flight = 0
+        for line in lines:
+            fields = line.split()
+            if len(fields) > 11 and not fields[2].startswith(("loop", "ram")):
+                in_flight += int(fields[11])
+        return in_flight
+    
+    def memory(self) -> Optional[float]:
+        """The larger of the buffer budget use and the system memory in use, as a fraction"""
+        budget = self.memory_budget
+        used = budget.reserved / budget.limit_bytes if budget.limit_bytes else 0.0
+        meminfo = _read_meminfo()
+        if meminfo.get("MemTotal") and "MemAvailable" in meminfo:
+            used = max(used, 1 - meminfo["MemAvailable"] / meminfo["MemTotal"])
+        return used
+    
+    def over_limit(self) -> List[str]:
+        """Names of the signals currently above their limit"""
+        signals = (("cpu", self.cpu(), CPU_PRESSURE_LIMIT), ("disk", self.disk_queue(), DISK_QUEUE_LIMIT),
+                   ("memory", self.memory(), MEMORY_PRESSURE_LIMIT))
+        return [name for name, value, limit in signals if value is not None and value > limit]
+
+
+class TunedKnob:
+    """One worker count searched for the knee of its throughput curve"""
+    
+    def __init__(self, name: str, get: Callable[[], int], apply: Callable[[int], None],
+                 counter: Callable[[], float], minimum: int = 1, maximum: int = 8, unit: str = "items"):
+        self.name = name
+        self.get = get
+        self.apply = apply
+        self.counter = counter
+        self.minimum = minimum
+        self.maximum = maximum
+        self.unit = unit
+        self.settled = False
+        self.ceiling = maximum
+        self.samples: Dict[int, List[float]] = {}
+        self._previous: Optional[int] = None
+        self._direction = 1
+        self._skip_window = False
+        self._settled_windows = 0
+        self._last_count = counter()
+        self._last_time = time.monotonic()
+    
+    def rate(self) -> Optional[float]:
+        """Units per second since the last call, or None when nothing was processed"""
+        now = time.monotonic()
+        count = self.counter()
+        delta, elapsed = count - self._last_count, now - self._last_time
+        self._last_count, self._last_time = count, now
+        return delta / elapsed if delta > 0 and elapsed > 0 else None
+    
+    def _mean(self, value: int) -> Optional[float]:
+        samples = self.samples.get(value)
+        return sum(samples) / len(samples) if samples and len(samples) >= SAMPLES_PER_SETTING else None
+    
+    def _move(self, value: int) -> int:
+        self._previous = self.get()
+        self.samples[value] = []
+        self._skip_window = True
+        self.apply(value)
+        return value
+    
+    def observe(self, rate: float, pressure: List[str]) -> Optional[str]:
+        """Feed one window's throughput; returns a message when the setting changes"""
+        value = self.get()
+        if pressure:
+            self.ceiling = value
+            if value > self.minimum:
+                self._move(value - 1)
+                self.settled = True
+                self._previous = None
+                return f"{self.name} {value} -> {value - 1} (backing off on {', '.join(pressure)} pressure)"
+            return None
+        if self._skip_window:
+            # the window straddled the change, so its rate mixes both settings
+            self._skip_window = False
+            return None
+        
+        self.samples.setdefault(value, []).append(rate)
+        del self.samples[value][:-SAMPLES_PER_SETTING]
+        measured = self._mean(value)
+        if measured is None:
+            return None
+        
+        if self.settled:
+            self._settled_windows += 1
+            if self._settled_windows < REPROBE_WINDOWS:
+                return None
+            self._settled_windows = 0
+            self.ceiling = self.maximum
+            self._direction = -self._direction
+            target = value + self._direction
+            if not self.minimum <= target <= self.maximum:
+                return None
+            self.settled = False
+            self._move(target)
+            return f"{self.name} {value} -> {target} (re-probing at {measured:.1f} {self.unit}/s)"
+        
+        previous = self._previous
+        baseline = self._mean(previous) if previous is not None else None
+        if baseline is not None:
+            better = measured > baseline * (1 + MIN_GAIN) if value > previous else measured >= baseline * (1 - MIN_GAIN)
+            if not better:
+                self._move(previous)
+                self.settled = True
+                self._previous = None
+                return (f"{self.name} settled at {previous} ({baseline:.1f} {self.unit}/s; "
+                        f"{value} gave {measured:.1f})")
+        target = value + self._direction
+        if not self.minimum <= target <= min(self.maximum, self.ceiling):
+            self.settled = True
+            return f"{self.name} settled at {value} ({measured:.1f} {self.unit}/s)"
+        self._move(target)
+        return f"{self.name} {value} -> {target} (probing, {measured:.1f} {self.unit}/s)"
+
+
+class AutoTuner:
+    """Measures throughput each window while adjusting worker counts, and remembers the settled values"""
+    
+    def __init__(self, knobs: List[TunedKnob], pressure: Optional[SystemPressure] = None,
+                 window: float = DEFAULT_WINDOW, store_path: Optional[str] = None, profile: Optional[str] = None,
+                 log: Optional[Callable[[str], None]] = None):
+        self.knobs = knobs
+        self.pressure = pressure or SystemPressure()
+        self.window = window
+        self.store_path = store_path or os.path.join(get_app_data_dir(), "autotune.json")
+        self.profile = profile or machine_profile()
+        self.log = log or (lambda message: None)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _load_store(self) -> dict:
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def load(self):
+        """Apply the settings saved for this machine profile"""
+        saved = self._load_store().get(self.profile, {})
+        for knob in self.knobs:
+            value = saved.get(knob.name)
+            if isinstance(value, int) and knob.minimum <= value <= knob.maximum:
+                knob.apply(value)
+    
+    def save(self):
+        store = self._load_store()
+        store[self.profile] = {knob.name: knob.get() for knob in self.knobs}
+        store[self.profile]['updated'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        tmp_path = self.store_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(store, f, indent=2)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            self.log(f"Auto-tune: could not save settings - {e}")
+    
+    def step(self):
+        """Run one measurement window's decisions for every knob that did work during it"""
+        pressure = None
+        changed = False
+        for knob in self.knobs:
+            rate = knob.rate()
+            if rate is None:
+                continue
+            if pressure is None:
+                pressure = self.pressure.over_limit()
+            message = knob.observe(rate, pressure)
+            if message:
+                self.log(f"Auto-tune: {message}")
+                changed = changed or knob.settled
+        if changed:
+            self.save()
+    
+    def _run(self):
+        while not self._stop.wait(self.window):
+            self.step()
+    
+    def start(self):
+        self.load()
+        self._thread = threading.Thread(target=self._run, name="autotuner", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+def create_autotuner(video_processor=None, download_manager=None,
+                     log: Optional[Callable[[str], None]] = None) -> AutoTuner:
+    """Tuner over the extraction encode workers and the number of concurrent downloads"""
+    knobs = []
+    if video_processor is not None:
+        limit = video_processor.encode_limit
+        knobs.append(TunedKnob("encode_workers", lambda: limit.limit, limit.set_limit,
+                               lambda: video_processor.frames_encoded, 1, MAX_ENCODE_WORKERS, "frames"))
+    if download_manager is not None:
+        knobs.append(TunedKnob("concurrent_downloads", lambda: download_manager.max_concurrent,
+                               download_manager.set_max_concurrent, lambda: download_manager.meter.total,
+                               1, download_manager.task_manager.max_workers, "bytes"))
+    return AutoTuner(knobs, log=log)
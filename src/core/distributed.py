@@ -0,0 +1,394 @@
+"""
+Coordinator / worker extraction over a shared SQLite lease queue: jobs are split into timeline shards that any
+number of worker processes or hosts lease, heartbeat, run and report back
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from .encoders import create_encoder
+from .frame_reader import frame_number_at
+from .reader_pool import ReaderPool, get_reader_pool
+from .task_manager import get_task_manager
+from .video_processor import MODE_EXACT, CutPlan, VideoProcessor, build_plans
+
+
+DEFAULT_LEASE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_POLL_SECONDS = 1.0
+SHARD_MANIFEST_PREFIX = "shard"
+
+TASK_QUEUED = "queued"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    spec TEXT NOT NULL,
+    merged INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    shard INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks(job_id);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class LeasedTask:
+    """One shard handed to a worker until its lease expires"""
+    
+    def __init__(self, task_id: int, job_id: int, shard: int, payload: dict, attempts: int, lease_expires: float):
+        self.task_id = task_id
+        self.job_id = job_id
+        self.shard = shard
+        self.payload = payload
+        self.attempts = attempts
+        self.lease_expires = lease_expires
+
+
+class LeaseQueue:
+    """Task queue in one SQLite file; put it on a shared mount for several hosts (the mount must honour file locks)"""
+    
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, clock: Callable[[], float] = time.time):
+        self.path = os.path.abspath(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.executescript(SCHEMA)
+    
+    def _transaction(self, work: Callable[[sqlite3.Connection], object]):
+        """Run work inside BEGIN IMMEDIATE so concurrent leases from other processes are serialised"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+    
+    def add_job(self, spec: dict, payloads: List[dict]) -> int:
+        """Store a job and queue one task per payload; returns the job id"""
+        def work(db):
+            now = self.clock()
+            job_id = db.execute("INSERT INTO jobs (created, spec) VALUES (?, ?)", (now, json.dumps(spec))).lastrowid
+            db.executemany("INSERT INTO tasks (job_id, shard, payload, state, updated) VALUES (?, ?, ?, ?, ?)",
+                           [(job_id, shard, json.dumps(payload), TASK_QUEUED, now)
+                            for shard, payload in enumerate(payloads)])
+            return job_id
+        return self._transaction(work)
+    
+    def lease(self, worker_id: str) -> Optional[LeasedTask]:
+        """Take the oldest queued task, or one whose lease expired; tasks out of attempts are marked failed"""
+        def work(db):
+            now = self.clock()
+            while True:
+                row = db.execute("SELECT * FROM tasks WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                                 "ORDER BY id LIMIT 1", (TASK_QUEUED, TASK_LEASED, now)).fetchone()
+                if row is None:
+                    return None
+                if row['attempts'] >= self.max_attempts:
+                    db.execute("UPDATE tasks SET state = ?, error = ?, lease_owner = NULL, updated = ? WHERE id = ?",
+                               (TASK_FAILED, row['error'] or f"Lease expired after {row['attempts']} attempt(s)",
+                                now, row['id']))
+                    continue
+                expires = now + self.lease_seconds
+                db.execute("UPDATE tasks SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, "
+                           "updated = ? WHERE id = ?", (TASK_LEASED, worker_id, expires, now, row['id']))
+                return LeasedTask(row['id'], row['job_id'], row['shard'], json.loads(row['payload']),
+                                  row['attempts'] + 1, expires)
+        return self._transaction(work)
+    
+    def heartbeat(self, task: LeasedTask, worker_id: str) -> bool:
+        """Extend the lease; False when it was lost (expired and taken by another worker)"""
+        def work(db):
+            expires = self.clock() + self.lease_seconds
+            updated = db.execute("UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND state = ? "
+                                 "AND lease_owner = ?", (expires, self.clock(), task.task_id, TASK_LEASED,
+                                                         worker_id)).rowcount
+            if updated:
+                task.lease_expires = expires
+            return bool(updated)
+        return self._transaction(work)
+    
+    def complete(self, task: LeasedTask, worker_id: str, result: dict) -> bool:
+        def work(db):
+            return bool(db.execute("UPDATE tasks SET state = ?, result = ?, error = NULL, lease_owner = NULL, "
+                                   "updated = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                                   (TASK_DONE, json.dumps(result), self.clock(), task.task_id, TASK_LEASED,
+                                    worker_id)).rowcount)
+        return self._transaction(work)
+    
+    def fail(self, task: LeasedTask, worker_id: str, error: str) -> bool:
+        """Record an error; the task is queued again until it runs out of attempts"""
+        def work(db):
+            state = TASK_FAILED if task.attempts >= self.max_attempts else TASK_QUEUED
+            return bool(db.execute("UPDATE tasks SET state = ?, error = ?, lease_owner = NULL, updated = ? "
+                                   "WHERE id = ? AND state = ? AND lease_owner = ?",
+                                   (state, error, self.clock(), task.task_id, TASK_LEASED, worker_id)).rowcount)
+        return self._transaction(work)
+    
+    def job_spec(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT spec FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row['spec']) if row else None
+    
+    def job_tasks(self, job_id: int) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute("SELECT * FROM tasks WHERE job_id = ? ORDER BY shard", (job_id,)).fetchall()
+    
+    def job_counts(self, job_id: int) -> Dict[str, int]:
+        """Number of the job's tasks in each state"""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) AS n FROM tasks WHERE job_id = ? GROUP BY state",
+                                    (job_id,)).fetchall()
+        return {row['state']: row['n'] for row in rows}
+    
+    def mark_merged(self, job_id: int) -> bool:
+        """Claim the merge of a finished job; only the first caller gets True"""
+        def work(db):
+            return bool(db.execute("UPDATE jobs SET merged = 1 WHERE id = ? AND merged = 0", (job_id,)).rowcount)
+        return self._transaction(work)
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def plan_shards(duration: float, offsets: List[float], video_duration: float, fps: float,
+                shard_count: int) -> List[Tuple[float, float]]:
+    """Split a job's cuts into up to shard_count [start, end) time ranges with about the same number of cuts each"""
+    cut_plans = [CutPlan(d, o, video_duration) for d, o in build_plans(duration, offsets)]
+    times = sorted(timestamp for plan in cut_plans for _, timestamp in plan.timestamps())
+    if not times:
+        return []
+    # targets decoded from the same frame stay in one shard, so shared frames are still encoded once and linked
+    groups: List[float] = []
+    last_frame = None
+    for timestamp in times:
+        frame_number = frame_number_at(timestamp, fps)
+        if frame_number != last_frame:
+            groups.append(timestamp)
+            last_frame = frame_number
+    shard_count = max(1, min(shard_count, len(groups)))
+    starts = [groups[len(groups) * i // shard_count] for i in range(shard_count)]
+    return [(start, end) for start, end in zip(starts, starts[1:] + [video_duration + duration])]
+
+
+def merge_shard_manifests(export_directory: str, video_name: str, shard_count: int) -> str:
+    """Combine the shards' manifests into the {video_name}_manifest.json a single-node cut writes"""
+    merged = None
+    frames = []
+    shard_paths = [os.path.join(export_directory, f"{video_name}_{SHARD_MANIFEST_PREFIX}{shard:04d}.json")
+                   for shard in range(shard_count)]
+    for path in shard_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        merged = merged or data
+        frames.extend(data['frames'])
+    merged['created'] = time.time()
+    merged['frames'] = sorted(frames, key=lambda f: (f['timestamp'], f.get('offset') or 0.0, f['index']))
+    path = os.path.join(export_directory, f"{video_name}_manifest.json")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=2)
+    os.replace(tmp_path, path)
+    for shard_path in shard_paths:
+        os.remove(shard_path)
+    return path
+
+
+class Coordinator:
+    """Publishes extraction jobs as timeline-shard tasks and merges the results once every shard is done"""
+    
+    def __init__(self, queue: LeaseQueue, reader_pool: Optional[ReaderPool] = None,
+                 log: Optional[Callable[[str], None]] = None):
+        self.queue = queue
+        self.reader_pool = reader_pool or get_reader_pool()
+        self.log = log or print
+    
+    def submit(self, video_path: str, export_directory: str, duration: float, offsets: List[float],
+               mode: str = MODE_EXACT, sample_step: int = 1, image_format: str = "jpeg",
+               encoder_options: Optional[dict] = None, shards: int = 4) -> int:
+        """Probe the video, split its cuts into shards and queue them; returns the job id"""
+        video_path = os.path.abspath(video_path)
+        export_directory = os.path.abspath(export_directory)
+        info = self.reader_pool.probe(video_path)
+        ranges = plan_shards(duration, offsets, info['duration'], info['fps'], shards)
+        if not ranges:
+            raise ValueError("Offset is beyond video duration")
+        spec = {
+            'video': video_path,
+            'output': export_directory,
+            'duration': duration,
+            'offsets': offsets,
+            'mode': mode,
+            'sample_step': sample_step,
+            'format': image_format,
+            'encoder_options': encoder_options or {},
+        }
+        payloads = [dict(spec, time_range=list(time_range)) for time_range in ranges]
+        job_id = self.queue.add_job(spec, payloads)
+        self.log(f"Job {job_id}: {os.path.basename(video_path)} split into {len(ranges)} shard(s)")
+        return job_id
+    
+    def merge(self, job_id: int) -> Optional[str]:
+        """Write the job's merged manifest if every shard is done and nobody merged it yet"""
+        spec = self.queue.job_spec(job_id)
+        counts = self.queue.job_counts(job_id)
+        if spec is None or set(counts) != {TASK_DONE} or not self.queue.mark_merged(job_id):
+            return None
+        video_name = os.path.splitext(os.path.basename(spec['video']))[0]
+        return merge_shard_manifests(spec['output'], video_name, counts[TASK_DONE])
+    
+    def wait(self, job_ids: List[int], poll: float = DEFAULT_POLL_SECONDS) -> bool:
+        """Report progress until every job is done (then merge it) or has a failed shard; True when all succeeded"""
+        remaining = list(job_ids)
+        last_report = {}
+        ok = True
+        while remaining:
+            for job_id in list(remaining):
+                counts = self.queue.job_counts(job_id)
+                total = sum(counts.values())
+                report = f"Job {job_id}: {counts.get(TASK_DONE, 0)}/{total} shard(s) done"
+                if counts.get(TASK_LEASED):
+                    report += f", {counts[TASK_LEASED]} running"
+                if report != last_report.get(job_id):
+                    self.log(report)
+                    last_report[job_id] = report
+                if counts.get(TASK_FAILED):
+                    errors = {row['error'] for row in self.queue.job_tasks(job_id) if row['state'] == TASK_FAILED}
+                    self.log(f"Job {job_id} failed: {'; '.join(sorted(errors))}")
+                    remaining.remove(job_id)
+                    ok = False
+                elif counts.get(TASK_DONE) == total:
+                    path = self.merge(job_id)
+                    images = sum(json.loads(row['result'])['images'] for row in self.queue.job_tasks(job_id))
+                    self.log(f"Job {job_id} complete: {images} image(s)" + (f", manifest {path}" if path else ""))
+                    remaining.remove(job_id)
+            if remaining:
+                time.sleep(poll)
+        return ok
+
+
+class Worker:
+    """Leases shards, runs them through VideoProcessor while heartbeating, and reports results"""
+    
+    def __init__(self, queue: LeaseQueue, video_processor: Optional[VideoProcessor] = None,
+                 worker_id: Optional[str] = None, poll: float = DEFAULT_POLL_SECONDS,
+                 log: Optional[Callable[[str], None]] = None):
+        self.queue = queue
+        self.video_processor = video_processor or VideoProcessor()
+        self.worker_id = worker_id or default_worker_id()
+        self.poll = poll
+        self.log = log or print
+        self.completed = 0
+        self._stop = threading.Event()
+    
+    def run_once(self) -> bool:
+        """Lease and run one task; False when the queue had nothing to lease"""
+        leased = self.queue.lease(self.worker_id)
+        if leased is None:
+            return False
+        payload = leased.payload
+        self.log(f"[{self.worker_id}] job {leased.job_id} shard {leased.shard} "
+                 f"({payload['time_range'][0]:.1f}s-{payload['time_range'][1]:.1f}s, attempt {leased.attempts})")
+        done = threading.Event()
+        outcome = {}
+        
+        def on_completion(count: int, export_directory: str):
+            outcome['images'] = count
+        
+        def on_error(error: str):
+            outcome['error'] = error
+        
+        try:
+            task = self.video_processor.cut_video_to_images(
+                payload['video'], payload['output'], payload['duration'], payload['offsets'][0],
+                lambda *args: None, on_completion, on_error,
+                mode=payload['mode'], sample_step=payload['sample_step'],
+                encoder=create_encoder(payload['format'], **payload['encoder_options']),
+                offsets=payload['offsets'], time_range=tuple(payload['time_range']),
+                manifest_kind=f"{SHARD_MANIFEST_PREFIX}{leased.shard:04d}")
+        except Exception as e:
+            self.queue.fail(leased, self.worker_id, str(e))
+            return True
+        # fires however the task ends, including a cut cancelled before it started that never calls back
+        task.add_done_callback(lambda task: done.set())
+        
+        lost = False
+        while not done.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(leased, self.worker_id):
+                self.log(f"[{self.worker_id}] lost the lease on job {leased.job_id} shard {leased.shard}; stopping it")
+                lost = True
+                task.cancel()
+                task.wait()
+                break
+        if lost:
+            return True
+        if task.cancelled:
+            self.log(f"[{self.worker_id}] job {leased.job_id} shard {leased.shard} was cancelled; "
+                     f"its lease will expire and the shard will be retried")
+            return True
+        if 'images' not in outcome:
+            outcome.setdefault('error', task.error or "Cut ended without a result")
+        if 'error' in outcome:
+            self.log(f"[{self.worker_id}] job {leased.job_id} shard {leased.shard} failed: {outcome['error']}")
+            self.queue.fail(leased, self.worker_id, outcome['error'])
+        elif self.queue.complete(leased, self.worker_id, {'images': outcome['images'], 'worker': self.worker_id}):
+            self.completed += 1
+        return True
+    
+    def run(self, exit_when_idle: bool = False):
+        """Work until stop() (or, with exit_when_idle, until the queue is empty)"""
+        while not self._stop.is_set():
+            if not self.run_once():
+                if exit_when_idle:
+                    return
+                self._stop.wait(self.poll)
+    
+    def stop(self):
+        self._stop.set()
+
+
+def run_worker(worker: Worker, exit_when_idle: bool = False) -> int:
+    """Run a worker in the foreground until interrupted, finishing the shard in hand"""
+    worker.log(f"Worker {worker.worker_id} polling {worker.queue.path}")
+    try:
+        worker.run(exit_when_idle)
+    except KeyboardInterrupt:
+        worker.log("Stopping worker; its lease will expire and the shard will be retried")
+    finally:
+        get_task_manager().shutdown()
+        worker.video_processor.reader_pool.close()
+        worker.queue.close()
+    worker.log(f"Worker {worker.worker_id} completed {worker.completed} shard(s)")
+    return 0
@@ -0,0 +1,379 @@
+"""
+Download queue with playlist/channel expansion and concurrent workers
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+import yt_dlp
+from .downloader import YouTubeDownloader
+from .media_store import MediaStore
+from .task_manager import Task, TaskManager, get_task_manager
+from ..utils.helpers import get_app_data_dir
+
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_SKIPPED = "skipped"
+
+MAX_EXPANSION_DEPTH = 3
+
+
+class DownloadJob:
+    """A single video queued for download"""
+    
+    def __init__(self, job_id: int, url: str, video_id: Optional[str] = None,
+                 title: Optional[str] = None, extractor: str = "generic"):
+        self.job_id = job_id
+        self.url = url
+        self.video_id = video_id
+        self.title = title or url
+        self.extractor = extractor
+        self.state = JOB_PENDING
+        self.cancelled = False
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.speed = 0.0
+        self.filename: Optional[str] = None
+        self.error: Optional[str] = None
+        self.thumbnail_url: Optional[str] = None
+        self.task: Optional[Task] = None
+    
+    @property
+    def archive_key(self) -> Optional[str]:
+        """Key recorded in the download archive (yt-dlp compatible)"""
+        if not self.video_id:
+            return None
+        return f"{self.extractor.lower()} {self.video_id}"
+    
+    @property
+    def is_finished(self) -> bool:
+        return self.state in (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED, JOB_SKIPPED)
+    
+    def cancel(self):
+        """Request cancellation of this job"""
+        self.cancelled = True
+        if self.state == JOB_PENDING:
+            self.state = JOB_CANCELLED
+        if self.task:
+            self.task.cancel()
+
+
+class DownloadArchive:
+    """Persistent set of finished video IDs, stored in yt-dlp's archive format"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._keys.update(line.strip() for line in f if line.strip())
+    
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._keys
+    
+    def add(self, key: str):
+        """Record a finished download"""
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(key + "\n")
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all workers to enforce a global rate cap"""
+    
+    def __init__(self, rate_limit: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit or 0.0
+        self._last_refill = time.monotonic()
+    
+    def set_rate_limit(self, rate_limit: Optional[float]):
+        """Change the cap in bytes/second (None disables it)"""
+        with self._lock:
+            self.rate_limit = rate_limit
+            self._tokens = rate_limit or 0.0
+            self._last_refill = time.monotonic()
+    
+    def consume(self, nbytes: int):
+        """Account for transferred bytes, sleeping if the cap is exceeded"""
+        with self._lock:
+            rate = self.rate_limit
+            if not rate:
+                return
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._last_refill) * rate)
+            self._last_refill = now
+            self._tokens -= nbytes
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ThroughputMeter:
+    """Sliding-window aggregate throughput across all workers"""
+    
+    def __init__(self, window: float = 3.0):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = deque()
+        self.total = 0
+    
+    def add(self, nbytes: int):
+        now = time.monotonic()
+        with self._lock:
+            self.total += nbytes
+            self._samples.append((now, nbytes))
+            self._trim(now)
+    
+    def rate(self) -> float:
+        """Current throughput in bytes/second"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            total = sum(n for _, n in self._samples)
+        return total / self.window
+    
+    def _trim(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+
+
+class DownloadManager:
+    """Expands URLs into jobs and downloads them with a pool of workers"""
+    
+    def __init__(self, downloader: YouTubeDownloader, max_concurrent: int = 3,
+                 rate_limit: Optional[float] = None, archive_path: Optional[str] = None,
+                 media_store: Optional[MediaStore] = None, task_manager: Optional[TaskManager] = None):
+        self.downloader = downloader
+        self.media_store = media_store
+        self.task_manager = task_manager or get_task_manager()
+        self.max_concurrent = max(1, max_concurrent)
+        self.task_manager.set_kind_limit("download", self.max_concurrent)
+        self.limiter = BandwidthLimiter(rate_limit)
+        self.meter = ThroughputMeter()
+        self.archive = DownloadArchive(archive_path or os.path.join(get_app_data_dir(), "download_archive.txt"))
+        
+        self.jobs: Dict[int, DownloadJob] = {}
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def expand_url(self, url: str) -> List[dict]:
+        """Expand a playlist or channel URL into flat video entries"""
+        ydl_opts = {'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                return []
+            return list(self._flatten_entries(ydl, info, 0))
+    
+    def _flatten_entries(self, ydl: yt_dlp.YoutubeDL, info: dict, depth: int) -> Iterable[dict]:
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            yield info
+            return
+        
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') in ('playlist', 'multi_video'):
+                yield from self._flatten_entries(ydl, entry, depth + 1)
+            elif entry.get('_type') == 'url' and entry.get('ie_key') == 'YoutubeTab':
+                if depth < MAX_EXPANSION_DEPTH:
+                    nested = ydl.extract_info(entry['url'], download=False)
+                    if nested:
+                        yield from self._flatten_entries(ydl, nested, depth + 1)
+            else:
+                yield entry
+    
+    def enqueue_url(self, url: str,
+                    jobs_callback: Callable[[List[DownloadJob]], None],
+                    progress_callback: Callable[[DownloadJob, dict], None],
+                    completion_callback: Callable[[DownloadJob], None],
+                    error_callback: Callable[[DownloadJob, str], None],
+                    log_callback: Callable[[str], None]):
+        """Expand a URL in the background and queue a job per video"""
+        def do_expand(task: Task):
+            try:
+                log_callback(f"Resolving {url}...")
+                entries = self.expand_url(url)
+            except Exception as e:
+                error_callback(None, f"Failed to resolve URL - {e}")
+                return
+            task.check()
+            
+            jobs = []
+            seen = set()
+            for entry in entries:
+                job = self._create_job(entry, url)
+                if job.archive_key in seen:
+                    continue
+                if job.archive_key:
+                    seen.add(job.archive_key)
+                    if job.archive_key in self.archive:
+                        job.state = JOB_SKIPPED
+                        log_callback(f"Skipping already downloaded: {job.title}")
+                jobs.append(job)
+            
+            with self._lock:
+                for job in jobs:
+                    self.jobs[job.job_id] = job
+            pending = [job for job in jobs if job.state == JOB_PENDING]
+            log_callback(f"Queued {len(pending)} download(s), {len(jobs) - len(pending)} skipped")
+            jobs_callback(jobs)
+            
+            for job in pending:
+                job.task = self.task_manager.submit(
+                    lambda task, job=job: self._run_job(task, job, progress_callback, completion_callback,
+                                                        error_callback, log_callback),
+                    f"Download: {job.title}", kind="download")
+        
+        self.task_manager.submit(do_expand, f"Resolve: {url}", kind="info")
+    
+    def _create_job(self, entry: dict, fallback_url: str) -> DownloadJob:
+        video_id = entry.get('id')
+        extractor = entry.get('ie_key') or entry.get('extractor_key') or "generic"
+        url = entry.get('webpage_url') or entry.get('url') or fallback_url
+        job = DownloadJob(next(self._job_ids), url, video_id, entry.get('title'), extractor)
+        thumbnails = entry.get('thumbnails') or []
+        job.thumbnail_url = entry.get('thumbnail') or (thumbnails[-1].get('url') if thumbnails else None)
+        return job
+    
+    def _run_job(self, task: Task, job: DownloadJob,
+                 progress_callback: Callable[[DownloadJob, dict], None],
+                 completion_callback: Callable[[DownloadJob], None],
+                 error_callback: Callable[[DownloadJob, str], None],
+                 log_callback: Callable[[str], None]):
+        if job.cancelled:
+            job.state = JOB_CANCELLED
+            completion_callback(job)
+            return
+        
+        job.state = JOB_RUNNING
+        if self.media_store and job.archive_key:
+            entry = self.media_store.lookup_remote(job.archive_key)
+            if entry:
+                self.media_store.record_title(entry, job.title)
+                job.filename = entry.media_path
+                job.state = JOB_COMPLETED
+                log_callback(f"✓ Already in media store: {job.title}")
+                completion_callback(job)
+                return
+        
+        last_downloaded = [0]
+        
+        def progress_hook(d):
+            task.check()
+            if d['status'] == 'downloading':
+                downloaded = d.get('downloaded_bytes') or 0
+                # a total that went backwards is stale, not new data
+                delta = max(0, downloaded - last_downloaded[0])
+                last_downloaded[0] = max(last_downloaded[0], downloaded)
+                if delta > 0:
+                    self.meter.add(delta)
+                    self.limiter.consume(delta)
+                job.downloaded_bytes = downloaded
+                job.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                job.speed = d.get('speed') or 0.0
+            elif d['status'] == 'finished':
+                job.filename = d.get('filename')
+                last_downloaded[0] = 0
+            progress_callback(job, d)
+        
+        log_callback(f"Starting download: {job.title}")
+        
+        try:
+            output_dir = self.media_store.staging_dir if self.media_store else None
+            filename = self.downloader.download_url(job.url, progress_hook, log_callback, output_dir)
+            if filename:
+                job.filename = filename
+            if self.media_store and job.filename and os.path.exists(job.filename):
+                entry = self.media_store.ingest_download(job.filename, job.archive_key, job.title)
+                job.filename = entry.media_path
+            job.state = JOB_COMPLETED
+            if job.archive_key:
+                self.archive.add(job.archive_key)
+            log_callback(f"✓ Download completed: {job.title}")
+            completion_callback(job)
+        except Exception as e:
+            if task.cancelled:
+                job.state = JOB_CANCELLED
+                log_callback(f"Download cancelled by user: {job.title}")
+                completion_callback(job)
+            else:
+                job.state = JOB_FAILED
+                job.error = str(e)
+                error_callback(job, f"Failed to download {job.title} - {e}")
+    
+    def cancel_job(self, job_id: int):
+        """Cancel a single queued or running job"""
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel()
+    
+    def pause_job(self, job_id: int):
+        """Pause a running job at its next progress update"""
+        job = self.jobs.get(job_id)
+        if job and job.task:
+            job.task.pause()
+    
+    def resume_job(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job and job.task:
+            job.task.resume()
+    
+    def cancel_all(self):
+        """Cancel every unfinished job"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            if not job.is_finished:
+                job.cancel()
+    
+    def set_max_concurrent(self, max_concurrent: int):
+        """Change how many downloads run at once; queued jobs pick up the new limit"""
+        self.max_concurrent = max(1, max_concurrent)
+        self.task_manager.set_kind_limit("download", self.max_concurrent)
+    
+    def set_rate_limit(self, rate_limit: Optional[float]):
+        """Set the global bandwidth cap in bytes/second"""
+        self.limiter.set_rate_limit(rate_limit)
+    
+    def get_throughput(self) -> float:
+        """Aggregate download throughput in bytes/second"""
+        return self.meter.rate()
+    
+    def get_active_jobs(self) -> List[DownloadJob]:
+        with self._lock:
+            return [job for job in self.jobs.values() if not job.is_finished]
+    
+    def get_overall_progress(self) -> float:
+        """Progress (0-100) across all jobs that are not skipped"""
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if job.state != JOB_SKIPPED]
+        if not jobs:
+            return 0.0
+        total = 0.0
+        for job in jobs:
+            if job.is_finished:
+                total += 1.0
+            elif job.total_bytes:
+                total += min(job.downloaded_bytes / job.total_bytes, 1.0)
+        return total / len(jobs) * 100.0
+    
+    def is_idle(self) -> bool:
+        return not self.get_active_jobs()
+    
+    def clear_finished(self):
+        """Forget finished jobs so progress restarts for the next batch"""
+        with self._lock:
+            self.jobs = {job_id: job for job_id, job in self.jobs.items() if not job.is_finished}
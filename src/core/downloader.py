@@ -1,75 +1,112 @@
 """
 YouTube video downloader functionality
 """
-import threading
+import os
 import yt_dlp
 from typing import Callable, Optional
+from .task_manager import Task, TaskCancelled, TaskManager, get_task_manager
+from .segmented_fetcher import SegmentedFetcher, filename_from_url, is_direct_media_url
 from ..utils.logger import YTDLPLogger
 
 
 class YouTubeDownloader:
     """Handles YouTube video downloading operations"""
     
-    def __init__(self):
-        self.download_thread: Optional[threading.Thread] = None
-        self.download_cancelled = False
+    def __init__(self, use_segmented_fetcher: bool = True, task_manager: Optional[TaskManager] = None):
+        self.task_manager = task_manager or get_task_manager()
+        self.download_task: Optional[Task] = None
+        self.use_segmented_fetcher = use_segmented_fetcher
+        self.fetcher = SegmentedFetcher()
     
-    def get_video_info(self, url: str, callback: Callable[[dict], None], 
-                      error_callback: Callable[[str], None]):
+    def get_video_info(self, url: str, callback: Callable[[dict], None],
+                      error_callback: Callable[[str], None]) -> Task:
         """Get YouTube video information without downloading"""
-        def fetch_info():
+        def fetch_info(task: Task):
             try:
                 ydl_opts = {'quiet': True, 'no_warnings': True}
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                     info = ydl.extract_info(url, download=False)
+                    task.check()
                     if info:
                         callback(info)
+            except TaskCancelled:
+                raise
             except Exception as e:
                 error_callback(str(e))
         
-        threading.Thread(target=fetch_info, daemon=True).start()
+        return self.task_manager.submit(fetch_info, f"Fetch info: {url}", kind="info")
     
-    def download_video(self, url: str, 
+    def build_download_options(self, progress_hook: Callable[[dict], None],
+                               log_callback: Callable[[str], None],
+                               output_dir: Optional[str] = None) -> dict:
+        """Build the yt-dlp options used for every video download"""
+        outtmpl = os.path.join(output_dir, '%(id)s.%(ext)s') if output_dir else '%(title)s.%(ext)s'
+        return {
+            'outtmpl': outtmpl,
+            'format': 'bestvideo[ext=mp4]+none/bestvideo[ext=mp4]',
+            'merge_output_format': 'mp4',
+            'progress_hooks': [progress_hook],
+            'logger': YTDLPLogger(log_callback),
+            'verbose': True,
+        }
+    
+    def download_url(self, url: str, progress_hook: Callable[[dict], None],
+                     log_callback: Callable[[str], None],
+                     output_dir: Optional[str] = None) -> Optional[str]:
+        """Download a single URL, using the segmented fetcher for plain HTTP media"""
+        if self.use_segmented_fetcher and is_direct_media_url(url):
+            log_callback("Direct media URL detected, using segmented download")
+            return self.fetcher.fetch(url, os.path.join(output_dir or "", filename_from_url(url)), progress_hook)
+        
+        ydl_opts = self.build_download_options(progress_hook, log_callback, output_dir)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                return None
+            if self.use_segmented_fetcher and self._is_plain_http_format(info):
+                log_callback(f"Using segmented download for format {info.get('format_id')}")
+                return self.fetcher.fetch(info['url'], ydl.prepare_filename(info), progress_hook,
+                                          headers=info.get('http_headers'))
+            info = ydl.process_ie_result(info, download=True)
+            downloads = (info or {}).get('requested_downloads') or []
+            return downloads[0].get('filepath') if downloads else None
+    
+    def _is_plain_http_format(self, info: dict) -> bool:
+        """Check whether the selected format is a single non-fragmented HTTP file"""
+        return (info.get('_type', 'video') == 'video'
+                and not info.get('requested_formats')
+                and not info.get('fragments')
+                and info.get('protocol') in ('http', 'https')
+                and bool(info.get('url')))
+    
+    def download_video(self, url: str,
                       progress_callback: Callable[[dict], None],
                       completion_callback: Callable[[str], None],
                       error_callback: Callable[[str], None],
-                      log_callback: Callable[[str], None]):
+                      log_callback: Callable[[str], None]) -> Task:
         """Download YouTube video"""
-        def do_download():
-            self.download_cancelled = False
-            
+        def do_download(task: Task):
             def progress_hook(d):
-                if self.download_cancelled:
-                    raise Exception("Download cancelled by user")
+                task.check()
                 progress_callback(d)
-                
-            log_callback("Starting download...")
             
-            ydl_opts = {
-                'outtmpl': '%(title)s.%(ext)s',
-                'format': 'bestvideo[ext=mp4]+none/bestvideo[ext=mp4]',
-                'merge_output_format': 'mp4',
-                'progress_hooks': [progress_hook],
-                'logger': YTDLPLogger(log_callback),
-                'verbose': True,
-            }
+            log_callback("Starting download...")
             
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-                    
-                if not self.download_cancelled:
-                    log_callback("✓ Video-only download completed successfully!")
-                    
+                filename = self.download_url(url, progress_hook, log_callback)
+                log_callback("✓ Video-only download completed successfully!")
+                completion_callback(filename)
+            
             except Exception as e:
-                if not self.download_cancelled:
+                if not task.cancelled:
                     error_callback(f"Failed to download - {e}")
-                elif "cancelled by user" in str(e):
+                else:
                     log_callback("Download cancelled by user")
         
-        self.download_thread = threading.Thread(target=do_download, daemon=True)
-        self.download_thread.start()
+        self.download_task = self.task_manager.submit(do_download, f"Download: {url}", kind="download")
+        return self.download_task
     
     def cancel_download(self):
         """Cancel the current download"""
-        self.download_cancelled = True
+        if self.download_task:
+            self.download_task.cancel()
@@ -0,0 +1,257 @@
+"""
+Image encoder backends for extracted frames
+"""
+import io
+import time
+from typing import BinaryIO, Dict, List, Optional, Sequence, Union
+import numpy as np
+from PIL import Image
+from .frame_reader import yuv420_planes
+
+
+def frame_to_image(frame: np.ndarray) -> Image.Image:
+    """Wrap an RGB frame array in a PIL image without copying it"""
+    height, width = frame.shape[:2]
+    return Image.frombuffer("RGB", (width, height), frame, "raw", "RGB", 0, 1)
+
+
+class ImageEncoder:
+    """Base class for frame encoders; subclasses write one frame to a binary stream"""
+    
+    name = "base"
+    extension = ""
+    accepts_yuv420 = False
+    
+    def encode_image(self, image: Image.Image, stream: BinaryIO):
+        raise NotImplementedError
+    
+    def encode(self, frame: np.ndarray, stream: BinaryIO):
+        self.encode_image(frame_to_image(frame), stream)
+    
+    def encode_yuv420(self, frame: np.ndarray, width: int, height: int, stream: BinaryIO):
+        raise NotImplementedError
+    
+    def save(self, frame: np.ndarray, filepath: str):
+        """Encode a frame to a file"""
+        with open(filepath, "wb") as f:
+            self.encode(frame, f)
+    
+    def save_image(self, image: Image.Image, filepath: str):
+        """Encode a PIL image to a file"""
+        with open(filepath, "wb") as f:
+            self.encode_image(image, f)
+    
+    def save_yuv420(self, frame: np.ndarray, width: int, height: int, filepath: str):
+        """Encode a flat yuv420p frame to a file"""
+        with open(filepath, "wb") as f:
+            self.encode_yuv420(frame, width, height, f)
+    
+    def describe(self) -> str:
+        return self.name
+
+
+class JpegEncoder(ImageEncoder):
+    """PIL JPEG encoder"""
+    
+    name = "jpeg"
+    extension = ".jpg"
+    
+    def __init__(self, quality: int = 95, subsampling: Optional[Union[int, str]] = None,
+                 optimize: bool = False, progressive: bool = False, yuv420_input: bool = False):
+        self.quality = quality
+        self.subsampling = subsampling
+        self.optimize = optimize
+        self.progressive = progressive
+        self.yuv420_input = yuv420_input
+    
+    @property
+    def accepts_yuv420(self) -> bool:
+        return self.yuv420_input and self.subsampling in (None, 2, "4:2:0")
+    
+    def _options(self) -> dict:
+        options = {"quality": self.quality, "optimize": self.optimize, "progressive": self.progressive}
+        if self.subsampling is not None:
+            options["subsampling"] = self.subsampling
+        return options
+    
+    def encode_image(self, image: Image.Image, stream: BinaryIO):
+        image.save(stream, "JPEG", **self._options())
+    
+    def encode_yuv420(self, frame: np.ndarray, width: int, height: int, stream: BinaryIO):
+        """Encode full-range BT.601 planes directly, so libjpeg does no RGB conversion"""
+        y, u, v = yuv420_planes(frame, width, height)
+        chroma_size = (width // 2, height // 2)
+        planes = (
+            Image.frombuffer("L", (width, height), y, "raw", "L", 0, 1),
+            Image.frombuffer("L", chroma_size, u, "raw", "L", 0, 1).resize((width, height), Image.Resampling.NEAREST),
+            Image.frombuffer("L", chroma_size, v, "raw", "L", 0, 1).resize((width, height), Image.Resampling.NEAREST),
+        )
+        options = self._options()
+        options["subsampling"] = "4:2:0"
+        Image.merge("YCbCr", planes).save(stream, "JPEG", **options)
+    
+    def describe(self) -> str:
+        parts = [f"jpeg q{self.quality}"]
+        if self.subsampling is not None:
+            parts.append(str(self.subsampling))
+        if self.optimize:
+            parts.append("optimize")
+        if self.progressive:
+            parts.append("progressive")
+        if self.accepts_yuv420:
+            parts.append("yuv")
+        return " ".join(parts)
+
+
+class WebPEncoder(ImageEncoder):
+    """PIL WebP encoder"""
+    
+    name = "webp"
+    extension = ".webp"
+    
+    def __init__(self, quality: int = 80, lossless: bool = False, method: int = 4):
+        self.quality = quality
+        self.lossless = lossless
+        self.method = method
+    
+    def encode_image(self, image: Image.Image, stream: BinaryIO):
+        image.save(stream, "WEBP", quality=self.quality, lossless=self.lossless,
+                   method=self.method)
+    
+    def describe(self) -> str:
+        if self.lossless:
+            return f"webp lossless m{self.method}"
+        return f"webp q{self.quality} m{self.method}"
+
+
+class PngEncoder(ImageEncoder):
+    """PIL PNG encoder with a configurable zlib compression level"""
+    
+    name = "png"
+    extension = ".png"
+    
+    def __init__(self, compress_level: int = 6):
+        self.compress_level = compress_level
+    
+    def encode_image(self, image: Image.Image, stream: BinaryIO):
+        image.save(stream, "PNG", compress_level=self.compress_level)
+    
+    def describe(self) -> str:
+        return f"png level {self.compress_level}"
+
+
+class RawEncoder(ImageEncoder):
+    """Writes the packed RGB24 bytes of the frame with no header"""
+    
+    name = "raw"
+    extension = ".rgb"
+    
+    def encode_image(self, image: Image.Image, stream: BinaryIO):
+        stream.write(image.convert("RGB").tobytes())
+    
+    def encode(self, frame: np.ndarray, stream: BinaryIO):
+        stream.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+    
+    def describe(self) -> str:
+        return "raw rgb24"
+
+
+ENCODERS = {
+    JpegEncoder.name: JpegEncoder,
+    WebPEncoder.name: WebPEncoder,
+    PngEncoder.name: PngEncoder,
+    RawEncoder.name: RawEncoder,
+}
+
+
+def create_encoder(name: str, **options) -> ImageEncoder:
+    """Create an encoder by backend name"""
+    try:
+        return ENCODERS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown image format: {name}")
+
+
+def calibration_presets() -> List[ImageEncoder]:
+    """Encoder settings compared by a calibration run"""
+    return [
+        JpegEncoder(quality=95),
+        JpegEncoder(quality=95, subsampling="4:2:0"),
+        JpegEncoder(quality=90, optimize=True),
+        JpegEncoder(quality=90, progressive=True),
+        WebPEncoder(quality=80, method=0),
+        WebPEncoder(quality=80, method=4),
+        PngEncoder(compress_level=1),
+        PngEncoder(compress_level=6),
+        RawEncoder(),
+    ]
+
+
+def calibrate_encoders(frames: Sequence[np.ndarray], encoders: Optional[List[ImageEncoder]] = None,
+                       min_time: float = 0.5) -> List[Dict]:
+    """Encode sample frames with each encoder and measure throughput and output size"""
+    results = []
+    for encoder in encoders or calibration_presets():
+        encoded = 0
+        total_bytes = 0
+        start = time.perf_counter()
+        while True:
+            for frame in frames:
+                stream = io.BytesIO()
+                encoder.encode(frame, stream)
+                total_bytes += stream.tell()
+                encoded += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        results.append({
+            'encoder': encoder,
+            'label': encoder.describe(),
+            'frames_per_second': encoded / elapsed,
+            'avg_bytes': total_bytes / encoded,
+        })
+    return results
+
+
+def psnr(reference: np.ndarray, test: np.ndarray) -> float:
+    """Peak signal-to-noise ratio in dB between two 8-bit images"""
+    mse = np.mean((reference.astype(np.float64) - test.astype(np.float64)) ** 2)
+    if mse == 0:
+        return float("inf")
+    return float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def compare_yuv420_path(rgb_frames: Sequence[np.ndarray], yuv_frames: Sequence[np.ndarray],
+                        width: int, height: int, encoder: Optional[ImageEncoder] = None) -> List[Dict]:
+    """PSNR of the RGB and planar YUV encode paths, both measured against the decoded RGB frame"""
+    encoder = encoder or JpegEncoder(quality=95)
+    results = []
+    for rgb, yuv in zip(rgb_frames, yuv_frames):
+        start = time.perf_counter()
+        rgb_stream = io.BytesIO()
+        encoder.encode(rgb, rgb_stream)
+        rgb_time = time.perf_counter() - start
+        start = time.perf_counter()
+        yuv_stream = io.BytesIO()
+        encoder.encode_yuv420(yuv, width, height, yuv_stream)
+        yuv_time = time.perf_counter() - start
+        rgb_decoded = np.asarray(Image.open(rgb_stream).convert("RGB"))
+        yuv_decoded = np.asarray(Image.open(yuv_stream).convert("RGB"))
+        results.append({
+            'rgb_psnr': psnr(rgb, rgb_decoded),
+            'yuv_psnr': psnr(rgb, yuv_decoded),
+            'rgb_bytes': rgb_stream.tell(),
+            'yuv_bytes': yuv_stream.tell(),
+            'rgb_time': rgb_time,
+            'yuv_time': yuv_time,
+        })
+    return results
+
+
+def format_calibration(results: List[Dict]) -> List[str]:
+    """Render calibration results as aligned text lines, fastest first"""
+    lines = [f"{'Encoder':<26}{'frames/s':>10}{'avg size':>12}"]
+    for result in sorted(results, key=lambda r: r['frames_per_second'], reverse=True):
+        lines.append(f"{result['label']:<26}{result['frames_per_second']:>10.1f}"
+                     f"{result['avg_bytes'] / 1024:>9.1f} KB")
+    return lines
@@ -0,0 +1,300 @@
+"""
+Perceptual-hash similarity index over extracted frames
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import numpy as np
+from PIL import Image
+from ..utils.helpers import get_app_data_dir
+
+
+HASH_BITS = 64
+HASH_SIZE = 8
+DCT_SIZE = 32
+# the 64-bit hash is split into this many 16-bit chunks for multi-index hashing
+CHUNK_COUNT = 4
+CHUNK_BITS = HASH_BITS // CHUNK_COUNT
+# radius queries probe chunk values up to this many bits away; wider radii scan every hash instead
+MAX_CHUNK_RADIUS = 2
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# SQLite caps the number of bound parameters per statement
+SQL_BATCH = 500
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash INTEGER NOT NULL,
+    video TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    frame_number INTEGER,
+    path TEXT NOT NULL UNIQUE,
+    added REAL NOT NULL
+);
+"""
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so coefficients = M @ block @ M.T"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+DCT_MATRIX = _dct_matrix(DCT_SIZE)
+
+
+def perceptual_hash(frame: np.ndarray, max_width: int = 256) -> int:
+    """64-bit DCT hash of an RGB or luma frame: the low 8x8 frequencies compared against their median"""
+    step = max(1, frame.shape[1] // max_width)
+    if frame.ndim == 2:
+        luma = frame[::step, ::step].astype(np.float32)
+    else:
+        luma = frame[::step, ::step, :3].astype(np.float32) @ LUMA_WEIGHTS
+    small = np.asarray(Image.fromarray(luma).resize((DCT_SIZE, DCT_SIZE), Image.Resampling.BOX))
+    low = (DCT_MATRIX @ small @ DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low > np.median(low)).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def image_hash(filepath: str) -> int:
+    """Perceptual hash of an image file"""
+    with Image.open(filepath) as image:
+        return perceptual_hash(np.asarray(image.convert("L")))
+
+
+def hamming_distances(hashes: np.ndarray, query: int) -> np.ndarray:
+    """Bit distance from query to every uint64 hash"""
+    differing = np.bitwise_xor(hashes, np.uint64(query))
+    return POPCOUNT[differing.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def _chunk_values(chunk: int, radius: int) -> List[int]:
+    """Every 16-bit value within radius bits of chunk"""
+    values = [chunk]
+    frontier = [(chunk, -1)]
+    for _ in range(radius):
+        next_frontier = []
+        for value, last_bit in frontier:
+            for bit in range(last_bit + 1, CHUNK_BITS):
+                flipped = value ^ (1 << bit)
+                values.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return values
+
+
+class FrameMatch:
+    """One indexed frame returned by a similarity query"""
+    
+    def __init__(self, frame_id: int, distance: int, phash: int, video: str, timestamp: float,
+                 frame_number: Optional[int], path: str):
+        self.frame_id = frame_id
+        self.distance = distance
+        self.phash = phash
+        self.video = video
+        self.timestamp = timestamp
+        self.frame_number = frame_number
+        self.path = path
+    
+    def to_dict(self) -> dict:
+        return {
+            'distance': self.distance,
+            'phash': f"{self.phash:016x}",
+            'video': self.video,
+            'timestamp': self.timestamp,
+            'frame_number': self.frame_number,
+            'path': self.path,
+        }
+
+
+class FrameIndex:
+    """Frame hashes persisted in SQLite and queried from compact NumPy arrays
+    
+    Radius queries use multi-index hashing: the 64-bit hash is split into four
+    16-bit chunks, and by the pigeonhole principle any hash within r bits
+    matches the query within r // 4 bits in at least one chunk, so only those
+    candidates are checked. k-nearest queries scan the whole array with a
+    vectorised popcount.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.abspath(path or os.path.join(get_app_data_dir("index"), "frames.db"))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.executescript(SCHEMA)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._chunk_tables: Optional[List[tuple]] = None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+    
+    def add_frames(self, video_path: str, frames: Sequence[dict], base_directory: Optional[str] = None,
+                   hasher: Callable[[str], int] = image_hash) -> int:
+        """Index manifest frame entries; frames without a 'phash' are hashed from their first file"""
+        rows = []
+        now = time.time()
+        for frame in frames:
+            files = list(frame.get('files', {}).values())
+            if not files:
+                continue
+            path = os.path.abspath(os.path.join(base_directory, files[0]) if base_directory else files[0])
+            phash = int(frame['phash'], 16) if frame.get('phash') else hasher(path)
+            rows.append((_to_signed(phash), os.path.abspath(video_path), frame['timestamp'],
+                         frame.get('frame_number'), path, now))
+        if not rows:
+            return 0
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO frames (hash, video, timestamp, frame_number, path, added) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET hash = excluded.hash, video = excluded.video, "
+                    "timestamp = excluded.timestamp, frame_number = excluded.frame_number, added = excluded.added",
+                    rows)
+            self._update_loaded([row[4] for row in rows])
+        return len(rows)
+    
+    def add_manifest(self, manifest_path: str, hasher: Callable[[str], int] = image_hash) -> int:
+        """Index every frame of a saved extraction manifest"""
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return self.add_frames(data['video'], data.get('frames', []), os.path.dirname(os.path.abspath(manifest_path)),
+                               hasher)
+    
+    def add_directory(self, directory: str) -> int:
+        """Index every *_manifest.json in an export directory"""
+        return sum(self.add_manifest(path) for path in sorted(glob.glob(os.path.join(directory, "*_manifest.json"))))
+    
+    def nearest(self, phash: int, k: int = 10, max_distance: Optional[int] = None) -> List[FrameMatch]:
+        """Up to k indexed frames closest to phash by Hamming distance, nearest first"""
+        with self._lock:
+            self._refresh()
+            if max_distance is not None and max_distance // CHUNK_COUNT <= MAX_CHUNK_RADIUS:
+                positions = self._candidates(phash, max_distance)
+            else:
+                positions = np.arange(len(self._ids))
+            if not len(positions):
+                return []
+            distances = hamming_distances(self._hashes[positions], phash)
+            if max_distance is not None:
+                keep = distances <= max_distance
+                positions, distances = positions[keep], distances[keep]
+            if len(positions) > k:
+                best = np.argpartition(distances, k - 1)[:k]
+                positions, distances = positions[best], distances[best]
+            order = np.lexsort((self._ids[positions], distances))
+            found = {int(self._ids[p]): int(d) for p, d in zip(positions[order], distances[order])}
+            return self._matches(found)
+    
+    def nearest_to_image(self, filepath: str, k: int = 10, max_distance: Optional[int] = None) -> List[FrameMatch]:
+        return self.nearest(image_hash(filepath), k, max_distance)
+    
+    def remove_missing(self) -> int:
+        """Drop entries whose frame file no longer exists"""
+        with self._lock:
+            missing = [(row['id'],) for row in self._db.execute("SELECT id, path FROM frames")
+                       if not os.path.exists(row['path'])]
+            with self._db:
+                self._db.executemany("DELETE FROM frames WHERE id = ?", missing)
+            self._ids = np.empty(0, dtype=np.int64)
+            self._hashes = np.empty(0, dtype=np.uint64)
+            self._chunk_tables = None
+            return len(missing)
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+    
+    def _refresh(self):
+        """Load rows added since the last query, including those written by other processes"""
+        last_id = int(self._ids[-1]) if len(self._ids) else 0
+        rows = self._db.execute("SELECT id, hash FROM frames WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        if rows:
+            self._append([row[0] for row in rows], [row[1] for row in rows])
+    
+    def _append(self, ids: List[int], signed_hashes: List[int]):
+        self._ids = np.concatenate([self._ids, np.array(ids, dtype=np.int64)])
+        self._hashes = np.concatenate([self._hashes, np.array(signed_hashes, dtype=np.int64).view(np.uint64)])
+        self._chunk_tables = None
+    
+    def _update_loaded(self, paths: List[str]):
+        """Apply upserted rows to the loaded arrays: replace hashes of known ids, leave new ids to _refresh"""
+        if not len(self._ids):
+            return
+        rows = []
+        for start in range(0, len(paths), SQL_BATCH):
+            batch = paths[start:start + SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows += self._db.execute(f"SELECT id, hash FROM frames WHERE path IN ({placeholders})", batch).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        positions = np.searchsorted(self._ids, ids)
+        known = (positions < len(self._ids)) & (self._ids[np.minimum(positions, len(self._ids) - 1)] == ids)
+        if known.any():
+            hashes = np.array([row[1] for row in rows], dtype=np.int64).view(np.uint64)
+            self._hashes[positions[known]] = hashes[known]
+            self._chunk_tables = None
+    
+    def _chunks(self) -> List[tuple]:
+        """Per chunk: (sorted chunk values, positions in that order), rebuilt after the arrays change"""
+        if self._chunk_tables is None:
+            self._chunk_tables = []
+            for c in range(CHUNK_COUNT):
+                values = ((self._hashes >> np.uint64(c * CHUNK_BITS)) & np.uint64(0xFFFF)).astype(np.uint16)
+                order = np.argsort(values, kind="stable")
+                self._chunk_tables.append((values[order], order))
+        return self._chunk_tables
+    
+    def _candidates(self, phash: int, max_distance: int) -> np.ndarray:
+        """Positions whose hash is within max_distance // 4 bits of phash in at least one chunk"""
+        radius = max_distance // CHUNK_COUNT
+        found = []
+        for c, (values, order) in enumerate(self._chunks()):
+            probes = np.array(_chunk_values((phash >> (c * CHUNK_BITS)) & 0xFFFF, radius), dtype=np.uint16)
+            starts = np.searchsorted(values, probes, side="left")
+            stops = np.searchsorted(values, probes, side="right")
+            found.extend(order[start:stop] for start, stop in zip(starts, stops) if stop > start)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+    
+    def _matches(self, distances: Dict[int, int]) -> List[FrameMatch]:
+        placeholders = ",".join("?" * len(distances))
+        rows = {row['id']: row for row in self._db.execute(
+            f"SELECT * FROM frames WHERE id IN ({placeholders})", list(distances))}
+        matches = []
+        for frame_id, distance in distances.items():
+            row = rows.get(frame_id)
+            if row is not None:
+                matches.append(FrameMatch(frame_id, distance, row['hash'] & ((1 << HASH_BITS) - 1), row['video'],
+                                          row['timestamp'], row['frame_number'], row['path']))
+        return matches
+
+
+_default_index: Optional[FrameIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_frame_index() -> FrameIndex:
+    """Get the process-wide frame index in the app data directory"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = FrameIndex()
+        return _default_index
@@ -0,0 +1,303 @@
+"""
+Raw ffmpeg frame reader with preallocated, recyclable frame buffers
+"""
+import queue
+import subprocess
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+from imageio_ffmpeg import get_ffmpeg_exe
+from moviepy.tools import cross_platform_popen_params
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from ..utils.profiling import NULL_PROFILER
+
+
+DEFAULT_SEEK_THRESHOLD = 100
+YUV420_FILTER = "scale=out_color_matrix=bt601:out_range=pc"
+
+
+def probe_video(video_path: str) -> dict:
+    """Get duration, fps, frame count and display size of a video"""
+    infos = ffmpeg_parse_infos(video_path)
+    width, height = infos['video_size']
+    if infos.get('video_rotation', 0) in (90, 270):
+        width, height = height, width
+    return {
+        'duration': infos['duration'],
+        'fps': infos['video_fps'],
+        'n_frames': infos.get('video_n_frames'),
+        'width': width,
+        'height': height,
+        'codec': infos.get('video_codec_name'),
+        'has_audio': infos.get('audio_found', False),
+    }
+
+
+def probe_keyframes(video_path: str) -> List[float]:
+    """Keyframe timestamps of the first video stream, read from packet flags without decoding"""
+    cmd = [get_ffmpeg_exe(), "-v", "error", "-i", video_path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    popen_params = cross_platform_popen_params({
+        "stdout": subprocess.PIPE,
+        "stderr": subprocess.DEVNULL,
+        "stdin": subprocess.DEVNULL,
+    })
+    output = subprocess.run(cmd, **popen_params).stdout.decode("utf-8", "replace")
+    
+    time_base = None
+    keyframes = []
+    for line in output.splitlines():
+        if line.startswith("#tb 0:"):
+            num, _, den = line.split(":", 1)[1].strip().partition("/")
+            time_base = int(num) / int(den)
+        elif line and not line.startswith("#") and time_base:
+            fields = [field.strip() for field in line.split(",")]
+            flags = [field for field in fields[6:] if field.startswith("F=")]
+            if not flags or int(flags[0][2:], 16) & 1:
+                keyframes.append(int(fields[2]) * time_base)
+    return sorted(keyframes)
+
+
+def gop_length(keyframes: List[float], fps: float, default: int = DEFAULT_SEEK_THRESHOLD) -> int:
+    """Median keyframe spacing in frames"""
+    gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]) if b > a)
+    if not gaps:
+        return default
+    return max(1, int(round(gaps[len(gaps) // 2] * fps)))
+
+
+def cluster_frame_numbers(frame_numbers: List[int], max_gap: int) -> List[List[int]]:
+    """Group sorted frame numbers into runs decoded sequentially; a gap above max_gap starts a new run with a seek"""
+    clusters: List[List[int]] = []
+    for frame_number in frame_numbers:
+        if clusters and frame_number - clusters[-1][-1] <= max_gap:
+            clusters[-1].append(frame_number)
+        else:
+            clusters.append([frame_number])
+    return clusters
+
+
+def frame_number_at(timestamp: float, fps: float) -> int:
+    """Index of the frame displayed at timestamp (same rounding as moviepy)"""
+    return int(fps * timestamp + 0.00001)
+
+
+def frame_shape(width: int, height: int, pix_fmt: str = "rgb24") -> Tuple[int, ...]:
+    """Array shape of one raw frame in the given pixel format"""
+    if pix_fmt == "rgb24":
+        return (height, width, 3)
+    if pix_fmt == "yuv420p":
+        return (width * height * 3 // 2,)
+    raise ValueError(f"Unsupported pixel format: {pix_fmt}")
+
+
+def supports_yuv420(width: int, height: int) -> bool:
+    """Whether frames of this size can use the planar 4:2:0 path (needs even dimensions)"""
+    return width % 2 == 0 and height % 2 == 0
+
+
+def yuv420_planes(frame: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Split a flat yuv420p frame into Y, U and V plane views"""
+    luma_size = width * height
+    chroma_size = luma_size // 4
+    y = frame[:luma_size].reshape(height, width)
+    u = frame[luma_size:luma_size + chroma_size].reshape(height // 2, width // 2)
+    v = frame[luma_size + chroma_size:luma_size + 2 * chroma_size].reshape(height // 2, width // 2)
+    return y, u, v
+
+
+class FrameBuffer:
+    """One preallocated frame slot checked out of a FrameRing"""
+    
+    def __init__(self, ring: "FrameRing", index: int, array: np.ndarray):
+        self.ring = ring
+        self.index = index
+        self.array = array
+        self.frame_number = -1
+        self.timestamp = 0.0
+        self.refs = 0
+    
+    def retain(self):
+        """Add a holder; the buffer returns to the ring once every holder has released it"""
+        with self.ring.lock:
+            self.refs += 1
+    
+    def release(self):
+        """Drop a holder and return the buffer to its ring when none are left"""
+        with self.ring.lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+        self.ring.release(self)
+
+
+class FrameRing:
+    """Fixed set of frame buffers shared by the decoder and encoders; acquire blocks when all are in use"""
+    
+    def __init__(self, shape: Tuple[int, ...], count: int, dtype=np.uint8):
+        self.shape = shape
+        self.lock = threading.Lock()
+        self.buffers = [FrameBuffer(self, i, np.empty(shape, dtype=dtype)) for i in range(max(1, count))]
+        self._free: "queue.Queue[FrameBuffer]" = queue.Queue()
+        for buffer in self.buffers:
+            self._free.put(buffer)
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.array.nbytes for buffer in self.buffers)
+    
+    def acquire(self, timeout: Optional[float] = None) -> FrameBuffer:
+        buffer = self._free.get(timeout=timeout)
+        buffer.refs = 1
+        return buffer
+    
+    def release(self, buffer: FrameBuffer):
+        self._free.put(buffer)
+
+
+class RawFrameReader:
+    """Streams consecutive raw frames from an ffmpeg pipe into caller-provided arrays"""
+    
+    def __init__(self, video_path: str, width: int, height: int, fps: float,
+                 start_frame: int = 0, pix_fmt: str = "rgb24", extra_filters: Optional[str] = None):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.next_frame = start_frame
+        self.frame_bytes = int(np.prod(frame_shape(width, height, pix_fmt)))
+        self._scratch = np.empty(self.frame_bytes, dtype=np.uint8)
+        
+        cmd = [get_ffmpeg_exe(), "-v", "error"]
+        if start_frame > 0:
+            cmd += ["-ss", f"{(start_frame - 0.5) / fps:.6f}"]
+        cmd += ["-i", video_path, "-an", "-sn"]
+        if extra_filters:
+            cmd += ["-vf", extra_filters]
+        cmd += ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-"]
+        popen_params = cross_platform_popen_params({
+            "bufsize": self.frame_bytes,
+            "stdout": subprocess.PIPE,
+            "stderr": subprocess.DEVNULL,
+            "stdin": subprocess.DEVNULL,
+        })
+        self.process = subprocess.Popen(cmd, **popen_params)
+    
+    def read_into(self, array: np.ndarray) -> bool:
+        """Fill array with the next frame; returns False at end of stream"""
+        view = memoryview(array).cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.process.stdout.readinto(view[filled:self.frame_bytes])
+            if not count:
+                return False
+            filled += count
+        self.next_frame += 1
+        return True
+    
+    def skip(self) -> bool:
+        """Discard the next frame without allocating"""
+        return self.read_into(self._scratch)
+    
+    def close(self):
+        if self.process:
+            self.process.stdout.close()
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
+
+
+class FrameSource:
+    """Frame-number access over sequential decoding, re-seeking for long or backward jumps"""
+    
+    def __init__(self, video_path: str, info: Optional[dict] = None, pix_fmt: str = "rgb24",
+                 seek_threshold: int = DEFAULT_SEEK_THRESHOLD, size: Optional[Tuple[int, int]] = None):
+        self.video_path = video_path
+        self.info = info or probe_video(video_path)
+        self.pix_fmt = pix_fmt
+        self.seek_threshold = seek_threshold
+        self.size = size
+        self.reader: Optional[RawFrameReader] = None
+        self.profiler = NULL_PROFILER
+    
+    @property
+    def fps(self) -> float:
+        return self.info['fps']
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return frame_shape(self.width, self.height, self.pix_fmt)
+    
+    @property
+    def width(self) -> int:
+        return self.size[0] if self.size else self.info['width']
+    
+    @property
+    def height(self) -> int:
+        return self.size[1] if self.size else self.info['height']
+    
+    def luma(self, buffer: FrameBuffer) -> np.ndarray:
+        """Luma plane view of a yuv420p buffer"""
+        return yuv420_planes(buffer.array, self.width, self.height)[0]
+    
+    def _open(self, frame_number: int):
+        self.close()
+        
+        filters = []
+        if self.size:
+            filters.append(f"scale={self.width}:{self.height}")
+        if self.pix_fmt == "yuv420p":
+            filters.append(YUV420_FILTER)
+        self.reader = RawFrameReader(self.video_path, self.width, self.height,
+                                     self.fps, frame_number, self.pix_fmt, ",".join(filters) or None)
+    
+    def read_frame(self, frame_number: int, buffer: FrameBuffer) -> bool:
+        """Decode frame_number into buffer; returns False past the end of the video"""
+        reader = self.reader
+        if (reader is None or frame_number < reader.next_frame
+                or frame_number - reader.next_frame > self.seek_threshold):
+            # a reopened decoder's first frame waits on the seek, so the whole read counts as seeking
+            with self.profiler.stage("seek"):
+                self._open(frame_number)
+                if not self._read_at(self.reader, frame_number, buffer):
+                    return False
+        else:
+            if reader.next_frame < frame_number:
+                with self.profiler.stage("skip"):
+                    while reader.next_frame < frame_number:
+                        if not reader.skip():
+                            return False
+            with self.profiler.stage("decode"):
+                if not reader.read_into(buffer.array):
+                    return False
+        buffer.frame_number = frame_number
+        buffer.timestamp = frame_number / self.fps
+        return True
+    
+    def _read_at(self, reader: RawFrameReader, frame_number: int, buffer: FrameBuffer) -> bool:
+        while reader.next_frame < frame_number:
+            if not reader.skip():
+                return False
+        return reader.read_into(buffer.array)
+    
+    def close(self):
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+
+
+def sample_frames(video_path: str, count: int = 6, info: Optional[dict] = None,
+                  pix_fmt: str = "rgb24") -> List[np.ndarray]:
+    """Decode count frames spread evenly across the video"""
+    source = FrameSource(video_path, info, pix_fmt)
+    try:
+        total = source.info.get('n_frames') or frame_number_at(source.info['duration'], source.fps)
+        ring = FrameRing(source.shape, 1)
+        frames = []
+        for i in range(count):
+            buffer = ring.acquire()
+            if source.read_frame(int(total * (i + 0.5) / count), buffer):
+                frames.append(buffer.array.copy())
+            buffer.release()
+        return frames
+    finally:
+        source.close()
@@ -0,0 +1,444 @@
+"""
+Local HTTP API for submitting extraction jobs and following their progress as Server-Sent Events
+"""
+import itertools
+import json
+import os
+import re
+import signal
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Tuple
+from .downloader import YouTubeDownloader
+from .encoders import ENCODERS, create_encoder
+from .reader_pool import get_reader_pool
+from .segment_exporter import SEGMENT_ACCURATE, SEGMENT_FAST, SegmentExporter
+from .task_manager import TASK_CANCELLED, TASK_FAILED, Task, TaskCancelled, get_task_manager
+from .video_processor import MODE_EXACT, MODE_SHARPEST, VideoProcessor
+from ..utils.helpers import get_app_data_dir
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_JOBS = 2
+KEEPALIVE_SECONDS = 15.0
+
+JOB_QUEUED = "queued"
+JOB_DOWNLOADING = "downloading"
+JOB_EXTRACTING = "extracting"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobRequestError(ValueError):
+    """A submitted job description is missing fields or has invalid values"""
+
+
+def parse_job_request(body: dict) -> dict:
+    """Validate a POST /jobs body and fill in defaults"""
+    if not isinstance(body, dict):
+        raise JobRequestError("Request body must be a JSON object")
+    source = body.get("source")
+    output = body.get("output")
+    if not isinstance(source, str) or not source:
+        raise JobRequestError("'source' (video path or URL) is required")
+    if not isinstance(output, str) or not output:
+        raise JobRequestError("'output' (export directory) is required")
+    try:
+        duration = float(body.get("duration", 2.0))
+        offsets = [float(offset) for offset in body.get("offsets") or [body.get("offset", 0.0)]]
+        sample_step = int(body.get("sample_step", 1))
+    except (TypeError, ValueError):
+        raise JobRequestError("'duration', 'offset(s)' and 'sample_step' must be numbers")
+    if duration <= 0 or sample_step < 1 or any(offset < 0 for offset in offsets):
+        raise JobRequestError("'duration' must be positive, offsets non-negative and 'sample_step' at least 1")
+    mode = body.get("mode", MODE_EXACT)
+    if mode not in (MODE_EXACT, MODE_SHARPEST):
+        raise JobRequestError(f"'mode' must be {MODE_EXACT} or {MODE_SHARPEST}")
+    image_format = body.get("format", "jpeg")
+    if image_format not in ENCODERS:
+        raise JobRequestError(f"'format' must be one of {', '.join(ENCODERS)}")
+    segments = body.get("segments")
+    if segments not in (None, SEGMENT_FAST, SEGMENT_ACCURATE):
+        raise JobRequestError(f"'segments' must be {SEGMENT_FAST} or {SEGMENT_ACCURATE}")
+    encoder_options = body.get("encoder_options") or {}
+    if not isinstance(encoder_options, dict):
+        raise JobRequestError("'encoder_options' must be an object")
+    return {
+        'source': source,
+        'output': os.path.abspath(output),
+        'duration': duration,
+        'offsets': offsets,
+        'mode': mode,
+        'sample_step': sample_step,
+        'format': image_format,
+        'encoder_options': encoder_options,
+        'segments': segments,
+    }
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+class ApiJob:
+    """One submitted job with its state and the ordered event history streamed to clients"""
+    
+    def __init__(self, job_id: int, request: dict):
+        self.job_id = job_id
+        self.request = request
+        self.state = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = 0.0
+        self.message = ""
+        self.outputs = 0
+        self.video_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.task: Optional[Task] = None
+        self.cancel_requested = False
+        self.events: List[Tuple[int, str, str]] = []
+        self.condition = threading.Condition()
+    
+    @property
+    def is_finished(self) -> bool:
+        return self.state in FINISHED_STATES
+    
+    def emit(self, event: str, **data):
+        with self.condition:
+            self.events.append((len(self.events), event, json.dumps(data)))
+            self.condition.notify_all()
+    
+    def wait_events(self, after: int, timeout: float) -> Tuple[List[Tuple[int, str, str]], bool]:
+        """Events with an id above after (waiting up to timeout for one) and whether the job has finished"""
+        with self.condition:
+            if len(self.events) <= after + 1 and not self.is_finished:
+                self.condition.wait(timeout)
+            return self.events[after + 1:], self.is_finished
+    
+    def as_dict(self) -> dict:
+        return {
+            'id': self.job_id,
+            'state': self.state,
+            'source': self.request['source'],
+            'output': self.request['output'],
+            'progress': self.progress,
+            'message': self.message,
+            'outputs': self.outputs,
+            'video_path': self.video_path,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobQueue:
+    """Runs API jobs on YouTubeDownloader and VideoProcessor, at most max_jobs at once, the rest in FIFO order"""
+    
+    def __init__(self, video_processor: Optional[VideoProcessor] = None,
+                 downloader: Optional[YouTubeDownloader] = None, segment_exporter: Optional[SegmentExporter] = None,
+                 max_jobs: int = DEFAULT_MAX_JOBS, download_dir: Optional[str] = None):
+        self.video_processor = video_processor or VideoProcessor()
+        self.downloader = downloader or YouTubeDownloader()
+        self.segment_exporter = segment_exporter or SegmentExporter(self.video_processor.task_manager)
+        self.task_manager = self.video_processor.task_manager
+        self.max_jobs = max(1, max_jobs)
+        self.download_dir = download_dir or get_app_data_dir("api", "downloads")
+        self.jobs: Dict[int, ApiJob] = {}
+        self._ids = itertools.count(1)
+        self._pending: Deque[ApiJob] = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, request: dict) -> ApiJob:
+        """Queue a validated request; it starts as soon as fewer than max_jobs are running"""
+        with self._lock:
+            job = ApiJob(next(self._ids), request)
+            self.jobs[job.job_id] = job
+            self._pending.append(job)
+            position = len(self._pending)
+        job.emit("state", state=JOB_QUEUED, position=position)
+        self._start_next()
+        return job
+    
+    def get(self, job_id: int) -> Optional[ApiJob]:
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def list(self) -> List[ApiJob]:
+        with self._lock:
+            return list(self.jobs.values())
+    
+    def cancel(self, job_id: int) -> Optional[ApiJob]:
+        """Cancel a queued or running job; running stages stop at their next checkpoint"""
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        with self._lock:
+            queued = job in self._pending
+            if queued:
+                self._pending.remove(job)
+        job.cancel_requested = True
+        if queued:
+            self._finish(job, JOB_CANCELLED, counted=False)
+            return job
+        if job.task:
+            # the task's done callback settles the job, also when it is cancelled before it starts
+            job.task.cancel()
+        return job
+    
+    def _start_next(self):
+        while True:
+            with self._lock:
+                if not self._pending or self._running >= self.max_jobs:
+                    return
+                job = self._pending.popleft()
+                self._running += 1
+            job.started_at = time.time()
+            try:
+                self._run(job)
+            except Exception as e:
+                self._finish(job, JOB_FAILED, error=str(e))
+    
+    def _set_state(self, job: ApiJob, state: str):
+        job.state = state
+        job.emit("state", state=state)
+    
+    def _finish(self, job: ApiJob, state: str, counted: bool = True, **fields):
+        with self._lock:
+            if job.is_finished:
+                return
+            job.state = state
+            job.finished_at = time.time()
+            job.error = fields.get('error', job.error)
+            job.outputs = fields.get('outputs', job.outputs)
+            if counted:
+                self._running -= 1
+        job.emit("end", **job.as_dict())
+        self._start_next()
+    
+    def _run(self, job: ApiJob):
+        source = job.request['source']
+        if not is_url(source):
+            self._extract(job, source)
+            return
+        
+        self._set_state(job, JOB_DOWNLOADING)
+        
+        def do_download(task: Task):
+            def progress_hook(d):
+                task.check()
+                if d.get('status') == 'downloading':
+                    total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                    downloaded = d.get('downloaded_bytes') or 0
+                    job.progress = downloaded / total * 100 if total else 0.0
+                    job.emit("download", downloaded=downloaded, total=total, percent=job.progress)
+            
+            def log(message: str):
+                job.message = message
+                job.emit("log", message=message)
+            
+            try:
+                path = self.downloader.download_url(source, progress_hook, log, self.download_dir)
+                task.check()
+                if not path or not os.path.exists(path):
+                    raise RuntimeError("Download produced no file")
+                self._extract(job, path)
+            except TaskCancelled:
+                self._finish(job, JOB_CANCELLED)
+            except Exception as e:
+                if job.cancel_requested:
+                    self._finish(job, JOB_CANCELLED)
+                else:
+                    self._finish(job, JOB_FAILED, error=f"Download failed - {e}")
+        
+        job.task = self.task_manager.submit(do_download, f"API job {job.job_id}: download", kind="download")
+        # a download cancelled before it starts never runs do_download
+        job.task.add_done_callback(lambda task: self._finish(job, JOB_CANCELLED)
+                                   if task.state == TASK_CANCELLED else None)
+    
+    def _extract(self, job: ApiJob, video_path: str):
+        request = job.request
+        if not os.path.isfile(video_path):
+            self._finish(job, JOB_FAILED, error=f"No such video file: {video_path}")
+            return
+        job.video_path = video_path
+        job.progress = 0.0
+        self._set_state(job, JOB_EXTRACTING)
+        os.makedirs(request['output'], exist_ok=True)
+        
+        def on_progress(progress_percent: float, message: str, current: int, total: int):
+            job.progress = progress_percent
+            job.message = message
+            job.outputs = current
+            job.emit("progress", percent=progress_percent, current=current, total=total, message=message)
+        
+        def on_completion(count: int, export_directory: str):
+            job.outputs = count
+        
+        def on_error(error: str):
+            self._finish(job, JOB_CANCELLED if job.cancel_requested else JOB_FAILED, error=error)
+        
+        if request['segments']:
+            job.task = self.segment_exporter.export_segments(
+                video_path, request['output'], request['duration'], request['offsets'][0],
+                on_progress, on_completion, on_error, mode=request['segments'])
+        else:
+            job.task = self.video_processor.cut_video_to_images(
+                video_path, request['output'], request['duration'], request['offsets'][0],
+                on_progress, on_completion, on_error,
+                mode=request['mode'], sample_step=request['sample_step'],
+                encoder=create_encoder(request['format'], **request['encoder_options']),
+                offsets=request['offsets'])
+        job.task.add_done_callback(lambda task: self._settle(job, task))
+        if job.cancel_requested:
+            job.task.cancel()
+    
+    def _settle(self, job: ApiJob, task: Task):
+        """Finish an extracting job from its task's final state; a cancelled cut also reports completion"""
+        if task.state == TASK_CANCELLED or job.cancel_requested:
+            self._finish(job, JOB_CANCELLED)
+        elif task.state == TASK_FAILED:
+            self._finish(job, JOB_FAILED, error=task.error)
+        else:
+            self._finish(job, JOB_COMPLETED)
+    
+    def shutdown(self):
+        """Cancel every unfinished job"""
+        for job in self.list():
+            if not job.is_finished:
+                self.cancel(job.job_id)
+
+
+class JobApiHandler(BaseHTTPRequestHandler):
+    """POST /jobs, GET /jobs, GET /jobs/<id>, GET /jobs/<id>/events (SSE), DELETE /jobs/<id>, GET /health"""
+    
+    server_version = "SMV-Extracter"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    @property
+    def queue(self) -> JobQueue:
+        return self.server.queue
+    
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _route(self) -> Tuple[Optional[ApiJob], Optional[str]]:
+        """The job named in the path (or None) and the trailing sub-resource"""
+        match = re.fullmatch(r"/jobs/(\d+)(/events)?/?", self.path.split("?", 1)[0])
+        if not match:
+            return None, None
+        return self.queue.get(int(match.group(1))), match.group(2) or ""
+    
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/health":
+            self._send_json(200, {'status': 'ok', 'max_jobs': self.queue.max_jobs})
+            return
+        if path == "/jobs":
+            self._send_json(200, {'jobs': [job.as_dict() for job in self.queue.list()]})
+            return
+        job, sub = self._route()
+        if job is None:
+            self._send_json(404, {'error': 'Not found'})
+        elif sub == "/events":
+            self._stream_events(job)
+        else:
+            self._send_json(200, job.as_dict())
+    
+    def do_POST(self):
+        if self.path.split("?", 1)[0].rstrip("/") != "/jobs":
+            self._send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = parse_job_request(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, JobRequestError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        job = self.queue.submit(request)
+        self.send_response(202)
+        body = json.dumps(job.as_dict()).encode("utf-8")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Location", f"/jobs/{job.job_id}")
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_DELETE(self):
+        job, sub = self._route()
+        if job is None or sub:
+            self._send_json(404, {'error': 'Not found'})
+            return
+        self._send_json(200, self.queue.cancel(job.job_id).as_dict())
+    
+    def _stream_events(self, job: ApiJob):
+        """Replay the job's events after Last-Event-ID, then stream new ones until the job ends"""
+        try:
+            last = int(self.headers.get("Last-Event-ID", -1))
+        except ValueError:
+            last = -1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            while True:
+                events, finished = job.wait_events(last, KEEPALIVE_SECONDS)
+                for event_id, event, data in events:
+                    self.wfile.write(f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode("utf-8"))
+                    last = event_id
+                if not events:
+                    if finished:
+                        return
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class JobApiServer(ThreadingHTTPServer):
+    """Threaded HTTP server bound to a JobQueue"""
+    
+    daemon_threads = True
+    
+    def __init__(self, queue: JobQueue, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.queue = queue
+        super().__init__((host, port), JobApiHandler)
+
+
+def serve_jobs(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, max_jobs: int = DEFAULT_MAX_JOBS,
+               log=print) -> int:
+    """Serve the job API in the foreground until interrupted (Ctrl+C or SIGTERM), cancelling unfinished jobs"""
+    queue = JobQueue(max_jobs=max_jobs)
+    server = JobApiServer(queue, host, port)
+    if threading.current_thread() is threading.main_thread():
+        # shutdown() waits for serve_forever, so it cannot run inside the handler on the serving thread
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    log(f"Job API listening on http://{server.server_address[0]}:{server.server_address[1]} "
+        f"({queue.max_jobs} concurrent job(s))")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log("Stopping job API; cancelling unfinished jobs...")
+        server.server_close()
+        queue.shutdown()
+        get_task_manager().shutdown()
+        get_reader_pool().close()
+    return 0
@@ -0,0 +1,263 @@
+"""
+Content-addressed local media store shared between runs
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+from ..utils.helpers import get_app_data_dir, safe_filename_part
+
+
+SAMPLE_SIZE = 1024 * 1024
+SAMPLE_COUNT = 8
+DEFAULT_QUOTA_BYTES = 20 * 1024 * 1024 * 1024
+
+
+def content_digest(file_path: str) -> str:
+    """Fingerprint a media file by its size and sampled content
+
+    Small files are hashed completely; large ones hash the size plus evenly
+    spaced 1 MB samples, which keeps lookups O(1) for multi-GB videos.
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(size).encode())
+    with open(file_path, 'rb') as f:
+        if size <= SAMPLE_SIZE * (SAMPLE_COUNT + 2):
+            for chunk in iter(lambda: f.read(SAMPLE_SIZE), b''):
+                digest.update(chunk)
+        else:
+            step = (size - SAMPLE_SIZE) // (SAMPLE_COUNT + 1)
+            for i in range(SAMPLE_COUNT + 2):
+                f.seek(min(i * step, size - SAMPLE_SIZE))
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+class MediaEntry:
+    """A stored media item together with its sidecar metadata"""
+    
+    def __init__(self, digest: str, directory: str, meta: dict):
+        self.digest = digest
+        self.directory = directory
+        self.meta = meta
+    
+    @property
+    def media_path(self) -> Optional[str]:
+        """Path of the media file, preferring the store-owned copy"""
+        owned = self.meta.get('owned_file')
+        if owned:
+            path = os.path.join(self.directory, owned)
+            if os.path.exists(path):
+                return path
+        for source in self.meta.get('local_paths', []):
+            if os.path.exists(source):
+                return source
+        return None
+    
+    @property
+    def probe(self) -> dict:
+        return self.meta.setdefault('probe', {})
+    
+    @property
+    def size(self) -> int:
+        return self.meta.get('size', 0)
+    
+    def name_stem(self, file_path: str) -> str:
+        """Stem for output file names: the recorded title for store-owned media, else the file's own name"""
+        owned = self.meta.get('owned_file')
+        if owned and self.meta.get('title') and (
+                os.path.abspath(file_path) == os.path.abspath(os.path.join(self.directory, owned))):
+            return self.meta['title']
+        return os.path.splitext(os.path.basename(file_path))[0]
+
+
+class MediaStore:
+    """Deduplicates media by video ID and content hash, with LRU eviction under a quota"""
+    
+    def __init__(self, root: Optional[str] = None, quota_bytes: int = DEFAULT_QUOTA_BYTES):
+        self.root = root or get_app_data_dir("media")
+        self.quota_bytes = quota_bytes
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.staging_dir = os.path.join(self.root, "staging")
+        self.index_path = os.path.join(self.root, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._index = self._load_index()
+    
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault('remote', {})
+        index.setdefault('local', {})
+        return index
+    
+    def _save_index(self):
+        self._write_json(self.index_path, self._index)
+    
+    def _write_json(self, path: str, data: dict):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, path)
+    
+    def _entry_dir(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+    
+    def _load_entry(self, digest: str) -> MediaEntry:
+        directory = self._entry_dir(digest)
+        meta = {}
+        try:
+            with open(os.path.join(directory, "meta.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            os.makedirs(directory, exist_ok=True)
+        meta.setdefault('local_paths', [])
+        meta.setdefault('remote_keys', [])
+        return MediaEntry(digest, directory, meta)
+    
+    def save_entry(self, entry: MediaEntry):
+        """Persist an entry's metadata"""
+        with self._lock:
+            os.makedirs(entry.directory, exist_ok=True)
+            self._write_json(os.path.join(entry.directory, "meta.json"), entry.meta)
+    
+    def save_probe(self, entry: MediaEntry, probe: dict):
+        """Store probe results (duration, fps, width, height, ...) next to the media"""
+        with self._lock:
+            entry.probe.update(probe)
+            self.save_entry(entry)
+    
+    def touch(self, entry: MediaEntry):
+        """Mark an entry as recently used"""
+        with self._lock:
+            entry.meta['last_access'] = time.time()
+            self.save_entry(entry)
+    
+    def resolve_local(self, file_path: str) -> MediaEntry:
+        """Resolve a local file to its store entry, hashing it only when it changed"""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self._lock:
+            cached = self._index['local'].get(file_path)
+            if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+                digest = cached[2]
+            else:
+                digest = content_digest(file_path)
+                self._index['local'][file_path] = [stat.st_size, stat.st_mtime_ns, digest]
+                self._save_index()
+            
+            entry = self._load_entry(digest)
+            entry.meta['size'] = stat.st_size
+            if file_path not in entry.meta['local_paths'] and not self._is_owned_path(entry, file_path):
+                entry.meta['local_paths'].append(file_path)
+            self.touch(entry)
+            return entry
+    
+    def lookup_remote(self, remote_key: str) -> Optional[MediaEntry]:
+        """Find a previously downloaded video by its extractor/ID key"""
+        with self._lock:
+            digest = self._index['remote'].get(remote_key)
+            if not digest:
+                return None
+            entry = self._load_entry(digest)
+            if not entry.media_path:
+                del self._index['remote'][remote_key]
+                self._save_index()
+                return None
+            self.touch(entry)
+            return entry
+    
+    def ingest_download(self, file_path: str, remote_key: Optional[str] = None,
+                        title: Optional[str] = None) -> MediaEntry:
+        """Move a finished download into the store, deduplicating by content
+
+        The stored file is always named media.<ext>, so the title is kept as
+        the stem extraction outputs are named after.
+        """
+        digest = content_digest(file_path)
+        with self._lock:
+            entry = self._load_entry(digest)
+            if entry.meta.get('owned_file') and os.path.exists(os.path.join(entry.directory, entry.meta['owned_file'])):
+                os.remove(file_path)
+            else:
+                owned_file = "media" + os.path.splitext(file_path)[1]
+                shutil.move(file_path, os.path.join(entry.directory, owned_file))
+                entry.meta['owned_file'] = owned_file
+            entry.meta['size'] = os.path.getsize(os.path.join(entry.directory, entry.meta['owned_file']))
+            self._set_title(entry, title)
+            if remote_key:
+                if remote_key not in entry.meta['remote_keys']:
+                    entry.meta['remote_keys'].append(remote_key)
+                self._index['remote'][remote_key] = digest
+                self._save_index()
+            self.touch(entry)
+        self.evict()
+        return entry
+    
+    def record_title(self, entry: MediaEntry, title: Optional[str]):
+        """Remember the title as the output name stem of an entry that has none yet"""
+        with self._lock:
+            if self._set_title(entry, title):
+                self.save_entry(entry)
+    
+    def _set_title(self, entry: MediaEntry, title: Optional[str]) -> bool:
+        stem = safe_filename_part(title or "", max_length=80)
+        if not stem or entry.meta.get('title'):
+            return False
+        entry.meta['title'] = stem
+        return True
+    
+    def _is_owned_path(self, entry: MediaEntry, file_path: str) -> bool:
+        owned = entry.meta.get('owned_file')
+        return bool(owned) and os.path.abspath(os.path.join(entry.directory, owned)) == file_path
+    
+    def _owned_entries(self) -> List[MediaEntry]:
+        entries = []
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                entry = self._load_entry(digest)
+                if entry.meta.get('owned_file'):
+                    entries.append(entry)
+        return entries
+    
+    def evict(self, quota_bytes: Optional[int] = None) -> List[str]:
+        """Delete least-recently-used owned media until usage fits the quota"""
+        quota = self.quota_bytes if quota_bytes is None else quota_bytes
+        evicted = []
+        with self._lock:
+            entries = sorted(self._owned_entries(), key=lambda e: e.meta.get('last_access', 0))
+            usage = sum(entry.size for entry in entries)
+            for entry in entries[:-1]:
+                if usage <= quota:
+                    break
+                owned_path = os.path.join(entry.directory, entry.meta.pop('owned_file'))
+                if os.path.exists(owned_path):
+                    os.remove(owned_path)
+                usage -= entry.size
+                self._drop_remote_keys(entry)
+                if entry.meta['local_paths']:
+                    self.save_entry(entry)
+                else:
+                    shutil.rmtree(entry.directory, ignore_errors=True)
+                evicted.append(entry.digest)
+            if evicted:
+                self._save_index()
+        return evicted
+    
+    def _drop_remote_keys(self, entry: MediaEntry):
+        remote: Dict[str, str] = self._index['remote']
+        for key in entry.meta.get('remote_keys', []):
+            if remote.get(key) == entry.digest:
+                del remote[key]
+        entry.meta['remote_keys'] = []
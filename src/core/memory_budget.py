@@ -0,0 +1,167 @@
+"""
+Process memory budget for frame buffers, with RSS instrumentation
+"""
+import os
+import sys
+import threading
+from typing import Dict, Optional
+
+
+BUDGET_ENV = "SMV_EXTRACTER_MEMORY_MB"
+DEFAULT_BUDGET_MB = 1024
+
+SUBSYSTEM_EXTRACTION = "extraction"
+SUBSYSTEM_PREVIEW = "preview"
+
+
+def _read_proc_status(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes, or None where it cannot be read"""
+    rss = _read_proc_status("VmRSS")
+    if rss is not None:
+        return rss
+    if os.name == "nt":
+        try:
+            import ctypes
+            from ctypes import wintypes
+            
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                        "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+            
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        except (AttributeError, OSError):
+            pass
+    return None
+
+
+def peak_rss() -> Optional[int]:
+    """Highest resident set size this process has reached, in bytes"""
+    peak = _read_proc_status("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def format_megabytes(size_bytes: Optional[int]) -> str:
+    return "n/a" if size_bytes is None else f"{size_bytes / (1024 * 1024):.1f} MB"
+
+
+class MemoryBudget:
+    """Byte budget that long-lived buffers (frame rings, frame caches, preview images) are reserved from"""
+    
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self._lock = threading.Lock()
+        self._usage: Dict[str, int] = {}
+        self._peak: Dict[str, int] = {}
+        self._peak_reserved = 0
+    
+    @property
+    def reserved(self) -> int:
+        with self._lock:
+            return sum(self._usage.values())
+    
+    @property
+    def peak_reserved(self) -> int:
+        """Highest total reserved across all subsystems; above limit_bytes only if a reserve() went over"""
+        with self._lock:
+            return self._peak_reserved
+    
+    @property
+    def available(self) -> int:
+        return max(0, self.limit_bytes - self.reserved)
+    
+    def fit_count(self, item_bytes: int, wanted: int, minimum: int = 1, extra_bytes: int = 0) -> int:
+        """How many buffers of item_bytes to allocate next to extra_bytes: wanted if they fit, never fewer than minimum"""
+        fits = max(0, self.available - extra_bytes) // max(1, item_bytes)
+        return max(minimum, min(wanted, fits))
+    
+    def try_reserve(self, subsystem: str, nbytes: int) -> bool:
+        """Reserve nbytes only if they fit in what is left of the budget"""
+        with self._lock:
+            if sum(self._usage.values()) + nbytes > self.limit_bytes:
+                return False
+            self._add(subsystem, nbytes)
+            return True
+    
+    def reserve(self, subsystem: str, nbytes: int):
+        """
+        Record nbytes as held by subsystem without checking the limit.
+        
+        Only for memory a subsystem cannot run without: extraction sizes its frame ring with fit_count first, so
+        this goes over the limit only when the minimum ring plus working memory, the sprite canvases or the
+        preview on screen do not fit in what is left. Anything that can be dropped uses try_reserve instead.
+        """
+        with self._lock:
+            self._add(subsystem, nbytes)
+    
+    def release(self, subsystem: str, nbytes: int):
+        with self._lock:
+            self._usage[subsystem] = max(0, self._usage.get(subsystem, 0) - nbytes)
+    
+    def _add(self, subsystem: str, nbytes: int):
+        usage = self._usage.get(subsystem, 0) + nbytes
+        self._usage[subsystem] = usage
+        self._peak[subsystem] = max(self._peak.get(subsystem, 0), usage)
+        self._peak_reserved = max(self._peak_reserved, sum(self._usage.values()))
+    
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage)
+    
+    def peak_usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._peak)
+    
+    def report(self) -> str:
+        """One-line summary of RSS and the buffers each subsystem holds (peak in brackets)"""
+        peaks = self.peak_usage()
+        parts = [f"{name} {format_megabytes(size)} [{format_megabytes(peaks.get(name, 0))}]"
+                 for name, size in sorted(self.usage().items())]
+        return (f"Memory: RSS {format_megabytes(current_rss())} (peak {format_megabytes(peak_rss())}); "
+                f"buffers {', '.join(parts) or 'none'} (peak {format_megabytes(self.peak_reserved)}) "
+                f"of {format_megabytes(self.limit_bytes)} budget")
+
+
+def budget_from_env() -> int:
+    """Budget in bytes from SMV_EXTRACTER_MEMORY_MB, falling back to DEFAULT_BUDGET_MB"""
+    try:
+        megabytes = float(os.environ.get(BUDGET_ENV, DEFAULT_BUDGET_MB))
+    except ValueError:
+        megabytes = DEFAULT_BUDGET_MB
+    return int(megabytes * 1024 * 1024)
+
+
+_default_budget: Optional[MemoryBudget] = None
+_default_lock = threading.Lock()
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Get the process-wide memory budget shared by extraction and previews"""
+    global _default_budget
+    with _default_lock:
+        if _default_budget is None:
+            _default_budget = MemoryBudget(budget_from_env())
+        return _default_budget
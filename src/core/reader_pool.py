@@ -0,0 +1,259 @@
+"""
+Pool of warm ffmpeg frame readers shared by previews, thumbnails and extraction
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .frame_reader import DEFAULT_SEEK_THRESHOLD, FrameRing, FrameSource, frame_number_at, probe_video
+from .media_store import MediaEntry, MediaStore
+from .memory_budget import SUBSYSTEM_PREVIEW, MemoryBudget, get_memory_budget
+from ..utils.profiling import NULL_PROFILER
+
+
+DEFAULT_MAX_OPEN = 4
+DEFAULT_IDLE_TIMEOUT = 60.0
+DEFAULT_CACHE_BYTES = 8 * 1024 * 1024
+# a stored probe is reused only if it has everything readers and cut planning need
+STORED_PROBE_FIELDS = ('duration', 'fps', 'width', 'height')
+
+
+class PooledReader:
+    """A FrameSource checked out of a ReaderPool, with a small cache of recently decoded frames"""
+    
+    def __init__(self, pool: "ReaderPool", key: tuple, source: FrameSource, cache_bytes: int):
+        self.pool = pool
+        self.key = key
+        self.source = source
+        self.last_used = time.monotonic()
+        self._ring: Optional[FrameRing] = None
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._cache_bytes = cache_bytes
+        self._cached_bytes = 0
+    
+    @property
+    def info(self) -> dict:
+        return self.source.info
+    
+    @property
+    def fps(self) -> float:
+        return self.source.fps
+    
+    def get_frame(self, frame_number: int) -> Optional[np.ndarray]:
+        """Decoded frame as a read-only array, or None past the end of the video"""
+        frame = self._cache.get(frame_number)
+        if frame is not None:
+            self._cache.move_to_end(frame_number)
+            return frame
+        
+        if self._ring is None:
+            self._ring = FrameRing(self.source.shape, 1)
+        buffer = self._ring.acquire()
+        try:
+            if not self.source.read_frame(frame_number, buffer):
+                return None
+            frame = buffer.array.copy()
+        finally:
+            buffer.release()
+        frame.flags.writeable = False
+        self._cache_frame(frame_number, frame)
+        return frame
+    
+    def _cache_frame(self, frame_number: int, frame: np.ndarray):
+        """Keep the frame while it fits both the per-reader cache size and the shared memory budget"""
+        budget = self.pool.memory_budget
+        while self._cache and self._cached_bytes + frame.nbytes > self._cache_bytes:
+            self._evict()
+        if frame.nbytes > self._cache_bytes:
+            return
+        while not budget.try_reserve(SUBSYSTEM_PREVIEW, frame.nbytes):
+            if not self._cache:
+                return
+            self._evict()
+        self._cache[frame_number] = frame
+        self._cached_bytes += frame.nbytes
+    
+    def _evict(self):
+        _, frame = self._cache.popitem(last=False)
+        self._cached_bytes -= frame.nbytes
+        self.pool.memory_budget.release(SUBSYSTEM_PREVIEW, frame.nbytes)
+    
+    def get_frame_at(self, timestamp: float) -> Optional[np.ndarray]:
+        """Decoded frame displayed at timestamp"""
+        return self.get_frame(frame_number_at(timestamp, self.fps))
+    
+    def release(self):
+        """Return the reader to its pool, keeping the decoder warm"""
+        self.pool.checkin(self)
+    
+    def discard(self):
+        """Close the reader instead of returning it, e.g. after a failed read"""
+        self.pool.checkin(self, keep=False)
+    
+    def close(self):
+        self.source.close()
+        while self._cache:
+            self._evict()
+        self._ring = None
+    
+    def __enter__(self) -> "PooledReader":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.release()
+        else:
+            self.discard()
+
+
+class ReaderPool:
+    """Keeps decoders warm per (file, output size, pixel format) so repeated reads skip ffmpeg startup and probing"""
+    
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES, memory_budget: Optional[MemoryBudget] = None,
+                 media_store: Optional[MediaStore] = None):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.cache_bytes = cache_bytes
+        self.memory_budget = memory_budget or get_memory_budget()
+        self.media_store = media_store
+        self._lock = threading.Lock()
+        self._idle: "OrderedDict[int, PooledReader]" = OrderedDict()
+        self._checked_out = 0
+        self._probes: Dict[str, Tuple[tuple, dict]] = {}
+        self._reaper: Optional[threading.Timer] = None
+        self._closed = False
+    
+    def _file_stamp(self, path: str) -> tuple:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    def probe(self, video_path: str) -> dict:
+        """Probe a video once and reuse the result until the file changes
+
+        With a media_store, the result is also kept with the file's store entry, so a new process skips ffmpeg
+        for files it has seen before.
+        """
+        path = os.path.abspath(video_path)
+        stamp = self._file_stamp(path)
+        with self._lock:
+            cached = self._probes.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        entry = self._store_entry(path)
+        info = None
+        if entry and all(entry.probe.get(field) for field in STORED_PROBE_FIELDS):
+            info = dict(entry.probe)
+        if info is None:
+            info = probe_video(path)
+            if entry:
+                try:
+                    self.media_store.save_probe(entry, info)
+                except OSError:
+                    pass
+        with self._lock:
+            self._probes[path] = (stamp, info)
+        return info
+    
+    def _store_entry(self, path: str) -> Optional[MediaEntry]:
+        if not self.media_store:
+            return None
+        try:
+            return self.media_store.resolve_local(path)
+        except OSError:
+            return None
+    
+    def checkout(self, video_path: str, size: Optional[Tuple[int, int]] = None, pix_fmt: str = "rgb24",
+                 seek_threshold: int = DEFAULT_SEEK_THRESHOLD) -> PooledReader:
+        """Take a warm reader for this file and output size, opening one if none is idle"""
+        info = self.probe(video_path)
+        key = (os.path.abspath(video_path), tuple(size) if size else None, pix_fmt)
+        expired = []
+        with self._lock:
+            reader = None
+            for reader_id, idle in self._idle.items():
+                if idle.key == key and idle.source.info is info:
+                    reader = self._idle.pop(reader_id)
+                    break
+            if reader is None:
+                while self._idle and len(self._idle) + self._checked_out >= self.max_open:
+                    expired.append(self._idle.popitem(last=False)[1])
+            self._checked_out += 1
+        for idle in expired:
+            idle.close()
+        
+        if reader is None:
+            source = FrameSource(key[0], info, pix_fmt=pix_fmt, seek_threshold=seek_threshold, size=key[1])
+            reader = PooledReader(self, key, source, self.cache_bytes)
+        reader.source.seek_threshold = seek_threshold
+        return reader
+    
+    def checkin(self, reader: PooledReader, keep: bool = True):
+        """Return a reader; it stays open until idle_timeout unless the pool is over max_open"""
+        reader.source.profiler = NULL_PROFILER
+        with self._lock:
+            self._checked_out = max(0, self._checked_out - 1)
+            keep = keep and not self._closed and len(self._idle) + self._checked_out < self.max_open
+            if keep:
+                reader.last_used = time.monotonic()
+                self._idle[id(reader)] = reader
+                self._schedule_reap()
+        if not keep:
+            reader.close()
+    
+    def _schedule_reap(self):
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = threading.Timer(self.idle_timeout, self._reap_idle)
+            self._reaper.daemon = True
+            self._reaper.start()
+    
+    def _reap_idle(self):
+        with self._lock:
+            self._reaper = None
+        self.reap()
+        with self._lock:
+            if self._idle and not self._closed:
+                self._schedule_reap()
+    
+    def reap(self) -> int:
+        """Close readers idle for longer than idle_timeout; returns how many were closed"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            expired: List[PooledReader] = [reader for reader in self._idle.values() if reader.last_used <= cutoff]
+            for reader in expired:
+                del self._idle[id(reader)]
+        for reader in expired:
+            reader.close()
+        return len(expired)
+    
+    @property
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+    
+    def close(self):
+        """Close every idle reader; readers still checked out are closed when returned"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle.values())
+            self._idle.clear()
+            if self._reaper:
+                self._reaper.cancel()
+                self._reaper = None
+        for reader in idle:
+            reader.close()
+
+
+_default_pool: Optional[ReaderPool] = None
+_default_lock = threading.Lock()
+
+
+def get_reader_pool() -> ReaderPool:
+    """Get the process-wide reader pool shared by previews, thumbnails and extraction"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = ReaderPool()
+        return _default_pool
@@ -0,0 +1,183 @@
+"""
+Output renditions and the manifest written for each extraction job
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from .encoders import ImageEncoder, JpegEncoder
+
+
+MANIFEST_VERSION = 1
+
+
+class Rendition:
+    """One output variant (size, encoder, directory) produced for every extracted frame"""
+    
+    def __init__(self, name: str, directory: str, encoder: Optional[ImageEncoder] = None,
+                 max_size: Optional[Tuple[int, int]] = None):
+        self.name = name
+        self.directory = directory
+        self.encoder = encoder or JpegEncoder(quality=95)
+        self.max_size = max_size
+        self.suffix = ""
+    
+    def target_size(self, width: int, height: int) -> Tuple[int, int]:
+        """Fit the frame inside max_size, keeping the aspect ratio and never upscaling"""
+        if not self.max_size:
+            return width, height
+        scale = min(self.max_size[0] / width, self.max_size[1] / height, 1.0)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    
+    def filename(self, base_name: str) -> str:
+        return f"{base_name}{self.suffix}{self.encoder.extension}"
+    
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'directory': self.directory,
+            'encoder': self.encoder.describe(),
+            'max_size': list(self.max_size) if self.max_size else None,
+        }
+
+
+def order_renditions(renditions: List[Rendition], width: int, height: int) -> List[Rendition]:
+    """Sort renditions largest first and give name suffixes to those sharing a file path"""
+    def area(rendition: Rendition) -> int:
+        target_width, target_height = rendition.target_size(width, height)
+        return target_width * target_height
+    
+    ordered = sorted(renditions, key=area, reverse=True)
+    for rendition in ordered:
+        clashes = [other for other in ordered if other is not rendition
+                   and os.path.abspath(other.directory) == os.path.abspath(rendition.directory)
+                   and other.encoder.extension == rendition.encoder.extension]
+        rendition.suffix = f"_{rendition.name}" if clashes else ""
+    return ordered
+
+
+def manifest_path(directory: str, video_name: str, kind: str = "manifest") -> str:
+    return os.path.join(directory, f"{video_name}_{kind}.json")
+
+
+class ExtractionManifest:
+    """Records every file written by one extraction job"""
+    
+    def __init__(self, video_path: str, settings: dict, renditions: List[Rendition]):
+        self.video_path = video_path
+        self.settings = settings
+        self.renditions = renditions
+        self.frames: List[dict] = []
+        self.issues: List[dict] = []
+    
+    def add_issue(self, kind: str, index: int, requested: Tuple[float, float], **fields):
+        """Record a requested output that was merged into another or not produced"""
+        issue = {
+            'kind': kind,
+            'index': index,
+            'requested_start': round(requested[0], 6),
+            'requested_end': round(requested[1], 6),
+        }
+        issue.update(fields)
+        self.issues.append(issue)
+    
+    def add_frame(self, index: int, timestamp: float, frame_number: int, files: Dict[str, str], **fields):
+        """Record the files written for one target; extra fields (offset, label, ...) are stored as given"""
+        frame = {
+            'index': index,
+            'timestamp': round(timestamp, 6),
+            'frame_number': frame_number,
+        }
+        frame.update(fields)
+        frame['files'] = files
+        self.frames.append(frame)
+    
+    def save(self, directory: str, video_name: str, kind: str = "manifest") -> str:
+        """Write {video_name}_{kind}.json with file paths relative to directory"""
+        path = manifest_path(directory, video_name, kind)
+        frames = []
+        for frame in sorted(self.frames, key=lambda f: (f['timestamp'], f.get('offset') or 0.0, f['index'])):
+            frame = dict(frame)
+            frame['files'] = {name: self._relative(filepath, directory) for name, filepath in frame['files'].items()}
+            frames.append(frame)
+        data = {
+            'version': MANIFEST_VERSION,
+            'video': os.path.abspath(self.video_path),
+            'created': time.time(),
+            'settings': self.settings,
+            'renditions': [rendition.to_dict() for rendition in self.renditions],
+            'frames': frames,
+        }
+        if self.issues:
+            data['issues'] = self.issues
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+    
+    def _relative(self, filepath: str, directory: str) -> str:
+        try:
+            return os.path.relpath(filepath, directory).replace(os.sep, "/")
+        except ValueError:
+            return filepath
+
+
+class PreviousExtraction:
+    """Frames an earlier interval cut recorded in the export directory, so a re-cut can reuse them"""
+    
+    def __init__(self, data: dict, directory: str):
+        self.video = data.get('video')
+        self.renditions = {rendition['name']: rendition for rendition in data.get('renditions', [])}
+        self.frames = []
+        for frame in data.get('frames', []):
+            frame = dict(frame)
+            frame['files'] = {name: os.path.normpath(os.path.join(directory, filepath))
+                              for name, filepath in frame.get('files', {}).items()}
+            self.frames.append(frame)
+    
+    @classmethod
+    def load(cls, directory: str, video_name: str, kind: str = "manifest") -> Optional["PreviousExtraction"]:
+        """Read the manifest a previous cut_video_to_images wrote here; None when there is none"""
+        try:
+            with open(manifest_path(directory, video_name, kind), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # timestamp-list manifests share the file name but have no interval plans
+        if 'plans' not in data.get('settings', {}):
+            return None
+        return cls(data, directory)
+    
+    def files(self) -> Set[str]:
+        return {os.path.abspath(filepath) for frame in self.frames for filepath in frame['files'].values()}
+    
+    def reusable_frames(self, video_path: str, renditions: List[Rendition]) -> Dict[int, dict]:
+        """Frames of the same video whose files exist for every rendition with unchanged settings, by frame number"""
+        if self.video != os.path.abspath(video_path):
+            return {}
+        for rendition in renditions:
+            previous = self.renditions.get(rendition.name)
+            current = rendition.to_dict()
+            if not previous or previous['encoder'] != current['encoder'] or previous['max_size'] != current['max_size']:
+                return {}
+        
+        frames = {}
+        for frame in self.frames:
+            if frame.get('frame_number') is None or frame['frame_number'] in frames:
+                continue
+            if all(os.path.exists(frame['files'].get(rendition.name, "")) for rendition in renditions):
+                frames[frame['frame_number']] = frame
+        return frames
+    
+    def stale_files(self, manifest: ExtractionManifest) -> List[str]:
+        """Files the previous manifest lists that the new one no longer does"""
+        current = {os.path.abspath(filepath) for frame in manifest.frames for filepath in frame['files'].values()}
+        return sorted(self.files() - current)
+    
+    def carry_over(self, manifest: ExtractionManifest):
+        """Keep previous frames the new manifest has not replaced, so an interrupted re-cut loses no files"""
+        current = {os.path.abspath(filepath) for frame in manifest.frames for filepath in frame['files'].values()}
+        for frame in self.frames:
+            if not any(os.path.abspath(filepath) in current for filepath in frame['files'].values()):
+                manifest.frames.append(frame)
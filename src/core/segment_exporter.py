@@ -0,0 +1,276 @@
+"""
+Video segment export with ffmpeg stream copy
+"""
+import csv
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Callable, List, Optional, Tuple
+from imageio_ffmpeg import get_ffmpeg_exe
+from moviepy.tools import cross_platform_popen_params
+from .frame_reader import probe_keyframes, probe_video
+from .renditions import ExtractionManifest, Rendition
+from .task_manager import PRIORITY_HIGH, Task, TaskCancelled, TaskManager, get_task_manager
+from ..utils.helpers import create_progress_bar
+
+
+SEGMENT_FAST = "fast"
+SEGMENT_ACCURATE = "accurate"
+
+COPY_CONTAINERS = (".mp4", ".mkv", ".mov", ".webm", ".ts")
+# Source codec -> (encoder for the partial GOPs, Annex-B bitstream filter)
+SMART_CUT_ENCODERS = {
+    'h264': ('libx264', 'h264_mp4toannexb'),
+    'hevc': ('libx265', 'hevc_mp4toannexb'),
+}
+KEYFRAME_EPSILON = 0.001
+
+
+def segment_ranges(video_duration: float, duration: float, offset: float) -> List[Tuple[float, float]]:
+    """Consecutive (start, end) ranges of length duration from offset; the remainder becomes a shorter last segment"""
+    ranges = []
+    start = offset
+    while start < video_duration - KEYFRAME_EPSILON:
+        end = min(start + duration, video_duration)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def match_segment_parts(parts: List[Tuple[str, float, float]], ranges: List[Tuple[float, float]],
+                        tolerance: float) -> Tuple[List[Tuple[int, Tuple[str, float, float], List[int]]], List[int]]:
+    """Pair muxer parts with requested ranges by start time
+    
+    The segment muxer cuts at the first keyframe at or after each requested
+    time, so a part belongs to the latest range starting at most tolerance
+    (the longest GOP) before it. Returns (range index, part, indices of other
+    ranges that start inside the part) for each matched part, plus the ranges
+    no part covers. Unmatched parts (the lead-in before the offset) are left out.
+    """
+    matched = []
+    for part in parts:
+        _, start, end = part
+        candidates = [i for i, (range_start, _) in enumerate(ranges)
+                      if range_start <= start + KEYFRAME_EPSILON and start - range_start <= tolerance]
+        if candidates:
+            matched.append((candidates[-1], part, []))
+    labels = {index for index, _, _ in matched}
+    missing = []
+    for i, (range_start, _) in enumerate(ranges):
+        if i in labels:
+            continue
+        holder = [entry for entry in matched if entry[1][1] - KEYFRAME_EPSILON <= range_start < entry[1][2]]
+        if holder:
+            holder[0][2].append(i)
+        else:
+            missing.append(i)
+    return matched, missing
+
+
+def run_ffmpeg(args: List[str], task: Optional[Task] = None,
+               on_time: Optional[Callable[[float], None]] = None):
+    """Run ffmpeg, reporting -progress output times and stopping it if the task is cancelled"""
+    cmd = [get_ffmpeg_exe(), "-v", "error", "-nostats", "-y", "-progress", "pipe:1"] + args
+    with tempfile.TemporaryFile() as errors:
+        popen_params = cross_platform_popen_params({
+            "stdout": subprocess.PIPE,
+            "stderr": errors,
+            "stdin": subprocess.DEVNULL,
+        })
+        process = subprocess.Popen(cmd, **popen_params)
+        try:
+            for raw_line in process.stdout:
+                if task:
+                    task.check()
+                key, _, value = raw_line.decode("utf-8", "replace").strip().partition("=")
+                if key == "out_time_us" and on_time and value.lstrip("-").isdigit():
+                    on_time(max(0, int(value)) / 1_000_000)
+        except TaskCancelled:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            process.stdout.close()
+        if process.wait() != 0:
+            errors.seek(0)
+            message = errors.read().decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(f"ffmpeg failed: {message[-1] if message else process.returncode}")
+
+
+class SegmentExporter:
+    """Splits a video into duration-length clips, stream-copying whole GOPs"""
+    
+    def __init__(self, task_manager: Optional[TaskManager] = None):
+        self.task_manager = task_manager or get_task_manager()
+    
+    def export_segments(self, video_path: str, export_directory: str, duration: float, offset: float,
+                        progress_callback: Callable[[float, str, int, int], None],
+                        completion_callback: Callable[[int, str], None],
+                        error_callback: Callable[[str], None],
+                        mode: str = SEGMENT_FAST, video_name: Optional[str] = None) -> Task:
+        """Export duration-length clips from offset; accurate mode re-encodes only the partial GOPs at the cuts
+        
+        video_name overrides the file name stem outputs are named after.
+        """
+        name_stem = video_name
+        def do_export(task: Task):
+            saved = [0]
+            try:
+                info = probe_video(video_path)
+                video_name, ext = os.path.splitext(os.path.basename(video_path))
+                video_name = name_stem or video_name
+                ext = ext.lower() if ext.lower() in COPY_CONTAINERS else ".mkv"
+                if mode == SEGMENT_ACCURATE and ext == ".webm":
+                    ext = ".mkv"
+                ranges = segment_ranges(info['duration'], duration, offset)
+                if not ranges:
+                    error_callback("Offset is beyond video duration")
+                    return
+                
+                os.makedirs(export_directory, exist_ok=True)
+                manifest = ExtractionManifest(video_path, {
+                    'duration': duration,
+                    'offset': offset,
+                    'segment_mode': mode,
+                }, [Rendition("segment", export_directory)])
+                
+                def name_for(i: int, start: float) -> str:
+                    return f"{video_name}_seg_{i+1:03d}_offset_{offset:.1f}s_at_{start:.1f}s{ext}"
+                
+                def report(done: int, message: str):
+                    progress_percent = (done / len(ranges)) * 100
+                    progress_bar = create_progress_bar(progress_percent)
+                    progress_callback(progress_percent, f"[{progress_bar}] {progress_percent:.1f}% - {message}",
+                                      done, len(ranges))
+                
+                progress_callback(0, f"Splitting video into {len(ranges)} segments from offset {offset:.1f}s "
+                                     f"({'accurate' if mode == SEGMENT_ACCURATE else 'keyframe'} cuts)...",
+                                  0, len(ranges))
+                try:
+                    if mode == SEGMENT_ACCURATE:
+                        self._export_accurate(task, video_path, info, ranges, export_directory, name_for,
+                                              manifest, saved, report)
+                    else:
+                        self._export_fast(task, video_path, ranges, export_directory, name_for, ext,
+                                          manifest, saved, report)
+                finally:
+                    manifest.save(export_directory, video_name, "segments")
+                completion_callback(saved[0], export_directory)
+            
+            except TaskCancelled:
+                progress_callback(0, f"Segment export cancelled after {saved[0]} segment(s)", saved[0], saved[0])
+                completion_callback(saved[0], export_directory)
+            except Exception as e:
+                error_callback(str(e))
+        
+        return self.task_manager.submit(do_export, f"Segments: {os.path.basename(video_path)}",
+                                        kind="extract", priority=PRIORITY_HIGH)
+    
+    def _export_fast(self, task: Task, video_path: str, ranges: List[Tuple[float, float]], export_directory: str,
+                     name_for: Callable[[int, float], str], ext: str, manifest: ExtractionManifest,
+                     saved: List[int], report: Callable[[int, str], None]):
+        """One stream-copy pass through the segment muxer; each cut lands on the next keyframe"""
+        work_dir = tempfile.mkdtemp(prefix=".segments_", dir=export_directory)
+        try:
+            lead_in = ranges[0][0] > KEYFRAME_EPSILON
+            cut_times = [start for start, _ in ranges[1:]]
+            if lead_in:
+                cut_times.insert(0, ranges[0][0])
+            list_path = os.path.join(work_dir, "segments.csv")
+            args = ["-i", video_path, "-map", "0:v:0", "-map", "0:a?", "-c", "copy", "-f", "segment",
+                    "-reset_timestamps", "1", "-segment_list", list_path, "-segment_list_type", "csv"]
+            if cut_times:
+                args += ["-segment_times", ",".join(f"{t:.6f}" for t in cut_times)]
+            else:
+                args += ["-segment_time", f"{ranges[0][1] + 1:.6f}"]
+            args.append(os.path.join(work_dir, f"part_%05d{ext}"))
+            
+            end_time = ranges[-1][1]
+            run_ffmpeg(args, task, lambda t: report(
+                sum(1 for _, end in ranges if end <= t), f"Copying at {t:.1f}s of {end_time:.1f}s"))
+            
+            with open(list_path, newline="") as f:
+                parts = [(row[0], float(row[1]), float(row[2])) for row in csv.reader(f) if row]
+            keyframes = probe_keyframes(video_path)
+            gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+            tolerance = max(gaps + [ranges[0][1] - ranges[0][0]]) + KEYFRAME_EPSILON
+            matched, missing = match_segment_parts(parts, ranges, tolerance)
+            
+            for i, (part_name, start, end), merged in matched:
+                filepath = os.path.join(export_directory, name_for(i, ranges[i][0]))
+                os.replace(os.path.join(work_dir, part_name), filepath)
+                fields = {'merged': merged} if merged else {}
+                manifest.add_frame(i, ranges[i][0], -1, {'segment': filepath},
+                                   requested_end=ranges[i][1], actual_start=start, actual_end=end, **fields)
+                saved[0] += 1
+                for index in merged:
+                    manifest.add_issue('merged', index, ranges[index], into=i)
+                    report(saved[0], f"Segment {index + 1} at {ranges[index][0]:.1f}s has no keyframe of its own; "
+                                     f"merged into segment {i + 1}")
+            for index in missing:
+                manifest.add_issue('missing', index, ranges[index])
+                report(saved[0], f"Segment {index + 1} at {ranges[index][0]:.1f}s was not produced by the muxer")
+            report(saved[0], f"Segment {saved[0]}/{len(ranges)} saved")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _export_accurate(self, task: Task, video_path: str, info: dict, ranges: List[Tuple[float, float]],
+                         export_directory: str, name_for: Callable[[int, float], str],
+                         manifest: ExtractionManifest, saved: List[int], report: Callable[[int, str], None]):
+        """Per segment: re-encode the partial GOPs at both ends, stream-copy the GOPs between, and join them"""
+        keyframes = probe_keyframes(video_path)
+        codec = info.get('codec')
+        work_dir = tempfile.mkdtemp(prefix=".segments_", dir=export_directory)
+        try:
+            for i, (start, end) in enumerate(ranges):
+                task.check()
+                filepath = os.path.join(export_directory, name_for(i, start))
+                inner = [k for k in keyframes if start - KEYFRAME_EPSILON <= k <= end + KEYFRAME_EPSILON]
+                if codec in SMART_CUT_ENCODERS and len(inner) >= 2:
+                    self._smart_cut(task, video_path, start, end, inner[0], inner[-1], codec, info['fps'],
+                                    work_dir, filepath, at_video_end=end >= info['duration'] - KEYFRAME_EPSILON)
+                else:
+                    self._encode_range(task, video_path, start, end, filepath)
+                manifest.add_frame(i, start, -1, {'segment': filepath}, requested_end=end,
+                                   actual_start=start, actual_end=end)
+                saved[0] += 1
+                report(saved[0], f"Segment {saved[0]}/{len(ranges)} saved")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _smart_cut(self, task: Task, video_path: str, start: float, end: float, first_key: float, last_key: float,
+                   codec: str, fps: float, work_dir: str, filepath: str, at_video_end: bool):
+        """Re-encode the partial GOPs at both ends, stream-copy the whole GOPs between and concatenate the pieces"""
+        encoder, annexb_filter = SMART_CUT_ENCODERS[codec]
+        pieces = []
+        
+        def add_piece(piece_start: float, piece_end: float, codec_args: List[str]):
+            # Frame counts rather than -t, which cuts stream copies by decode time and overruns the next keyframe;
+            # Annex-B keeps each piece's parameter sets in-band so the joined stream decodes across encoders
+            piece = os.path.join(work_dir, f"piece_{len(pieces)}.mp4")
+            frames = max(1, round((piece_end - piece_start) * fps))
+            run_ffmpeg(["-ss", f"{piece_start:.6f}", "-i", video_path, "-frames:v", str(frames),
+                        "-map", "0:v:0", "-an"] + codec_args + ["-bsf:v", annexb_filter, "-f", "mp4", piece], task)
+            pieces.append(piece)
+        
+        reencode = ["-c:v", encoder, "-preset", "veryfast", "-crf", "16", "-pix_fmt", "yuv420p"]
+        if first_key - start > KEYFRAME_EPSILON:
+            add_piece(start, first_key, reencode)
+        add_piece(first_key, end if at_video_end else last_key, ["-c:v", "copy"])
+        if not at_video_end and end - last_key > KEYFRAME_EPSILON:
+            add_piece(last_key, end, reencode)
+        
+        list_path = os.path.join(work_dir, "pieces.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for piece in pieces:
+                f.write(f"file '{os.path.abspath(piece)}'\n")
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path,
+                    "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", video_path,
+                    "-map", "0:v:0", "-map", "1:a?", "-c", "copy", "-shortest", filepath], task)
+    
+    def _encode_range(self, task: Task, video_path: str, start: float, end: float, filepath: str):
+        """Fallback for segments inside a single GOP or codecs without a matching encoder"""
+        run_ffmpeg(["-ss", f"{start:.6f}", "-i", video_path, "-t", f"{end - start:.6f}",
+                    "-map", "0:v:0", "-map", "0:a?", "-c:v", "libx264", "-preset", "veryfast", "-crf", "16",
+                    "-pix_fmt", "yuv420p", "-c:a", "copy", filepath], task)
@@ -0,0 +1,260 @@
+"""
+Parallel segmented HTTP downloader with per-segment resume
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import unquote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DIRECT_MEDIA_EXTENSIONS = ('.mp4', '.m4v', '.mkv', '.webm', '.mov', '.avi')
+STATE_SUFFIX = ".segments.json"
+PART_SUFFIX = ".part"
+STATE_SAVE_INTERVAL = 0.5
+
+
+def is_direct_media_url(url: str) -> bool:
+    """Check whether a URL points straight at a media file"""
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and parsed.path.lower().endswith(DIRECT_MEDIA_EXTENSIONS)
+
+
+def filename_from_url(url: str) -> str:
+    """Derive a local file name from the last path component of a URL"""
+    name = os.path.basename(unquote(urlparse(url).path))
+    return name or "download.mp4"
+
+
+class FetchCancelled(Exception):
+    """Raised when a segmented fetch is stopped before completion"""
+
+
+class Segment:
+    """A byte range of the target file and how much of it is on disk"""
+    
+    def __init__(self, index: int, start: int, end: int, written: int = 0):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.written = written
+    
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+    
+    @property
+    def is_complete(self) -> bool:
+        return self.written >= self.length
+    
+    def to_list(self) -> list:
+        return [self.start, self.end, self.written]
+
+
+class SegmentedFetcher:
+    """Downloads a file as concurrent HTTP Range requests into a preallocated file"""
+    
+    def __init__(self, max_connections: int = 8, min_segment_size: int = 4 * 1024 * 1024,
+                 chunk_size: int = 256 * 1024, timeout: float = 30.0,
+                 session: Optional[requests.Session] = None):
+        self.max_connections = max(1, max_connections)
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = session or self._create_session()
+    
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections, max_retries=3)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def probe(self, url: str, headers: Optional[Dict[str, str]] = None) -> dict:
+        """Get size, range support and validators of a remote file"""
+        request_headers = dict(headers or {})
+        request_headers['Range'] = 'bytes=0-0'
+        with self.session.get(url, headers=request_headers, stream=True,
+                              timeout=self.timeout, allow_redirects=True) as response:
+            response.raise_for_status()
+            size = None
+            accepts_ranges = response.status_code == 206
+            content_range = response.headers.get('Content-Range', '')
+            if accepts_ranges and '/' in content_range:
+                total = content_range.rsplit('/', 1)[1]
+                size = int(total) if total.isdigit() else None
+            elif response.headers.get('Content-Length', '').isdigit():
+                size = int(response.headers['Content-Length'])
+            return {
+                'url': response.url,
+                'size': size,
+                'accepts_ranges': accepts_ranges and size is not None,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+    
+    def fetch(self, url: str, dest_path: str,
+              progress_hook: Optional[Callable[[dict], None]] = None,
+              headers: Optional[Dict[str, str]] = None) -> str:
+        """Download url to dest_path, resuming a previous partial download if present
+
+        progress_hook receives yt-dlp style status dictionaries, and may raise
+        to abort the download (the partial file is kept for resuming).
+        """
+        info = self.probe(url, headers)
+        part_path = dest_path + PART_SUFFIX
+        state_path = dest_path + STATE_SUFFIX
+        
+        if not info['accepts_ranges']:
+            self._fetch_single(info['url'], part_path, info['size'], progress_hook, headers)
+        else:
+            segments = self._load_state(state_path, part_path, info)
+            if segments is None:
+                segments = self._plan_segments(info['size'])
+                with open(part_path, 'wb') as f:
+                    f.truncate(info['size'])
+                self._save_state(state_path, info, segments)
+            self._fetch_segments(info, part_path, state_path, segments, progress_hook, headers)
+        
+        os.replace(part_path, dest_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        if progress_hook:
+            total = os.path.getsize(dest_path)
+            progress_hook({'status': 'finished', 'filename': dest_path,
+                           'downloaded_bytes': total, 'total_bytes': total})
+        return dest_path
+    
+    def _plan_segments(self, size: int) -> List[Segment]:
+        count = max(1, min(self.max_connections, size // max(1, self.min_segment_size)))
+        base = size // count
+        segments = []
+        start = 0
+        for i in range(count):
+            end = size - 1 if i == count - 1 else start + base - 1
+            segments.append(Segment(i, start, end))
+            start = end + 1
+        return segments
+    
+    def _load_state(self, state_path: str, part_path: str, info: dict) -> Optional[List[Segment]]:
+        if not (os.path.exists(state_path) and os.path.exists(part_path)):
+            return None
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('size') != info['size'] or os.path.getsize(part_path) != info['size']:
+            return None
+        for key in ('etag', 'last_modified'):
+            if state.get(key) and info.get(key) and state[key] != info[key]:
+                return None
+        return [Segment(i, *values) for i, values in enumerate(state['segments'])]
+    
+    def _save_state(self, state_path: str, info: dict, segments: List[Segment]):
+        state = {
+            'url': info['url'],
+            'size': info['size'],
+            'etag': info.get('etag'),
+            'last_modified': info.get('last_modified'),
+            'segments': [segment.to_list() for segment in segments],
+        }
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+    
+    def _fetch_segments(self, info: dict, part_path: str, state_path: str, segments: List[Segment],
+                        progress_hook: Optional[Callable[[dict], None]], headers: Optional[Dict[str, str]]):
+        total = info['size']
+        lock = threading.Lock()
+        hook_lock = threading.Lock()
+        stop = threading.Event()
+        started = time.monotonic()
+        resumed_bytes = sum(segment.written for segment in segments)
+        errors: List[BaseException] = []
+        last_save = [started]
+        last_reported = [resumed_bytes]
+        
+        def report(segment: Segment, nbytes: int):
+            with lock:
+                segment.written += nbytes
+                now = time.monotonic()
+                if now - last_save[0] >= STATE_SAVE_INTERVAL:
+                    self._save_state(state_path, info, segments)
+                    last_save[0] = now
+                downloaded = sum(s.written for s in segments)
+            if not progress_hook:
+                return
+            # the hook may be slow or raise to cancel, so it runs outside the lock the other segments need;
+            # its own lock keeps calls serial and drops totals another segment has already reported past
+            with hook_lock:
+                if downloaded <= last_reported[0]:
+                    return
+                last_reported[0] = downloaded
+                elapsed = max(now - started, 1e-6)
+                speed = (downloaded - resumed_bytes) / elapsed
+                eta = int((total - downloaded) / speed) if speed > 0 else None
+                progress_hook({'status': 'downloading', 'filename': part_path,
+                               'downloaded_bytes': downloaded, 'total_bytes': total,
+                               'speed': speed, 'eta': eta})
+        
+        def fetch_segment(segment: Segment):
+            if segment.is_complete or stop.is_set():
+                return
+            request_headers = dict(headers or {})
+            request_headers['Range'] = f"bytes={segment.start + segment.written}-{segment.end}"
+            try:
+                with self.session.get(info['url'], headers=request_headers, stream=True,
+                                      timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise IOError("Server ignored the Range request")
+                    with open(part_path, 'r+b', buffering=0) as f:
+                        f.seek(segment.start + segment.written)
+                        for chunk in response.iter_content(self.chunk_size):
+                            if stop.is_set():
+                                return
+                            view = memoryview(chunk)[:segment.length - segment.written]
+                            while view:
+                                written = f.write(view)
+                                report(segment, written)
+                                view = view[written:]
+                            if segment.is_complete:
+                                break
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        
+        pending = [segment for segment in segments if not segment.is_complete]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+                list(executor.map(fetch_segment, pending))
+        finally:
+            with lock:
+                self._save_state(state_path, info, segments)
+        
+        if errors:
+            raise errors[0]
+        if not all(segment.is_complete for segment in segments):
+            raise FetchCancelled("Segmented download did not complete")
+    
+    def _fetch_single(self, url: str, part_path: str, size: Optional[int],
+                      progress_hook: Optional[Callable[[dict], None]], headers: Optional[Dict[str, str]]):
+        started = time.monotonic()
+        downloaded = 0
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(part_path, 'wb') as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress_hook:
+                        speed = downloaded / max(time.monotonic() - started, 1e-6)
+                        progress_hook({'status': 'downloading', 'filename': part_path,
+                                       'downloaded_bytes': downloaded, 'total_bytes': size or 0,
+                                       'speed': speed, 'eta': None})
@@ -0,0 +1,58 @@
+"""
+Vectorized frame sharpness scoring
+"""
+from typing import Any, Callable, Optional
+import numpy as np
+
+
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def sharpness_score(frame: np.ndarray, max_width: int = 320) -> float:
+    """Variance of the Laplacian of a downscaled RGB or luma frame (higher is sharper)"""
+    step = max(1, frame.shape[1] // max_width)
+    if frame.ndim == 2:
+        luma = frame[::step, ::step].astype(np.float32)
+    else:
+        luma = frame[::step, ::step, :3].astype(np.float32) @ LUMA_WEIGHTS
+    laplacian = (luma[1:-1, :-2] + luma[1:-1, 2:] + luma[:-2, 1:-1] + luma[2:, 1:-1]
+                 - 4.0 * luma[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+class BestFrameSelector:
+    """Keeps only the sharpest frame seen in the current window"""
+    
+    def __init__(self, discard: Optional[Callable[[Any], None]] = None):
+        self.discard = discard
+        self.window = None
+        self.score = -1.0
+        self.timestamp = 0.0
+        self.frame = None
+    
+    def offer(self, window: int, timestamp: float, frame: Any, pixels: Optional[np.ndarray] = None):
+        """Consider a frame; returns the finished previous window's winner, if any"""
+        finished = None
+        if window != self.window:
+            finished = self.flush()
+            self.window = window
+        score = sharpness_score(frame if pixels is None else pixels)
+        if score > self.score:
+            if self.frame is not None and self.discard:
+                self.discard(self.frame)
+            self.score = score
+            self.timestamp = timestamp
+            self.frame = frame
+        elif self.discard:
+            self.discard(frame)
+        return finished
+    
+    def flush(self):
+        """Return (window, timestamp, frame) for the current window and reset"""
+        if self.frame is None:
+            return None
+        result = (self.window, self.timestamp, self.frame)
+        self.window = None
+        self.score = -1.0
+        self.frame = None
+        return result
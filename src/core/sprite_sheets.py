@@ -0,0 +1,149 @@
+"""
+Sprite-sheet output: frames packed into large tiled images plus a WebVTT thumbnail track
+"""
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from .encoders import ImageEncoder, JpegEncoder
+from ..utils.profiling import NULL_PROFILER
+
+
+DEFAULT_TILE_SIZE = (160, 90)
+DEFAULT_COLUMNS = 10
+DEFAULT_ROWS = 10
+# one canvas fills while the other encodes
+CANVAS_COUNT = 2
+
+
+def fit_tile(width: int, height: int, tile_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Fit the frame inside tile_size, keeping the aspect ratio and never upscaling"""
+    scale = min(tile_size[0] / width, tile_size[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def format_vtt_time(seconds: float) -> str:
+    """Format seconds as a WebVTT timestamp (HH:MM:SS.mmm)"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+class SpriteCue:
+    """Time range of the video shown by one tile of one sheet"""
+    
+    def __init__(self, start: float, end: float, sheet: str, x: int, y: int, width: int, height: int):
+        self.start = start
+        self.end = end
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+    
+    @property
+    def xywh(self) -> List[int]:
+        return [self.x, self.y, self.width, self.height]
+
+
+class SpriteSheetWriter:
+    """Composites equally sized tiles row by row into preallocated canvases and encodes each full sheet"""
+    
+    def __init__(self, directory: str, base_name: str, tile_size: Tuple[int, int],
+                 columns: int = DEFAULT_COLUMNS, rows: int = DEFAULT_ROWS, encoder: Optional[ImageEncoder] = None,
+                 profiler=NULL_PROFILER):
+        self.directory = directory
+        self.base_name = base_name
+        self.tile_width, self.tile_height = tile_size
+        self.columns = max(1, columns)
+        self.rows = max(1, rows)
+        self.encoder = encoder or JpegEncoder(quality=85)
+        self.profiler = profiler
+        shape = (self.rows * self.tile_height, self.columns * self.tile_width, 3)
+        self.canvases = [np.zeros(shape, dtype=np.uint8) for _ in range(CANVAS_COUNT)]
+        self.cues: List[SpriteCue] = []
+        self.sheets: List[str] = []
+        self._pending: List[Optional[Future]] = [None] * CANVAS_COUNT
+        self._encoder_pool = ThreadPoolExecutor(max_workers=1)
+        self._tiles_in_sheet = 0
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(canvas.nbytes for canvas in self.canvases)
+    
+    @property
+    def tiles_per_sheet(self) -> int:
+        return self.columns * self.rows
+    
+    def sheet_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.base_name}_sprite_{index + 1:03d}{self.encoder.extension}")
+    
+    def add(self, frame: np.ndarray, start: float, end: float) -> SpriteCue:
+        """Copy a tile_size RGB frame into the next free tile; encodes the sheet once it is full"""
+        slot = len(self.sheets) % CANVAS_COUNT
+        if self._tiles_in_sheet == 0:
+            self._wait(slot)
+            self.canvases[slot].fill(0)
+        row, column = divmod(self._tiles_in_sheet, self.columns)
+        x, y = column * self.tile_width, row * self.tile_height
+        with self.profiler.stage("composite"):
+            self.canvases[slot][y:y + self.tile_height, x:x + self.tile_width] = frame
+        cue = SpriteCue(start, end, self.sheet_path(len(self.sheets)), x, y, self.tile_width, self.tile_height)
+        self.cues.append(cue)
+        self._tiles_in_sheet += 1
+        if self._tiles_in_sheet == self.tiles_per_sheet:
+            self._flush()
+        return cue
+    
+    def _flush(self):
+        """Encode the current sheet in the background, cropped to the rows in use"""
+        slot = len(self.sheets) % CANVAS_COUNT
+        used_rows = -(-self._tiles_in_sheet // self.columns)
+        sheet = self.canvases[slot][:used_rows * self.tile_height]
+        path = self.sheet_path(len(self.sheets))
+        self._pending[slot] = self._encoder_pool.submit(self._encode, sheet, path)
+        self.sheets.append(path)
+        self._tiles_in_sheet = 0
+    
+    def _encode(self, sheet: np.ndarray, path: str):
+        with self.profiler.worker():
+            self.profiler.save(path, lambda f: self.encoder.encode(sheet, f))
+    
+    def _wait(self, slot: int):
+        future = self._pending[slot]
+        if future:
+            self._pending[slot] = None
+            with self.profiler.stage("wait"):
+                future.result()
+    
+    def finish(self) -> List[str]:
+        """Encode the last, partly filled sheet and wait for every sheet to be written"""
+        if self._tiles_in_sheet:
+            self._flush()
+        try:
+            for slot in range(CANVAS_COUNT):
+                self._wait(slot)
+        finally:
+            self._encoder_pool.shutdown()
+        return self.sheets
+    
+    def close(self):
+        """Stop without writing the current sheet"""
+        self._encoder_pool.shutdown()
+    
+    def write_vtt(self, path: str) -> str:
+        """Write a WebVTT track whose cues point at sheet#xywh=x,y,w,h, with sheet paths relative to the track"""
+        lines = ["WEBVTT", ""]
+        vtt_directory = os.path.dirname(os.path.abspath(path))
+        for cue in self.cues:
+            sheet = os.path.relpath(os.path.abspath(cue.sheet), vtt_directory).replace(os.sep, "/")
+            lines.append(f"{format_vtt_time(cue.start)} --> {format_vtt_time(cue.end)}")
+            lines.append(f"{sheet}#xywh={cue.x},{cue.y},{cue.width},{cue.height}")
+            lines.append("")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        os.replace(tmp_path, path)
+        return path
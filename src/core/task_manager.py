@@ -0,0 +1,283 @@
+"""
+Executor-backed task manager with priorities and cooperative cancellation
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+TASK_PENDING = "pending"
+TASK_RUNNING = "running"
+TASK_PAUSED = "paused"
+TASK_COMPLETED = "completed"
+TASK_FAILED = "failed"
+TASK_CANCELLED = "cancelled"
+
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 10
+
+DEFAULT_KIND_LIMITS = {'preview': 1}
+
+
+class ConcurrencyLimit:
+    """Semaphore whose limit can be changed while holders are waiting, e.g. by the auto-tuner"""
+    
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._active = 0
+        self._condition = threading.Condition()
+    
+    @property
+    def limit(self) -> int:
+        return self._limit
+    
+    def set_limit(self, limit: int):
+        with self._condition:
+            self._limit = max(1, limit)
+            self._condition.notify_all()
+    
+    def __enter__(self) -> "ConcurrencyLimit":
+        with self._condition:
+            while self._active >= self._limit:
+                self._condition.wait()
+            self._active += 1
+        return self
+    
+    def __exit__(self, *exc):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it has been cancelled"""
+
+
+class Task:
+    """A unit of background work tracked by the task manager"""
+    
+    def __init__(self, task_id: int, name: str, kind: str, priority: int,
+                 fn: Callable[["Task"], Any]):
+        self.task_id = task_id
+        self.name = name
+        self.kind = kind
+        self.priority = priority
+        self.fn = fn
+        self.state = TASK_PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel_event = threading.Event()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._done_event = threading.Event()
+        self._done_lock = threading.Lock()
+        self._done_callbacks: List[Callable[["Task"], None]] = []
+        # set by the manager so a cancel settles a still-queued task right away
+        self._on_cancel: Optional[Callable[[], None]] = None
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+    
+    @property
+    def is_finished(self) -> bool:
+        return self._done_event.is_set()
+    
+    def check(self):
+        """Cooperative checkpoint: block while paused, raise if cancelled"""
+        if not self._resume_event.is_set():
+            self.state = TASK_PAUSED
+            while not self._resume_event.wait(0.1):
+                if self._cancel_event.is_set():
+                    break
+            if not self._cancel_event.is_set():
+                self.state = TASK_RUNNING
+        if self._cancel_event.is_set():
+            raise TaskCancelled(f"{self.name} cancelled")
+    
+    def cancel(self):
+        self._cancel_event.set()
+        self._resume_event.set()
+        if self._on_cancel:
+            self._on_cancel()
+    
+    def pause(self):
+        if not self.is_finished:
+            self._resume_event.clear()
+    
+    def resume(self):
+        self._resume_event.set()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the task to finish"""
+        return self._done_event.wait(timeout)
+    
+    def add_done_callback(self, callback: Callable[["Task"], None]):
+        """Call callback(task) once the task ends in any state, including cancelled before it started
+        
+        Runs at once on the calling thread if the task has already finished.
+        Check task.state to tell TASK_COMPLETED, TASK_FAILED and TASK_CANCELLED apart.
+        """
+        with self._done_lock:
+            if not self._done_event.is_set():
+                self._done_callbacks.append(callback)
+                return
+        callback(self)
+    
+    def _finish(self, state: str):
+        """Record the final state once and run the done callbacks; later calls are ignored"""
+        with self._done_lock:
+            if self._done_event.is_set():
+                return
+            self.state = state
+            self.finished_at = time.time()
+            self._done_event.set()
+            callbacks, self._done_callbacks = self._done_callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                pass
+
+
+class TaskManager:
+    """Runs every background operation on one bounded, prioritised executor"""
+    
+    def __init__(self, max_workers: int = 4, kind_limits: Optional[Dict[str, int]] = None,
+                 max_history: int = 200):
+        self.max_workers = max(1, max_workers)
+        self.kind_limits = dict(DEFAULT_KIND_LIMITS if kind_limits is None else kind_limits)
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task")
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._pending: List[tuple] = []
+        self._running: Dict[int, Task] = {}
+        self._tasks: Dict[int, Task] = {}
+    
+    def submit(self, fn: Callable[[Task], Any], name: str, kind: str = "general",
+               priority: int = PRIORITY_NORMAL) -> Task:
+        """Queue fn(task) to run in the background"""
+        with self._lock:
+            task = Task(next(self._ids), name, kind, priority, fn)
+            task._on_cancel = self._dispatch
+            self._tasks[task.task_id] = task
+            heapq.heappush(self._pending, (-priority, task.task_id, task))
+            self._prune_history()
+        self._dispatch()
+        return task
+    
+    def set_kind_limit(self, kind: str, limit: Optional[int]):
+        """Cap how many tasks of one kind may run at once (None removes the cap)"""
+        with self._lock:
+            if limit is None:
+                self.kind_limits.pop(kind, None)
+            else:
+                self.kind_limits[kind] = max(1, limit)
+        self._dispatch()
+    
+    def _running_of_kind(self, kind: str) -> int:
+        return sum(1 for task in self._running.values() if task.kind == kind)
+    
+    def _dispatch(self):
+        with self._lock:
+            # settle cancelled queued tasks even when every worker is busy
+            cancelled = [entry[2] for entry in self._pending if entry[2].cancelled]
+            if cancelled:
+                self._pending = [entry for entry in self._pending if not entry[2].cancelled]
+                heapq.heapify(self._pending)
+            deferred = []
+            while self._pending and len(self._running) < self.max_workers:
+                entry = heapq.heappop(self._pending)
+                task = entry[2]
+                limit = self.kind_limits.get(task.kind)
+                if limit is not None and self._running_of_kind(task.kind) >= limit:
+                    deferred.append(entry)
+                    continue
+                task.state = TASK_RUNNING
+                task.started_at = time.time()
+                self._running[task.task_id] = task
+                self._executor.submit(self._run, task)
+            for entry in deferred:
+                heapq.heappush(self._pending, entry)
+        # done callbacks may submit new work, so they run outside the lock
+        for task in cancelled:
+            task._finish(TASK_CANCELLED)
+    
+    def _run(self, task: Task):
+        try:
+            task.check()
+            task.result = task.fn(task)
+            task._finish(TASK_CANCELLED if task.cancelled else TASK_COMPLETED)
+        except TaskCancelled:
+            task._finish(TASK_CANCELLED)
+        except Exception as e:
+            task.error = str(e)
+            task._finish(TASK_FAILED)
+        finally:
+            with self._lock:
+                self._running.pop(task.task_id, None)
+            self._dispatch()
+    
+    def _prune_history(self):
+        finished = [task_id for task_id, task in self._tasks.items() if task.is_finished]
+        for task_id in finished[:max(0, len(self._tasks) - self.max_history)]:
+            del self._tasks[task_id]
+    
+    def get_task(self, task_id: int) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(task_id)
+    
+    def list_tasks(self, kind: Optional[str] = None) -> List[Task]:
+        with self._lock:
+            return [task for task in self._tasks.values() if kind is None or task.kind == kind]
+    
+    def cancel(self, task_id: int):
+        task = self.get_task(task_id)
+        if task:
+            task.cancel()
+    
+    def cancel_kind(self, kind: str):
+        """Cancel every unfinished task of one kind"""
+        for task in self.list_tasks(kind):
+            if not task.is_finished:
+                task.cancel()
+        self._dispatch()
+    
+    def pause(self, task_id: int):
+        task = self.get_task(task_id)
+        if task:
+            task.pause()
+    
+    def resume(self, task_id: int):
+        task = self.get_task(task_id)
+        if task:
+            task.resume()
+    
+    def shutdown(self, cancel_pending: bool = True):
+        """Stop accepting work and cancel everything still queued or running"""
+        if cancel_pending:
+            for task in self.list_tasks():
+                task.cancel()
+            self._dispatch()
+        self._executor.shutdown(wait=False)
+
+
+_default_manager: Optional[TaskManager] = None
+_default_lock = threading.Lock()
+
+
+def get_task_manager() -> TaskManager:
+    """Get the process-wide task manager shared by all components"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = TaskManager()
+        return _default_manager
@@ -1,131 +1,170 @@
 """
 Thumbnail management utilities
 """
-import io
-import threading
-from typing import Optional, Callable
-import requests
+from typing import Any, Dict, Optional, Callable, Iterable
 from PIL import Image, ImageTk
-from moviepy import VideoFileClip
+from .memory_budget import SUBSYSTEM_PREVIEW, MemoryBudget, get_memory_budget
+from .reader_pool import ReaderPool, get_reader_pool
+from .task_manager import PRIORITY_LOW, Task, TaskCancelled, TaskManager, get_task_manager
+from .thumbnail_service import ThumbnailService
+from ..utils.profiling import JobProfiler, create_profiler
+
+
+def photo_bytes(photo: Any) -> int:
+    """Approximate memory held by a PhotoImage (or PIL image) as 4 bytes per pixel"""
+    return photo.width() * photo.height() * 4 if callable(photo.width) else photo.width * photo.height * 4
 
 
 class ThumbnailManager:
     """Manages thumbnail generation and display"""
     
-    def __init__(self):
+    def __init__(self, thumbnail_service: Optional[ThumbnailService] = None,
+                 task_manager: Optional[TaskManager] = None, reader_pool: Optional[ReaderPool] = None,
+                 memory_budget: Optional[MemoryBudget] = None,
+                 photo_factory: Callable[[Image.Image], Any] = ImageTk.PhotoImage,
+                 profile_mode: Optional[str] = None):
         self.current_thumbnail = None
+        self.thumbnail_service = thumbnail_service or ThumbnailService()
+        self.task_manager = task_manager or get_task_manager()
+        self.reader_pool = reader_pool or get_reader_pool()
+        self.memory_budget = memory_budget or get_memory_budget()
+        self.photo_factory = photo_factory
+        self.profile_mode = profile_mode
+        self._held_bytes: Dict[str, int] = {}
+        self.preview_task: Optional[Task] = None
     
-    def extract_local_thumbnail(self, clip: VideoFileClip, callback: Callable[[ImageTk.PhotoImage], None]):
+    def extract_local_thumbnail(self, video_path: str, callback: Callable[[ImageTk.PhotoImage], None]):
         """Extract thumbnail from local video file"""
         try:
-            
-            frame_time = min(clip.duration * 0.1, 5.0) if clip.duration > 5 else clip.duration / 2
-            frame = clip.get_frame(frame_time)
+            with self.reader_pool.checkout(video_path, size=(120, 90)) as reader:
+                duration = reader.info['duration']
+                frame_time = min(duration * 0.1, 5.0) if duration > 5 else duration / 2
+                frame = reader.get_frame_at(frame_time)
+            if frame is None:
+                raise ValueError("No frame at thumbnail time")
             
             
             img = Image.fromarray(frame)
-            img = img.resize((120, 90), Image.Resampling.LANCZOS)
             
             
-            thumbnail = ImageTk.PhotoImage(img)
+            thumbnail = self.photo_factory(img)
+            self._hold("thumbnail", photo_bytes(img))
             self.current_thumbnail = thumbnail
             callback(thumbnail)
             
         except Exception:
             callback(None)
     
+    def _hold(self, name: str, nbytes: int):
+        """Account for the images the UI keeps on screen, replacing the previous set of the same name"""
+        self.memory_budget.release(SUBSYSTEM_PREVIEW, self._held_bytes.get(name, 0))
+        self.memory_budget.reserve(SUBSYSTEM_PREVIEW, nbytes)
+        self._held_bytes[name] = nbytes
+    
     def download_youtube_thumbnail(self, thumbnail_url: str, 
                                  success_callback: Callable[[ImageTk.PhotoImage], None],
                                  error_callback: Callable[[], None]):
         """Download and display YouTube thumbnail"""
-        def fetch_thumbnail():
-            try:
-                response = requests.get(thumbnail_url, timeout=10)
-                response.raise_for_status()
-                
-                
-                img = Image.open(io.BytesIO(response.content))
-                img = img.resize((120, 90), Image.Resampling.LANCZOS)
-                
-                
-                thumbnail = ImageTk.PhotoImage(img)
-                self.current_thumbnail = thumbnail
-                success_callback(thumbnail)
-                
-            except Exception:
-                error_callback()
+        def on_image(img):
+            thumbnail = self.photo_factory(img)
+            self._hold("thumbnail", photo_bytes(img))
+            self.current_thumbnail = thumbnail
+            success_callback(thumbnail)
         
-        threading.Thread(target=fetch_thumbnail, daemon=True).start()
+        self.thumbnail_service.fetch(thumbnail_url, on_image, error_callback)
+    
+    def prefetch_thumbnails(self, thumbnail_urls: Iterable[str]):
+        """Warm the thumbnail cache, e.g. for every item of a playlist"""
+        self.thumbnail_service.prefetch(thumbnail_urls)
     
     def generate_preview_thumbnails(self, video_path: str, duration: float, offset: float,
                                   callback: Callable[[list], None], max_previews: int = 6,
-                                  progress_callback: Optional[Callable[[float], None]] = None):
+                                  progress_callback: Optional[Callable[[float], None]] = None,
+                                  profile_callback: Optional[Callable[[JobProfiler], None]] = None) -> Task:
         """Generate preview thumbnails for video cutting with offset"""
-        def generate_preview():
+        def generate_preview(task: Task):
+            reader = None
+            profiler = create_profiler("previews", self.profile_mode)
+            profiler.start()
             try:
-                clip = VideoFileClip(video_path)
+                reader = self.reader_pool.checkout(video_path, size=(80, 60))
+                reader.source.profiler = profiler
+                video_duration = reader.info['duration']
                 previews = []
                 
                 
                 segment_start = offset
-                segment_end = min(offset + (duration * max_previews), clip.duration)
+                segment_end = min(offset + (duration * max_previews), video_duration)
                 
                 
                 if segment_end > segment_start:
-                    subclip = clip.subclipped(segment_start, segment_end)
-                    
                     
                     if progress_callback:
                         progress_callback(0.0)
                     
                     for i in range(max_previews):
+                        task.check()
                         timestamp = offset + (i * duration)
-                        if timestamp >= clip.duration:
+                        if timestamp >= video_duration:
                             break
                         
-                        
-                        subclip_time = timestamp - segment_start
-                        if subclip_time >= subclip.duration:
+                        frame = reader.get_frame_at(timestamp)
+                        if frame is None:
                             break
-                            
-                        frame = subclip.get_frame(subclip_time)
-                        img = Image.fromarray(frame)
-                        img = img.resize((80, 60), Image.Resampling.LANCZOS)
+                        with profiler.stage("image"):
+                            img = Image.fromarray(frame)
                         
                         
-                        from PIL import ImageDraw, ImageFont
-                        draw = ImageDraw.Draw(img)
-                        timestamp_text = f"{timestamp:.1f}s"
-                        
-                        try:
-                            font = ImageFont.truetype("arial.ttf", 10)
-                        except:
-                            font = ImageFont.load_default()
-                        
-                        draw.text((2, 2), timestamp_text, fill="white", font=font)
-                        draw.text((1, 1), timestamp_text, fill="black", font=font)
+                        with profiler.stage("label"):
+                            from PIL import ImageDraw, ImageFont
+                            draw = ImageDraw.Draw(img)
+                            timestamp_text = f"{timestamp:.1f}s"
+                            
+                            try:
+                                font = ImageFont.truetype("arial.ttf", 10)
+                            except:
+                                font = ImageFont.load_default()
+                            
+                            draw.text((2, 2), timestamp_text, fill="white", font=font)
+                            draw.text((1, 1), timestamp_text, fill="black", font=font)
                         
-                        thumbnail = ImageTk.PhotoImage(img)
+                        with profiler.stage("photo"):
+                            thumbnail = self.photo_factory(img)
                         previews.append((thumbnail, timestamp))
                         
                         
                         if progress_callback:
                             progress = ((i + 1) / max_previews) * 100.0
                             progress_callback(progress)
-                    
-                    subclip.close()
                 
-                clip.close()
+                reader.release()
+                reader = None
                 
                 if progress_callback:
                     progress_callback(100.0)
+                self._hold("previews", sum(photo_bytes(thumbnail) for thumbnail, _ in previews))
                 callback(previews)
                 
+            except TaskCancelled:
+                if reader:
+                    reader.release()
+                raise
             except Exception as e:
+                if reader:
+                    reader.discard()
                 print(f"Preview generation error: {e}")
                 
                 if progress_callback:
                     progress_callback(100.0)
                 callback([])
+            finally:
+                if profiler.enabled:
+                    profiler.finish()
+                    if profile_callback:
+                        profile_callback(profiler)
         
-        threading.Thread(target=generate_preview, daemon=True).start()
+        if self.preview_task and not self.preview_task.is_finished:
+            self.preview_task.cancel()
+        self.preview_task = self.task_manager.submit(generate_preview, "Generate previews",
+                                                     kind="preview", priority=PRIORITY_LOW)
+        return self.preview_task
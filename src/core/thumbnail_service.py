@@ -0,0 +1,149 @@
+"""
+Pooled, disk-cached fetcher for remote thumbnail artwork
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+from ..utils.helpers import get_app_data_dir
+
+
+DEFAULT_MAX_AGE = 24 * 60 * 60
+
+
+class ThumbnailService:
+    """Fetches thumbnails through a shared connection pool and a revalidating disk cache"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, size: Tuple[int, int] = (120, 90),
+                 max_workers: int = 4, max_age: float = DEFAULT_MAX_AGE,
+                 session: Optional[requests.Session] = None):
+        self.cache_dir = cache_dir or get_app_data_dir("thumbnails")
+        self.size = size
+        self.max_age = max_age
+        self.session = session or self._create_session(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+    
+    def _create_session(self, pool_size: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=2)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+    
+    def _cache_paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + ".img"), os.path.join(self.cache_dir, key + ".json")
+    
+    def _read_meta(self, meta_path: str) -> dict:
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_cache(self, url: str, data: Optional[bytes], meta: dict):
+        data_path, meta_path = self._cache_paths(url)
+        if data is not None:
+            with open(data_path + ".tmp", 'wb') as f:
+                f.write(data)
+            os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+    
+    def decode(self, data: bytes, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Decode image bytes, letting libjpeg downscale during decoding via draft()"""
+        size = size or self.size
+        img = Image.open(io.BytesIO(data))
+        img.draft('RGB', size)
+        img = img.convert('RGB')
+        if img.size != size:
+            img = img.resize(size, Image.Resampling.LANCZOS)
+        return img
+    
+    def get_cached(self, url: str) -> Optional[Image.Image]:
+        """Decode a cached thumbnail without touching the network"""
+        data_path, _ = self._cache_paths(url)
+        try:
+            with open(data_path, 'rb') as f:
+                return self.decode(f.read())
+        except (OSError, ValueError):
+            return None
+    
+    def fetch(self, url: str, callback: Callable[[Image.Image], None],
+              error_callback: Optional[Callable[[], None]] = None):
+        """Deliver a thumbnail from cache, then again if revalidation finds it changed"""
+        self.executor.submit(self._fetch, url, callback, error_callback)
+    
+    def prefetch(self, urls: Iterable[str]):
+        """Warm the cache for many thumbnails (e.g. a playlist) in the background"""
+        for url in urls:
+            if url:
+                self.executor.submit(self._fetch, url, None, None)
+    
+    def _fetch(self, url: str, callback: Optional[Callable[[Image.Image], None]],
+               error_callback: Optional[Callable[[], None]]):
+        try:
+            _, meta_path = self._cache_paths(url)
+            meta = self._read_meta(meta_path)
+            cached = self.get_cached(url) if meta else None
+            if cached is not None:
+                if callback:
+                    callback(cached)
+                if time.time() - meta.get('checked_at', 0) < self.max_age:
+                    return
+            
+            with self._lock:
+                if callback is None and url in self._in_flight:
+                    return
+                self._in_flight.add(url)
+            try:
+                image = self._revalidate(url, meta if cached is not None else {})
+            except Exception:
+                if cached is None:
+                    raise
+                image = None
+            finally:
+                with self._lock:
+                    self._in_flight.discard(url)
+            
+            if image is not None and callback:
+                callback(image)
+            elif image is None and cached is None and error_callback:
+                error_callback()
+        except Exception:
+            if error_callback:
+                error_callback()
+    
+    def _revalidate(self, url: str, meta: dict) -> Optional[Image.Image]:
+        """Conditionally fetch url, returning a new image only if it changed"""
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        
+        response = self.session.get(url, headers=headers, timeout=10)
+        if response.status_code == 304:
+            meta['checked_at'] = time.time()
+            self._write_cache(url, None, meta)
+            return None
+        response.raise_for_status()
+        
+        image = self.decode(response.content)
+        self._write_cache(url, response.content, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'checked_at': time.time(),
+        })
+        return image
@@ -0,0 +1,153 @@
+"""
+Timestamp lists for extraction: subtitle cues (SRT/VTT), CSV and JSON annotations
+"""
+import csv
+import io
+import json
+import os
+from typing import Any, List, Optional
+
+
+CUE_START = "start"
+CUE_MIDPOINT = "midpoint"
+CUE_END = "end"
+
+TIME_KEYS = ("time", "timestamp", "t", "seconds", "start", "start_time")
+LABEL_KEYS = ("label", "name", "id", "caption", "text", "title")
+
+
+class TimestampEntry:
+    """A requested frame time with its label and position in the source file"""
+    
+    def __init__(self, time: float, label: Optional[str] = None, order: int = 0):
+        self.time = time
+        self.label = label
+        self.order = order
+    
+    def __repr__(self):
+        return f"TimestampEntry({self.time:.3f}, {self.label!r}, order={self.order})"
+
+
+def parse_timecode(value: Any) -> float:
+    """Parse seconds, MM:SS(.fff) or HH:MM:SS(,fff) into seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = str(value).strip().replace(",", ".").split(":")
+    if len(parts) > 3 or not parts[-1]:
+        raise ValueError(f"Invalid timecode: {value}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_subtitles(text: str, cue_point: str = CUE_MIDPOINT) -> List[TimestampEntry]:
+    """Parse SRT or WebVTT cues into one timestamp per cue"""
+    entries = []
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+        if "-->" not in line:
+            continue
+        start_text, _, rest = line.partition("-->")
+        end_text = rest.split()[0] if rest.split() else ""
+        start, end = parse_timecode(start_text), parse_timecode(end_text)
+        
+        cue_text = []
+        while i < len(lines) and lines[i].strip():
+            cue_text.append(lines[i].strip())
+            i += 1
+        
+        if cue_point == CUE_START:
+            time = start
+        elif cue_point == CUE_END:
+            time = end
+        else:
+            time = (start + end) / 2
+        entries.append(TimestampEntry(time, " ".join(cue_text) or None, len(entries)))
+    return entries
+
+
+def _find_key(keys: List[str], wanted: Optional[str], candidates) -> Optional[str]:
+    if wanted:
+        return wanted if wanted in keys else None
+    lowered = {key.lower().strip(): key for key in keys}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def parse_csv(text: str, time_column: Optional[str] = None, label_column: Optional[str] = None,
+              delimiter: str = ",") -> List[TimestampEntry]:
+    """Parse a CSV with a time column and optional label column; a header row is detected automatically"""
+    rows = [row for row in csv.reader(io.StringIO(text), delimiter=delimiter) if row and any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    
+    time_index, label_index = 0, 1
+    try:
+        parse_timecode(rows[0][0])
+        has_header = bool(time_column)
+    except ValueError:
+        has_header = True
+    if has_header:
+        header = rows.pop(0)
+        time_key = _find_key(header, time_column, TIME_KEYS)
+        if time_key is None:
+            raise ValueError(f"No time column found in CSV header: {', '.join(header)}")
+        label_key = _find_key(header, label_column, LABEL_KEYS)
+        time_index = header.index(time_key)
+        label_index = header.index(label_key) if label_key else None
+    
+    entries = []
+    for row in rows:
+        label = row[label_index].strip() if label_index is not None and label_index < len(row) else None
+        entries.append(TimestampEntry(parse_timecode(row[time_index]), label or None, len(entries)))
+    return entries
+
+
+def parse_json(text: str, time_column: Optional[str] = None, label_column: Optional[str] = None) -> List[TimestampEntry]:
+    """Parse a JSON list of times or of objects with a time key, optionally wrapped in an object"""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        for key in ("timestamps", "frames", "annotations", "items", "cues"):
+            if isinstance(data.get(key), list):
+                data = data[key]
+                break
+        else:
+            raise ValueError("JSON object has no list of timestamps")
+    
+    entries = []
+    for item in data:
+        if isinstance(item, dict):
+            keys = list(item)
+            time_key = _find_key(keys, time_column, TIME_KEYS)
+            if time_key is None:
+                raise ValueError(f"No time key found in JSON item: {item}")
+            label_key = _find_key(keys, label_column, LABEL_KEYS)
+            label = item.get(label_key) if label_key else None
+            entries.append(TimestampEntry(parse_timecode(item[time_key]),
+                                          str(label) if label is not None else None, len(entries)))
+        else:
+            entries.append(TimestampEntry(parse_timecode(item), None, len(entries)))
+    return entries
+
+
+def load_timestamps(path: str, cue_point: str = CUE_MIDPOINT, time_column: Optional[str] = None,
+                    label_column: Optional[str] = None) -> List[TimestampEntry]:
+    """Load timestamps from an .srt, .vtt, .csv or .json file"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".srt", ".vtt"):
+        return parse_subtitles(text, cue_point)
+    if ext == ".json":
+        return parse_json(text, time_column, label_column)
+    if ext in (".csv", ".txt"):
+        return parse_csv(text, time_column, label_column)
+    if ext == ".tsv":
+        return parse_csv(text, time_column, label_column, delimiter="\t")
+    raise ValueError(f"Unsupported timestamp file type: {ext}")
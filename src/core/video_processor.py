@@ -2,73 +2,691 @@
 Video processing and frame extraction functionality
 """
 import os
-import threading
-from typing import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from PIL import Image
-from moviepy import VideoFileClip
-from ..utils.helpers import create_progress_bar
+from .encoders import ImageEncoder, JpegEncoder, calibrate_encoders, frame_to_image
+from .frame_index import FrameIndex, perceptual_hash
+from .frame_reader import (FrameBuffer, FrameRing, FrameSource, cluster_frame_numbers, frame_number_at, gop_length,
+                           probe_keyframes, sample_frames, supports_yuv420)
+from .memory_budget import SUBSYSTEM_EXTRACTION, MemoryBudget, get_memory_budget
+from .reader_pool import ReaderPool, get_reader_pool
+from .renditions import ExtractionManifest, PreviousExtraction, Rendition, order_renditions
+from .sharpness import BestFrameSelector
+from .sprite_sheets import DEFAULT_COLUMNS, DEFAULT_ROWS, DEFAULT_TILE_SIZE, SpriteSheetWriter, fit_tile
+from .task_manager import PRIORITY_HIGH, ConcurrencyLimit, Task, TaskCancelled, TaskManager, get_task_manager
+from .timestamp_sources import TimestampEntry
+from ..utils.helpers import create_progress_bar, link_or_copy, safe_filename_part
+from ..utils.profiling import JobProfiler, create_profiler
+
+
+MODE_EXACT = "exact"
+MODE_SHARPEST = "sharpest"
+ENCODE_WORKERS = 2
+# Upper bound for the encode worker count the auto-tuner may choose
+MAX_ENCODE_WORKERS = max(ENCODE_WORKERS, os.cpu_count() or 1)
+# PIL holds RGB images as 4 bytes per pixel, and the YUV path also upsamples both chroma planes
+ENCODE_BYTES_PER_PIXEL = 6
+
+
+class CutPlan:
+    """One (duration, offset) interval series of a cut job"""
+    
+    def __init__(self, duration: float, offset: float, video_duration: float):
+        self.duration = duration
+        self.offset = offset
+        available_duration = video_duration - offset
+        self.total_cuts = int(available_duration / duration) if available_duration > 0 else 0
+        self.video_duration = video_duration
+        self.first_cut = 0
+        self.stop_cut = self.total_cuts
+        self.start_time = offset
+        self.end_time = min(offset + self.total_cuts * duration, video_duration)
+    
+    @property
+    def cut_count(self) -> int:
+        return self.stop_cut - self.first_cut
+    
+    def restrict(self, start: float, end: float):
+        """Keep only the cuts whose interval starts in [start, end) (one timeline shard); names keep their index"""
+        self.first_cut = min(max(0, int(np.ceil((start - self.offset) / self.duration - 1e-9))), self.total_cuts)
+        self.stop_cut = min(max(self.first_cut, int(np.ceil((end - self.offset) / self.duration - 1e-9))),
+                            self.total_cuts)
+        self.start_time = self.offset + self.first_cut * self.duration
+        self.end_time = min(self.offset + self.stop_cut * self.duration, self.video_duration)
+    
+    def timestamps(self) -> Iterator[Tuple[int, float]]:
+        for i in range(self.first_cut, self.stop_cut):
+            yield i, self.offset + (i * self.duration)
+    
+    def window_at(self, timestamp: float) -> Optional[int]:
+        """Interval index containing timestamp, or None when outside this plan"""
+        if timestamp < self.start_time or timestamp >= self.end_time:
+            return None
+        return min(int((timestamp - self.offset) / self.duration), self.total_cuts - 1)
+    
+    def base_name(self, video_name: str, i: int, timestamp: float) -> str:
+        return f"{video_name}_cut_{i+1:03d}_offset_{self.offset:.1f}s_at_{timestamp:.1f}s"
+
+
+def build_plans(duration: float, offsets: Optional[List[float]] = None,
+                plans: Optional[List[Tuple[float, float]]] = None) -> List[Tuple[float, float]]:
+    """Normalise a list of offsets or (duration, offset) pairs into unique, sorted pairs"""
+    pairs = list(plans or [(duration, offset) for offset in (offsets or [0.0])])
+    return sorted(set((float(d), float(o)) for d, o in pairs), key=lambda pair: (pair[1], pair[0]))
 
 
 class VideoProcessor:
     """Handles video processing operations"""
     
-    def __init__(self):
-        pass
+    def __init__(self, task_manager: Optional[TaskManager] = None, reader_pool: Optional[ReaderPool] = None,
+                 memory_budget: Optional[MemoryBudget] = None, profile_mode: Optional[str] = None):
+        self.task_manager = task_manager or get_task_manager()
+        self.reader_pool = reader_pool or get_reader_pool()
+        self.memory_budget = memory_budget or get_memory_budget()
+        self.profile_mode = profile_mode
+        self.encode_limit = ConcurrencyLimit(ENCODE_WORKERS)
+        self.frames_encoded = 0
+        self._reserved: Dict[int, int] = {}
     
     def get_video_info(self, file_path: str) -> tuple:
-        """Get video information using moviepy"""
+        """Get the video duration from the reader pool's probe cache"""
         try:
-            clip = VideoFileClip(file_path)
-            duration = clip.duration
-            clip.close()
-            return duration, None
+            return self.reader_pool.probe(file_path)['duration'], None
         except Exception as e:
             return 0, str(e)
     
     def cut_video_to_images(self, video_path: str, export_directory: str, duration: float, offset: float,
                            progress_callback: Callable[[float, str, int, int], None],
                            completion_callback: Callable[[int, str], None],
-                           error_callback: Callable[[str], None]):
-        """Cut video into segments and save as images with offset"""
-        def do_cut():
+                           error_callback: Callable[[str], None],
+                           mode: str = MODE_EXACT, sample_step: int = 1,
+                           encoder: Optional[ImageEncoder] = None,
+                           renditions: Optional[List[Rendition]] = None,
+                           offsets: Optional[List[float]] = None,
+                           plans: Optional[List[Tuple[float, float]]] = None,
+                           profile_callback: Optional[Callable[[JobProfiler], None]] = None,
+                           time_range: Optional[Tuple[float, float]] = None,
+                           manifest_kind: str = "manifest",
+                           frame_index: Optional[FrameIndex] = None, video_name: Optional[str] = None) -> Task:
+        """Cut video into segments and save as images with offset; time_range limits the job to one timeline shard
+        
+        video_name overrides the file name stem (default: the video's file name), e.g. for store-owned downloads.
+        A cut cancelled mid-run still reports its partial count through completion_callback; use the returned
+        task's add_done_callback, whose state is TASK_CANCELLED, to tell it apart or to hear of a cut cancelled
+        before it started.
+        
+        With a frame_index, each frame's perceptual hash is stored in the manifest and the index once the cut ends.
+        An exact-mode re-cut into a directory holding an earlier cut's manifest links the frames it already has
+        to their new names, decodes only the missing ones and removes the files the new plan no longer lists.
+        """
+        renditions = renditions or [Rendition("full", export_directory, encoder or JpegEncoder(quality=95))]
+        plan_pairs = build_plans(duration, offsets or [offset], plans)
+        name_stem = video_name
+        
+        def do_cut(task: Task):
+            reader = None
+            ring = None
+            manifest = None
+            previous = None
+            saved = [0]
+            profiler = create_profiler(f"cut {os.path.basename(video_path)}", self.profile_mode)
+            profiler.start()
             try:
-                clip = VideoFileClip(video_path)
+                info = self.reader_pool.probe(video_path)
+                video_name = name_stem or os.path.splitext(os.path.basename(video_path))[0]
+                outputs = order_renditions(renditions, info['width'], info['height'])
+                for rendition in outputs:
+                    os.makedirs(rendition.directory, exist_ok=True)
+                
+                
+                cut_plans = [CutPlan(d, o, info['duration']) for d, o in plan_pairs]
+                cut_plans = [plan for plan in cut_plans if plan.total_cuts > 0]
+                if not cut_plans:
+                    error_callback("Offset is beyond video duration")
+                    return
+                settings = {
+                    'duration': duration,
+                    'offset': offset,
+                    'plans': [[plan.duration, plan.offset] for plan in cut_plans],
+                    'mode': mode,
+                    'sample_step': sample_step,
+                }
+                # sharpness samples stay on the whole job's frame grid, so a shard picks the same frames
+                sample_origin = min(plan.offset for plan in cut_plans)
+                if time_range:
+                    for plan in cut_plans:
+                        plan.restrict(*time_range)
+                    cut_plans = [plan for plan in cut_plans if plan.cut_count > 0]
+                    if not cut_plans:
+                        ExtractionManifest(video_path, settings, outputs).save(export_directory, video_name,
+                                                                               manifest_kind)
+                        completion_callback(0, export_directory)
+                        return
+                
+                
+                reader = self.reader_pool.checkout(video_path, pix_fmt=self._choose_pix_fmt(info, outputs))
+                source = reader.source
+                source.profiler = profiler
+                
+                total_cuts = sum(plan.cut_count for plan in cut_plans)
+                if len(cut_plans) == 1:
+                    progress_callback(0, f"Starting to cut video into {total_cuts} segments from offset {cut_plans[0].offset:.1f}s...", 0, total_cuts)
+                else:
+                    progress_callback(0, f"Starting to cut video into {total_cuts} segments across {len(cut_plans)} offsets...", 0, total_cuts)
+                manifest = ExtractionManifest(video_path, settings, outputs)
+                
+                
+                ring = self._allocate_ring(source, self.encode_limit.limit * 2 + 2 + len(cut_plans), len(cut_plans) + 2)
+                if mode == MODE_SHARPEST:
+                    frames = self._iter_sharpest_frames(task, source, ring, cut_plans, sample_step, sample_origin)
+                else:
+                    targets_by_frame = self._exact_targets(cut_plans, info)
+                    # shards share the directory with other workers, so only whole-timeline cuts reuse or clean up
+                    if not time_range:
+                        previous = PreviousExtraction.load(export_directory, video_name, manifest_kind)
+                    if previous:
+                        reused = self._reuse_frames(previous.reusable_frames(video_path, outputs), targets_by_frame,
+                                                    outputs, video_name, manifest)
+                        saved[0] += sum(len(targets_by_frame.pop(frame_number)) for frame_number in reused)
+                        if reused:
+                            progress_callback((saved[0] / total_cuts) * 100,
+                                              f"Reused {saved[0]} cut(s) from the previous extraction; "
+                                              f"decoding {len(targets_by_frame)} frame(s)...", saved[0], total_cuts)
+                    frames = self._iter_exact_frames(task, source, ring, targets_by_frame)
+                
+                self._write_frames(outputs, source, self._name_plan_targets(video_name, frames), manifest,
+                                   total_cuts, progress_callback, saved, hash_frames=frame_index is not None)
+                
+                ring = self._free_ring(ring)
+                reader.release()
+                reader = None
+                manifest.save(export_directory, video_name, manifest_kind)
+                if previous:
+                    self._remove_stale(previous.stale_files(manifest))
+                if frame_index is not None:
+                    frame_index.add_frames(video_path, manifest.frames)
+                completion_callback(saved[0], export_directory)
+            
+            except TaskCancelled:
+                ring = self._free_ring(ring)
+                if reader:
+                    reader.release()
+                if manifest:
+                    if previous:
+                        previous.carry_over(manifest)
+                    manifest.save(export_directory, video_name, manifest_kind)
+                    if frame_index is not None:
+                        frame_index.add_frames(video_path, manifest.frames)
+                progress_callback(0, f"Cut cancelled after {saved[0]} image(s)", saved[0], saved[0])
+                completion_callback(saved[0], export_directory)
+            except Exception as e:
+                if reader:
+                    reader.discard()
+                error_callback(str(e))
+            finally:
+                self._free_ring(ring)
+                if profiler.enabled:
+                    profiler.finish()
+                    if profile_callback:
+                        profile_callback(profiler)
+        
+        return self.task_manager.submit(do_cut, f"Cut: {os.path.basename(video_path)}",
+                                        kind="extract", priority=PRIORITY_HIGH)
+    
+    def extract_timestamps(self, video_path: str, export_directory: str, entries: List[TimestampEntry],
+                           progress_callback: Callable[[float, str, int, int], None],
+                           completion_callback: Callable[[int, str], None],
+                           error_callback: Callable[[str], None],
+                           encoder: Optional[ImageEncoder] = None,
+                           renditions: Optional[List[Rendition]] = None,
+                           frame_index: Optional[FrameIndex] = None) -> Task:
+        """Save the frames at arbitrary timestamps (e.g. subtitle cues), decoding them in one sorted pass"""
+        renditions = renditions or [Rendition("full", export_directory, encoder or JpegEncoder(quality=95))]
+        
+        def do_extract(task: Task):
+            reader = None
+            ring = None
+            manifest = None
+            saved = [0]
+            try:
+                info = self.reader_pool.probe(video_path)
                 video_name = os.path.splitext(os.path.basename(video_path))[0]
+                outputs = order_renditions(renditions, info['width'], info['height'])
+                for rendition in outputs:
+                    os.makedirs(rendition.directory, exist_ok=True)
+                
+                
+                fps = info['fps']
+                targets_by_frame: Dict[int, List[TimestampEntry]] = {}
+                for entry in entries:
+                    if 0 <= entry.time < info['duration']:
+                        targets_by_frame.setdefault(frame_number_at(entry.time, fps), []).append(entry)
+                total = sum(len(targets) for targets in targets_by_frame.values())
+                if not total:
+                    error_callback("No timestamps fall inside the video")
+                    return
+                
+                
+                gop = gop_length(probe_keyframes(video_path), fps)
+                frame_numbers = sorted(targets_by_frame)
+                clusters = cluster_frame_numbers(frame_numbers, gop)
+                reader = self.reader_pool.checkout(video_path, pix_fmt=self._choose_pix_fmt(info, outputs),
+                                                   seek_threshold=gop)
+                source = reader.source
+                
+                skipped = len(entries) - total
+                message = (f"Extracting {total} timestamp(s) as {len(frame_numbers)} frame(s) in "
+                           f"{len(clusters)} decode run(s), GOP {gop} frames")
+                if skipped:
+                    message += f"; {skipped} outside the video skipped"
+                progress_callback(0, message + "...", 0, total)
+                manifest = ExtractionManifest(video_path, {
+                    'source': 'timestamps',
+                    'requested': len(entries),
+                    'gop_frames': gop,
+                }, outputs)
+                
                 
+                ring = self._allocate_ring(source, self.encode_limit.limit * 2 + 2, 2)
                 
-                available_duration = clip.duration - offset
-                if available_duration <= 0:
+                def frames():
+                    for frame_number in frame_numbers:
+                        task.check()
+                        buffer = ring.acquire()
+                        if not source.read_frame(frame_number, buffer):
+                            buffer.release()
+                            break
+                        targets = []
+                        for entry in targets_by_frame[frame_number]:
+                            base_name = f"{video_name}_ts_{entry.order + 1:04d}"
+                            if entry.label:
+                                base_name += f"_{safe_filename_part(entry.label)}"
+                            base_name += f"_at_{entry.time:.3f}s"
+                            targets.append((base_name, {'index': entry.order, 'timestamp': entry.time,
+                                                        'label': entry.label}))
+                        yield targets, buffer
+                
+                self._write_frames(outputs, source, frames(), manifest, total, progress_callback, saved,
+                                   hash_frames=frame_index is not None)
+                
+                ring = self._free_ring(ring)
+                reader.release()
+                reader = None
+                manifest.save(export_directory, video_name)
+                if frame_index is not None:
+                    frame_index.add_frames(video_path, manifest.frames)
+                completion_callback(saved[0], export_directory)
+            
+            except TaskCancelled:
+                ring = self._free_ring(ring)
+                if reader:
+                    reader.release()
+                if manifest:
+                    manifest.save(export_directory, video_name)
+                    if frame_index is not None:
+                        frame_index.add_frames(video_path, manifest.frames)
+                progress_callback(0, f"Extraction cancelled after {saved[0]} image(s)", saved[0], saved[0])
+                completion_callback(saved[0], export_directory)
+            except Exception as e:
+                if reader:
+                    reader.discard()
+                error_callback(str(e))
+            finally:
+                self._free_ring(ring)
+        
+        return self.task_manager.submit(do_extract, f"Timestamps: {os.path.basename(video_path)}",
+                                        kind="extract", priority=PRIORITY_HIGH)
+    
+    def create_sprite_sheets(self, video_path: str, export_directory: str, duration: float, offset: float,
+                             progress_callback: Callable[[float, str, int, int], None],
+                             completion_callback: Callable[[int, str], None],
+                             error_callback: Callable[[str], None],
+                             tile_size: Tuple[int, int] = DEFAULT_TILE_SIZE, columns: int = DEFAULT_COLUMNS,
+                             rows: int = DEFAULT_ROWS, encoder: Optional[ImageEncoder] = None) -> Task:
+        """Pack one tile per interval into sprite sheets in a single decode pass, plus a WebVTT thumbnail track
+        
+        Frames are decoded already scaled to the tile size; completion reports the number of sheets written.
+        """
+        def do_sprites(task: Task):
+            reader = None
+            ring = None
+            writer = None
+            profiler = create_profiler(f"sprites {os.path.basename(video_path)}", self.profile_mode)
+            profiler.start()
+            try:
+                info = self.reader_pool.probe(video_path)
+                video_name = os.path.splitext(os.path.basename(video_path))[0]
+                os.makedirs(export_directory, exist_ok=True)
+                
+                
+                plan = CutPlan(duration, offset, info['duration'])
+                if plan.total_cuts <= 0:
                     error_callback("Offset is beyond video duration")
                     return
+                tile = fit_tile(info['width'], info['height'], tile_size)
+                writer = SpriteSheetWriter(export_directory, video_name, tile, columns, rows, encoder, profiler)
+                self.memory_budget.reserve(SUBSYSTEM_EXTRACTION, writer.nbytes)
+                reader = self.reader_pool.checkout(video_path, size=tile)
+                source = reader.source
+                source.profiler = profiler
+                ring = self._allocate_ring(source, 2, 1)
+                
+                total = plan.cut_count
+                sheet_count = -(-total // writer.tiles_per_sheet)
+                progress_callback(0, f"Packing {total} {tile[0]}x{tile[1]} tiles into {sheet_count} "
+                                     f"{columns}x{rows} sprite sheet(s)...", 0, total)
+                manifest = ExtractionManifest(video_path, {
+                    'duration': duration,
+                    'offset': offset,
+                    'tile_size': list(tile),
+                    'columns': columns,
+                    'rows': rows,
+                }, [Rendition("sprite", export_directory, writer.encoder)])
+                
                 
-                total_cuts = int(available_duration / duration)
-                progress_callback(0, f"Starting to cut video into {total_cuts} segments from offset {offset:.1f}s...", 0, total_cuts)
-                
-                cuts_made = 0
-                for i in range(total_cuts):
-                    timestamp = offset + (i * duration)
-                    if timestamp >= clip.duration:
-                        break
-                        
-                    frame = clip.get_frame(timestamp)
-                    img = Image.fromarray(frame)
-                    
-                    
-                    filename = f"{video_name}_cut_{i+1:03d}_offset_{offset:.1f}s_at_{timestamp:.1f}s.jpg"
-                    filepath = os.path.join(export_directory, filename)
-                    img.save(filepath, "JPEG", quality=95)
-                    cuts_made += 1
-                    
-                    
-                    progress_percent = (cuts_made / total_cuts) * 100
-                    progress_bar = create_progress_bar(progress_percent)
-                    progress_message = f"[{progress_bar}] {progress_percent:.1f}% - Cut {cuts_made}/{total_cuts} saved"
-                    progress_callback(progress_percent, progress_message, cuts_made, total_cuts)
-                
-                clip.close()
-                completion_callback(cuts_made, export_directory)
+                for i, timestamp in plan.timestamps():
+                    task.check()
+                    frame_number = frame_number_at(timestamp, source.fps)
+                    with profiler.stage("wait"):
+                        buffer = ring.acquire()
+                    try:
+                        if not source.read_frame(frame_number, buffer):
+                            break
+                        cue = writer.add(buffer.array, timestamp, min(timestamp + duration, info['duration']))
+                    finally:
+                        buffer.release()
+                    manifest.add_frame(index=i, timestamp=timestamp, frame_number=frame_number,
+                                       files={'sprite': cue.sheet}, xywh=cue.xywh)
+                    done = i + 1
+                    if done % columns == 0 or done == total:
+                        progress_percent = (done / total) * 100
+                        progress_bar = create_progress_bar(progress_percent)
+                        progress_callback(progress_percent,
+                                          f"[{progress_bar}] {progress_percent:.1f}% - Tile {done}/{total} packed",
+                                          done, total)
                 
+                sheets = writer.finish()
+                writer.write_vtt(os.path.join(export_directory, f"{video_name}_thumbnails.vtt"))
+                ring = self._free_ring(ring)
+                reader.release()
+                reader = None
+                manifest.save(export_directory, video_name, "sprites")
+                completion_callback(len(sheets), export_directory)
+            
+            except TaskCancelled:
+                ring = self._free_ring(ring)
+                if reader:
+                    reader.release()
+                if writer:
+                    writer.close()
+                progress_callback(0, f"Sprite sheets cancelled after {len(writer.cues) if writer else 0} tile(s)",
+                                  0, 0)
+                completion_callback(0, export_directory)
+            except Exception as e:
+                if reader:
+                    reader.discard()
+                if writer:
+                    writer.close()
+                error_callback(str(e))
+            finally:
+                self._free_ring(ring)
+                if writer:
+                    self.memory_budget.release(SUBSYSTEM_EXTRACTION, writer.nbytes)
+                if profiler.enabled:
+                    profiler.finish()
+        
+        return self.task_manager.submit(do_sprites, f"Sprites: {os.path.basename(video_path)}",
+                                        kind="extract", priority=PRIORITY_HIGH)
+    
+    def _allocate_ring(self, source: FrameSource, wanted: int, minimum: int) -> FrameRing:
+        """Frame ring sized to what the memory budget leaves after working memory, never below minimum buffers"""
+        frame_bytes = int(np.prod(source.shape))
+        # pipe buffer and skip scratch in the decoder, plus one encode in flight per worker
+        working = frame_bytes * 2 + self.encode_limit.limit * source.width * source.height * ENCODE_BYTES_PER_PIXEL
+        ring = FrameRing(source.shape, self.memory_budget.fit_count(frame_bytes, wanted, minimum, working))
+        self._reserved[id(ring)] = ring.nbytes + working
+        self.memory_budget.reserve(SUBSYSTEM_EXTRACTION, ring.nbytes + working)
+        return ring
+    
+    def _free_ring(self, ring: Optional[FrameRing]) -> None:
+        """Return a ring's reservation to the memory budget; returns None so callers can clear their reference"""
+        if ring:
+            self.memory_budget.release(SUBSYSTEM_EXTRACTION, self._reserved.pop(id(ring), 0))
+    
+    def _name_plan_targets(self, video_name: str, frames: Iterator[Tuple[list, FrameBuffer]]
+                           ) -> Iterator[Tuple[List[Tuple[str, dict]], FrameBuffer]]:
+        """Turn (plan, index, timestamp) targets into file base names and manifest fields"""
+        for frame_targets, buffer in frames:
+            targets = []
+            for plan, i, timestamp in frame_targets:
+                fields = {'index': i, 'timestamp': timestamp, 'duration': plan.duration, 'offset': plan.offset}
+                targets.append((plan.base_name(video_name, i, timestamp), fields))
+            yield targets, buffer
+    
+    def _choose_pix_fmt(self, info: dict, outputs: List[Rendition]) -> str:
+        """Use planar YUV only for a single full-size rendition whose encoder accepts it"""
+        width, height = info['width'], info['height']
+        first = outputs[0]
+        if (len(outputs) == 1 and first.target_size(width, height) == (width, height)
+                and first.encoder.accepts_yuv420 and supports_yuv420(width, height)):
+            return "yuv420p"
+        return "rgb24"
+    
+    def _write_frames(self, outputs: List[Rendition], source: FrameSource,
+                      frames: Iterator[Tuple[List[Tuple[str, dict]], FrameBuffer]], manifest: ExtractionManifest,
+                      total: int, progress_callback: Callable[[float, str, int, int], None], saved: List[int],
+                      hash_frames: bool = False):
+        """Encode (targets, buffer) pairs on the worker pool, recording each target's files in the manifest"""
+        def report(entry: Tuple[list, int, Future]):
+            targets, frame_number, future = entry
+            all_files, phash = future.result()
+            for (base_name, fields), files in zip(targets, all_files):
+                if phash is not None:
+                    fields = dict(fields, phash=f"{phash:016x}")
+                manifest.add_frame(frame_number=frame_number, files=files, **fields)
+            saved[0] += len(targets)
+            self.frames_encoded += 1
+            progress_percent = (saved[0] / total) * 100
+            progress_bar = create_progress_bar(progress_percent)
+            progress_message = f"[{progress_bar}] {progress_percent:.1f}% - Cut {saved[0]}/{total} saved"
+            progress_callback(progress_percent, progress_message, saved[0], total)
+        
+        pending = []
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_ENCODE_WORKERS) as encoders:
+                for targets, buffer in frames:
+                    base_names = [base_name for base_name, _ in targets]
+                    future = encoders.submit(self._save_frame_limited, outputs, source, buffer, base_names,
+                                             hash_frames)
+                    pending.append((targets, buffer.frame_number, future))
+                    while pending and pending[0][2].done():
+                        report(pending.pop(0))
+        finally:
+            error = None
+            for entry in pending:
+                if entry[2].exception() is None:
+                    report(entry)
+                elif error is None:
+                    error = entry[2].exception()
+        # only reached when the frames all went in; a trailing encode failure must still fail the job
+        if error is not None:
+            raise error
+    
+    def _save_frame_limited(self, renditions: List[Rendition], source: FrameSource, buffer: FrameBuffer,
+                            base_names: List[str], hash_frame: bool = False
+                            ) -> Tuple[List[Dict[str, str]], Optional[int]]:
+        """Run _save_frame once a slot under the (tunable) encode worker limit is free"""
+        with self.encode_limit, source.profiler.worker():
+            return self._save_frame(renditions, source, buffer, base_names, hash_frame)
+    
+    def _save_frame(self, renditions: List[Rendition], source: FrameSource, buffer: FrameBuffer,
+                    base_names: List[str], hash_frame: bool = False) -> Tuple[List[Dict[str, str]], Optional[int]]:
+        """Encode one ring buffer into every rendition, then link the files to any other names sharing the frame
+        
+        Returns the files of each name and, when hash_frame is set, the frame's perceptual hash.
+        """
+        profiler = source.profiler
+        files = {}
+        phash = None
+        try:
+            if hash_frame:
+                with profiler.stage("hash"):
+                    phash = perceptual_hash(source.luma(buffer) if source.pix_fmt == "yuv420p" else buffer.array)
+            base_name = base_names[0]
+            if source.pix_fmt == "yuv420p":
+                rendition = renditions[0]
+                filepath = os.path.join(rendition.directory, rendition.filename(base_name))
+                files[rendition.name] = filepath
+                profiler.save(filepath, lambda f: rendition.encoder.encode_yuv420(
+                    buffer.array, source.width, source.height, f))
+            else:
+                image = frame_to_image(buffer.array)
+                for rendition in renditions:
+                    size = rendition.target_size(source.width, source.height)
+                    filepath = os.path.join(rendition.directory, rendition.filename(base_name))
+                    files[rendition.name] = filepath
+                    if size == (source.width, source.height):
+                        profiler.save(filepath, lambda f: rendition.encoder.encode(buffer.array, f))
+                    else:
+                        if size != image.size:
+                            with profiler.stage("resize"):
+                                image = image.resize(size, Image.Resampling.LANCZOS)
+                        profiler.save(filepath, lambda f: rendition.encoder.encode_image(image, f))
+        except BaseException:
+            # the frame never reaches the manifest, so none of its files (the partial one included) may stay
+            for filepath in files.values():
+                try:
+                    os.remove(filepath)
+                except OSError:
+                    pass
+            raise
+        finally:
+            buffer.release()
+        
+        
+        all_files = [files]
+        for base_name in base_names[1:]:
+            linked = {}
+            with profiler.stage("link"):
+                for rendition in renditions:
+                    filepath = os.path.join(rendition.directory, rendition.filename(base_name))
+                    link_or_copy(files[rendition.name], filepath)
+                    linked[rendition.name] = filepath
+            all_files.append(linked)
+        return all_files, phash
+    
+    def calibrate_encoders(self, video_path: str, callback: Callable[[List[dict]], None],
+                           error_callback: Callable[[str], None], sample_count: int = 6,
+                           encoders: Optional[List[ImageEncoder]] = None) -> Task:
+        """Measure encode throughput and output size of each encoder on frames of this video"""
+        def do_calibrate(task: Task):
+            try:
+                frames = sample_frames(video_path, sample_count)
+                if not frames:
+                    error_callback("Could not decode any frames for calibration")
+                    return
+                task.check()
+                callback(calibrate_encoders(frames, encoders))
+            except TaskCancelled:
+                raise
             except Exception as e:
                 error_callback(str(e))
         
-        threading.Thread(target=do_cut, daemon=True).start()
+        return self.task_manager.submit(do_calibrate, f"Calibrate: {os.path.basename(video_path)}",
+                                        kind="extract")
+    
+    def _exact_targets(self, plans: List[CutPlan], info: dict) -> Dict[int, list]:
+        """Group every (plan, index, timestamp) target by the frame it maps to"""
+        targets_by_frame: Dict[int, list] = {}
+        for plan in plans:
+            for i, timestamp in plan.timestamps():
+                if timestamp >= info['duration']:
+                    break
+                targets_by_frame.setdefault(frame_number_at(timestamp, info['fps']), []).append((plan, i, timestamp))
+        return targets_by_frame
+    
+    def _reuse_frames(self, previous: Dict[int, dict], targets_by_frame: Dict[int, list], outputs: List[Rendition],
+                      video_name: str, manifest: ExtractionManifest) -> List[int]:
+        """Link frames an earlier cut already wrote to this plan's names; returns the frame numbers reused"""
+        reused = []
+        for frame_number, frame_targets in targets_by_frame.items():
+            frame = previous.get(frame_number)
+            if frame is None:
+                continue
+            for plan, i, timestamp in frame_targets:
+                files = {}
+                for rendition in outputs:
+                    filepath = os.path.join(rendition.directory,
+                                            rendition.filename(plan.base_name(video_name, i, timestamp)))
+                    link_or_copy(frame['files'][rendition.name], filepath)
+                    files[rendition.name] = filepath
+                fields = {'index': i, 'timestamp': timestamp, 'duration': plan.duration, 'offset': plan.offset}
+                if frame.get('phash'):
+                    fields['phash'] = frame['phash']
+                manifest.add_frame(frame_number=frame_number, files=files, **fields)
+            reused.append(frame_number)
+        return reused
+    
+    def _remove_stale(self, stale_files: List[str]):
+        """Delete files only the replaced manifest listed; runs after the new manifest is in place"""
+        for filepath in stale_files:
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
+    
+    def _iter_exact_frames(self, task: Task, source: FrameSource, ring: FrameRing,
+                           targets_by_frame: Dict[int, list]) -> Iterator[Tuple[list, FrameBuffer]]:
+        """Yield each wanted frame once, with every (plan, index, timestamp) target that maps to it"""
+        for frame_number in sorted(targets_by_frame):
+            task.check()
+            with source.profiler.stage("wait"):
+                buffer = ring.acquire()
+            if not source.read_frame(frame_number, buffer):
+                buffer.release()
+                break
+            yield targets_by_frame[frame_number], buffer
+    
+    def _iter_sharpest_frames(self, task: Task, source: FrameSource, ring: FrameRing, plans: List[CutPlan],
+                              sample_step: int, sample_origin: Optional[float] = None
+                              ) -> Iterator[Tuple[list, FrameBuffer]]:
+        """Decode every sample_step-th frame from sample_origin once; yield the sharpest of each interval of each plan"""
+        fps = source.fps
+        step = max(1, int(sample_step))
+        start_time = min(plan.start_time for plan in plans)
+        end_time = max(plan.end_time for plan in plans)
+        selectors = [BestFrameSelector(discard=FrameBuffer.release) for _ in plans]
+        
+        origin = int(np.ceil((start_time if sample_origin is None else sample_origin) * fps - 1e-6))
+        first = int(np.ceil(start_time * fps - 1e-6))
+        frame_index = origin + max(0, -(-(first - origin) // step)) * step
+        while frame_index / fps < end_time:
+            task.check()
+            timestamp = frame_index / fps
+            with source.profiler.stage("wait"):
+                buffer = ring.acquire()
+            if not source.read_frame(frame_index, buffer):
+                buffer.release()
+                break
+            pixels = source.luma(buffer) if source.pix_fmt == "yuv420p" else buffer.array
+            finished_frames = []
+            with source.profiler.stage("sharpness"):
+                for plan, selector in zip(plans, selectors):
+                    window = plan.window_at(timestamp)
+                    if window is None:
+                        continue
+                    buffer.retain()
+                    finished = selector.offer(window, timestamp, buffer, pixels)
+                    if finished:
+                        finished_frames.append(([(plan, finished[0], finished[1])], finished[2]))
+            for frame_targets, finished_buffer in finished_frames:
+                yield frame_targets, finished_buffer
+            buffer.release()
+            frame_index += step
+        
+        for plan, selector in zip(plans, selectors):
+            finished = selector.flush()
+            if finished:
+                yield [(plan, finished[0], finished[1])], finished[2]
@@ -0,0 +1,360 @@
+"""
+Watch-folder daemon: extracts frames from videos dropped into configured directories
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from .encoders import create_encoder
+from .reader_pool import ReaderPool, get_reader_pool
+from .task_manager import TASK_CANCELLED, Task, get_task_manager
+from .video_processor import MODE_EXACT, VideoProcessor
+from ..utils.helpers import get_app_data_dir
+
+
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm", ".ts")
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 2.0
+
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+STATE_QUEUED = "queued"
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class WatchedFolder:
+    """A directory to watch, where its frames go, and the extraction preset applied to its videos"""
+    
+    def __init__(self, path: str, output: str, preset: Optional[dict] = None,
+                 extensions: Tuple[str, ...] = VIDEO_EXTENSIONS):
+        self.path = os.path.abspath(path)
+        self.output = os.path.abspath(output)
+        self.preset = dict(preset or {})
+        self.extensions = tuple(ext.lower() for ext in extensions)
+    
+    def matches(self, filename: str) -> bool:
+        return not filename.startswith(".") and filename.lower().endswith(self.extensions)
+    
+    def export_directory(self, video_path: str) -> str:
+        return os.path.join(self.output, os.path.splitext(os.path.basename(video_path))[0])
+
+
+def load_watch_config(path: str) -> List[WatchedFolder]:
+    """Folders from a JSON file: {"folders": [{"path": ..., "output": ..., "preset": {...}, "extensions": [...]}]}"""
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    folders = []
+    for entry in config.get("folders", []):
+        if "path" not in entry or "output" not in entry:
+            raise ValueError("Every watched folder needs a path and an output")
+        folders.append(WatchedFolder(entry["path"], entry["output"], entry.get("preset"),
+                                     tuple(entry.get("extensions") or VIDEO_EXTENSIONS)))
+    return folders
+
+
+class PollingWatcher:
+    """Reports files whose size or modification time changed since the previous directory scan"""
+    
+    def __init__(self, directories: List[str], interval: float = DEFAULT_POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+        self._seen: Dict[str, Tuple[int, int]] = {}
+    
+    def poll(self, stop: threading.Event) -> List[str]:
+        stop.wait(self.interval)
+        changed = []
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if not entry.is_file():
+                    continue
+                stamp = (stat.st_size, stat.st_mtime_ns)
+                if self._seen.get(entry.path) != stamp:
+                    self._seen[entry.path] = stamp
+                    changed.append(entry.path)
+        return changed
+    
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watcher for files created, written or moved into the directories"""
+    
+    def __init__(self, directories: List[str], interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: Dict[int, str] = {}
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"Cannot watch {directory}")
+            self._directories[wd] = directory
+    
+    def poll(self, stop: threading.Event) -> List[str]:
+        readable, _, _ = select.select([self._fd], [], [], self.interval)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        position = 0
+        while position + INOTIFY_EVENT.size <= len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, position)
+            position += INOTIFY_EVENT.size
+            name = data[position:position + length].rstrip(b"\0")
+            position += length
+            if name and wd in self._directories:
+                changed.append(os.path.join(self._directories[wd], os.fsdecode(name)))
+        return changed
+    
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directories: List[str], force_polling: bool = False):
+    """inotify where available, falling back to directory polling"""
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directories)
+
+
+class WatchState:
+    """Per-file processing results, persisted so restarts skip videos that were already handled"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._files: Dict[str, dict] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._files = json.load(f).get("files", {})
+        except (OSError, ValueError):
+            pass
+    
+    def is_handled(self, video_path: str, stamp: Tuple[int, int]) -> bool:
+        """Whether this exact file version finished (or failed) before; queued entries are redone"""
+        with self._lock:
+            entry = self._files.get(video_path)
+        return bool(entry and entry['status'] in (STATE_DONE, STATE_FAILED)
+                    and (entry['size'], entry['mtime_ns']) == stamp)
+    
+    def update(self, video_path: str, stamp: Tuple[int, int], status: str, **fields):
+        with self._lock:
+            self._files[video_path] = {'size': stamp[0], 'mtime_ns': stamp[1], 'status': status,
+                                       'updated': time.strftime("%Y-%m-%dT%H:%M:%S"), **fields}
+            self._save()
+    
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'files': self._files}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save watch state: {e}")
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class WatchDaemon:
+    """Waits for videos in the watched folders to finish writing, probes them once and queues their extraction"""
+    
+    def __init__(self, folders: List[WatchedFolder], state_path: Optional[str] = None,
+                 video_processor: Optional[VideoProcessor] = None, reader_pool: Optional[ReaderPool] = None,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, workers: int = 1, force_polling: bool = False,
+                 log: Callable[[str], None] = print):
+        self.folders = folders
+        self.state = WatchState(state_path or os.path.join(get_app_data_dir("watch"), "state.json"))
+        self.reader_pool = reader_pool or get_reader_pool()
+        self.video_processor = video_processor or VideoProcessor(reader_pool=self.reader_pool)
+        self.settle_seconds = settle_seconds
+        self.force_polling = force_polling
+        self.log = log
+        self.video_processor.task_manager.set_kind_limit("extract", max(1, workers))
+        self.stop_event = threading.Event()
+        # path -> (last stamp, monotonic time it was first seen with that stamp)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._active: Dict[str, Optional[Task]] = {}
+        self._lock = threading.Lock()
+    
+    def _folder_for(self, path: str) -> Optional[WatchedFolder]:
+        directory = os.path.dirname(os.path.abspath(path))
+        for folder in self.folders:
+            if folder.path == directory and folder.matches(os.path.basename(path)):
+                return folder
+        return None
+    
+    def _notice(self, path: str):
+        path = os.path.abspath(path)
+        if self._folder_for(path) is None:
+            return
+        with self._lock:
+            if path in self._active:
+                return
+        stamp = _file_stamp(path)
+        if stamp is None or self.state.is_handled(path, stamp):
+            self._pending.pop(path, None)
+            return
+        previous = self._pending.get(path)
+        if previous is None or previous[0] != stamp:
+            self._pending[path] = (stamp, time.monotonic())
+    
+    def _check_pending(self):
+        """Start every pending file whose size and mtime stayed unchanged for settle_seconds"""
+        now = time.monotonic()
+        for path, (stamp, since) in list(self._pending.items()):
+            current = _file_stamp(path)
+            if current is None:
+                del self._pending[path]
+            elif current != stamp:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle_seconds and current[0] > 0:
+                del self._pending[path]
+                self._start(path, current)
+    
+    def _start(self, path: str, stamp: Tuple[int, int]):
+        folder = self._folder_for(path)
+        try:
+            info = self.reader_pool.probe(path)
+        except Exception as e:
+            self.log(f"Skipping {path}: could not probe video - {e}")
+            self.state.update(path, stamp, STATE_FAILED, error=str(e))
+            return
+        preset = folder.preset
+        export_directory = folder.export_directory(path)
+        offsets = preset.get("offsets") or [preset.get("offset", 0.0)]
+        self.state.update(path, stamp, STATE_QUEUED, output=export_directory)
+        self.log(f"Queued {os.path.basename(path)} ({info['duration']:.1f}s, {info['width']}x{info['height']}) "
+                 f"-> {export_directory}")
+        
+        result = {}
+        
+        def on_completion(count: int, directory: str):
+            result.update(count=count, directory=directory)
+        
+        def on_error(error: str):
+            result['error'] = error
+        
+        def on_finish(task: Task):
+            with self._lock:
+                self._active.pop(path, None)
+            name = os.path.basename(path)
+            if task.state == TASK_CANCELLED:
+                # stays queued in the state file, so the next run extracts it again
+                self.log(f"Interrupted {name}; will retry")
+            elif 'count' not in result:
+                error = result.get('error') or task.error or "unknown error"
+                self.state.update(path, stamp, STATE_FAILED, output=export_directory, error=error)
+                self.log(f"Failed {name}: {error}")
+            else:
+                self.state.update(path, stamp, STATE_DONE, output=result['directory'], images=result['count'])
+                self.log(f"Done {name}: {result['count']} image(s) in {result['directory']}")
+        
+        with self._lock:
+            self._active[path] = None
+        task = self.video_processor.cut_video_to_images(
+            path, export_directory, float(preset.get("duration", 2.0)), offsets[0],
+            lambda *args: None, on_completion, on_error,
+            mode=preset.get("mode", MODE_EXACT), sample_step=int(preset.get("sample_step", 1)),
+            encoder=create_encoder(preset.get("format", "jpeg"), **preset.get("encoder_options", {})),
+            offsets=offsets
+        )
+        with self._lock:
+            if path in self._active:
+                self._active[path] = task
+        task.add_done_callback(on_finish)
+    
+    def scan(self):
+        """Consider every matching file already in the watched folders (used at startup)"""
+        for folder in self.folders:
+            try:
+                names = os.listdir(folder.path)
+            except OSError as e:
+                self.log(f"Cannot read {folder.path}: {e}")
+                continue
+            for name in names:
+                self._notice(os.path.join(folder.path, name))
+    
+    def run(self):
+        """Watch until stop() is called; queued extractions keep running on the task manager"""
+        for folder in self.folders:
+            os.makedirs(folder.output, exist_ok=True)
+        watcher = create_watcher([folder.path for folder in self.folders], self.force_polling)
+        self.log(f"Watching {len(self.folders)} folder(s) with "
+                 f"{'inotify' if isinstance(watcher, InotifyWatcher) else 'polling'}")
+        try:
+            self.scan()
+            while not self.stop_event.is_set():
+                for path in watcher.poll(self.stop_event):
+                    self._notice(path)
+                self._check_pending()
+        finally:
+            watcher.close()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued extractions to finish"""
+        with self._lock:
+            tasks = [task for task in self._active.values() if task is not None]
+        return all(task.wait(timeout) for task in tasks)
+
+
+def run_daemon(daemon: WatchDaemon) -> int:
+    """Run a daemon in the foreground until interrupted (Ctrl+C or SIGTERM), then let running jobs finish"""
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.log("Stopping; waiting for running extractions...")
+    finally:
+        daemon.stop()
+        try:
+            daemon.wait_idle()
+        except KeyboardInterrupt:
+            pass
+        get_task_manager().shutdown()
+        daemon.reader_pool.close()
+    return 0
@@ -3,7 +3,7 @@ Input section UI components - URL entry and file browser
 """
 import tkinter as tk
 from tkinter import ttk, filedialog
-from typing import Callable, Optional
+from typing import Callable, List, Optional, Tuple
 
 
 class InputSection:
@@ -14,7 +14,9 @@ class InputSection:
         self.url_change_callback: Optional[Callable[[str], None]] = None
         self.download_callback: Optional[Callable[[], None]] = None
         self.cancel_callback: Optional[Callable[[], None]] = None
+        self.cancel_job_callback: Optional[Callable[[int], None]] = None
         self.file_select_callback: Optional[Callable[[str], None]] = None
+        self._job_ids: List[int] = []
         
         self.setup_ui()
     
@@ -38,6 +40,20 @@ class InputSection:
         self.cancel_btn.pack(side="left", padx=(5, 0))
 
         
+        self.jobs_frame = ttk.Frame(self.parent)
+        self.jobs_frame.pack(pady=(0, 2))
+
+        self.jobs_label = ttk.Label(self.jobs_frame, text="Downloads: ")
+        self.jobs_label.pack(side="left", padx=(0, 5))
+
+        self.jobs_combo = ttk.Combobox(self.jobs_frame, width=40, state="readonly")
+        self.jobs_combo.pack(side="left", padx=(0, 5))
+
+        self.cancel_job_btn = ttk.Button(self.jobs_frame, text="Cancel selected", command=self._on_cancel_job,
+                                         state="disabled")
+        self.cancel_job_btn.pack(side="left")
+
+        
         self.local_frame = ttk.Frame(self.parent)
         self.local_frame.pack(pady=(10, 2))
 
@@ -63,6 +79,12 @@ class InputSection:
         if self.cancel_callback:
             self.cancel_callback()
     
+    def _on_cancel_job(self):
+        """Handle cancel selected button click"""
+        job_id = self.get_selected_job_id()
+        if job_id is not None and self.cancel_job_callback:
+            self.cancel_job_callback(job_id)
+    
     def _on_file_browse(self):
         """Handle file browse button click"""
         file_path = filedialog.askopenfilename(
@@ -76,6 +98,24 @@ class InputSection:
         """Get the current URL from the entry"""
         return self.url_entry.get().strip()
     
+    def get_selected_job_id(self) -> Optional[int]:
+        """Id of the download chosen in the list, or None"""
+        index = self.jobs_combo.current()
+        return self._job_ids[index] if 0 <= index < len(self._job_ids) else None
+    
+    def set_download_jobs(self, jobs: List[Tuple[int, str]]):
+        """List the unfinished downloads as (job id, title), keeping the selection while it is still listed"""
+        selected = self.get_selected_job_id()
+        self._job_ids = [job_id for job_id, _ in jobs]
+        self.jobs_combo.config(values=[f"[{job_id}] {title}" for job_id, title in jobs])
+        if selected in self._job_ids:
+            self.jobs_combo.current(self._job_ids.index(selected))
+        elif self._job_ids:
+            self.jobs_combo.current(0)
+        else:
+            self.jobs_combo.set("")
+        self.cancel_job_btn.config(state="normal" if jobs else "disabled")
+    
     def set_download_state(self, downloading: bool):
         """Update button states based on download status"""
         if downloading:
@@ -88,7 +128,8 @@ class InputSection:
     def set_callbacks(self, url_change: Callable[[str], None] = None,
                      download: Callable[[], None] = None,
                      cancel: Callable[[], None] = None,
-                     file_select: Callable[[str], None] = None):
+                     file_select: Callable[[str], None] = None,
+                     cancel_job: Callable[[int], None] = None):
         """Set callback functions"""
         if url_change:
             self.url_change_callback = url_change
@@ -98,3 +139,5 @@ class InputSection:
             self.cancel_callback = cancel
         if file_select:
             self.file_select_callback = file_select
+        if cancel_job:
+            self.cancel_job_callback = cancel_job
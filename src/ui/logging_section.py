@@ -41,6 +41,9 @@ class LoggingSection:
 
         self.progress_bar = ttk.Progressbar(self.progress_frame, mode='determinate')
         self.progress_bar.pack(fill="x", pady=(5, 0))
+
+        self.throughput_label = ttk.Label(self.progress_frame, text="Throughput: -")
+        self.throughput_label.pack(anchor="w", pady=(5, 0))
     
     def _setup_logger(self):
         """Setup the UI logger"""
@@ -69,3 +72,7 @@ class LoggingSection:
     def reset_progress(self):
         """Reset progress bar to 0"""
         self.progress_bar.config(value=0)
+    
+    def set_throughput(self, text: str):
+        """Update the aggregate download throughput display"""
+        self.throughput_label.config(text=f"Throughput: {text}")
@@ -10,6 +10,24 @@ from typing import Callable, Optional, List, Tuple
 class SlicerSection:
     """Manages video slicer controls and preview"""
     
+    EXTRACTION_MODES = {
+        "Exact frame": "exact",
+        "Sharpest in interval": "sharpest",
+    }
+    
+    OUTPUT_FORMATS = {
+        "JPEG": "jpeg",
+        "WebP": "webp",
+        "PNG": "png",
+        "Raw RGB": "raw",
+    }
+    
+    OUTPUT_KINDS = {
+        "Images": "images",
+        "Video segments (keyframe cuts)": "fast",
+        "Video segments (frame accurate)": "accurate",
+    }
+    
     def __init__(self, parent: tk.Widget):
         self.parent = parent
         self.duration_change_callback: Optional[Callable[[float], None]] = None
@@ -17,6 +35,10 @@ class SlicerSection:
         self.refresh_preview_callback: Optional[Callable[[], None]] = None
         self.choose_directory_callback: Optional[Callable[[str], None]] = None
         self.cut_video_callback: Optional[Callable[[], None]] = None
+        self.pause_cut_callback: Optional[Callable[[bool], None]] = None
+        self.stop_cut_callback: Optional[Callable[[], None]] = None
+        self.calibrate_callback: Optional[Callable[[], None]] = None
+        self.cut_paused = False
         
         self.preview_thumbnails: List[ImageTk.PhotoImage] = []
         self.export_directory: Optional[str] = None
@@ -95,6 +117,42 @@ class SlicerSection:
         self.offset_entry.bind('<FocusOut>', self._on_manual_offset_change)
 
         
+        self.options_frame = ttk.Frame(self.slicer_frame)
+        self.options_frame.pack(fill="x", pady=(0, 10))
+
+        ttk.Label(self.options_frame, text="Frame selection:").pack(side="left")
+        self.mode_combobox = ttk.Combobox(self.options_frame, values=list(self.EXTRACTION_MODES),
+                                          state="readonly", width=22)
+        self.mode_combobox.current(0)
+        self.mode_combobox.pack(side="left", padx=(5, 10))
+
+        ttk.Label(self.options_frame, text="Sample every").pack(side="left")
+        self.sample_step_spinbox = ttk.Spinbox(self.options_frame, from_=1, to=30, width=4)
+        self.sample_step_spinbox.set(1)
+        self.sample_step_spinbox.pack(side="left", padx=(5, 5))
+        ttk.Label(self.options_frame, text="frame(s)").pack(side="left")
+
+        
+        self.format_frame = ttk.Frame(self.slicer_frame)
+        self.format_frame.pack(fill="x", pady=(0, 10))
+
+        ttk.Label(self.format_frame, text="Output:").pack(side="left")
+        self.output_kind_combobox = ttk.Combobox(self.format_frame, values=list(self.OUTPUT_KINDS),
+                                                 state="readonly", width=28)
+        self.output_kind_combobox.current(0)
+        self.output_kind_combobox.pack(side="left", padx=(5, 10))
+
+        ttk.Label(self.format_frame, text="Image format:").pack(side="left")
+        self.format_combobox = ttk.Combobox(self.format_frame, values=list(self.OUTPUT_FORMATS),
+                                            state="readonly", width=10)
+        self.format_combobox.current(0)
+        self.format_combobox.pack(side="left", padx=(5, 10))
+
+        self.calibrate_btn = ttk.Button(self.format_frame, text="Calibrate Encoders",
+                                      command=self._on_calibrate)
+        self.calibrate_btn.pack(side="left")
+
+        
         self.preview_frame = ttk.LabelFrame(self.slicer_frame, text="Preview (6 frames with offset)", padding=5)
         self.preview_frame.pack(fill="both", expand=True, pady=(10, 10))
 
@@ -136,6 +194,14 @@ class SlicerSection:
         self.cut_btn = ttk.Button(self.cut_buttons_frame, text="Cut", command=self._on_cut_video, 
                                 state="disabled")
         self.cut_btn.pack(side="left", padx=(10, 0))
+
+        self.pause_btn = ttk.Button(self.cut_buttons_frame, text="Pause", command=self._on_pause_cut,
+                                  state="disabled")
+        self.pause_btn.pack(side="left", padx=(10, 0))
+
+        self.stop_btn = ttk.Button(self.cut_buttons_frame, text="Stop", command=self._on_stop_cut,
+                                 state="disabled")
+        self.stop_btn.pack(side="left", padx=(5, 0))
         
         
         self.duration_slider.config(command=self._on_duration_change)
@@ -234,6 +300,35 @@ class SlicerSection:
         if self.cut_video_callback:
             self.cut_video_callback()
     
+    def _on_pause_cut(self):
+        """Handle pause/resume button click"""
+        self.cut_paused = not self.cut_paused
+        self.pause_btn.config(text="Resume" if self.cut_paused else "Pause")
+        if self.pause_cut_callback:
+            self.pause_cut_callback(self.cut_paused)
+    
+    def _on_stop_cut(self):
+        """Handle stop button click"""
+        if self.stop_cut_callback:
+            self.stop_cut_callback()
+    
+    def _on_calibrate(self):
+        """Handle calibrate encoders button click"""
+        self.calibrate_btn.config(text="Calibrating...", state="disabled")
+        if self.calibrate_callback:
+            self.calibrate_callback()
+    
+    def reset_calibrate_button(self):
+        """Reset the calibrate button to normal state"""
+        self.calibrate_btn.config(text="Calibrate Encoders", state="normal")
+    
+    def set_cut_running(self, running: bool):
+        """Enable the pause/stop controls while a cut job runs"""
+        state = "normal" if running else "disabled"
+        self.cut_paused = False
+        self.pause_btn.config(text="Pause", state=state)
+        self.stop_btn.config(state=state)
+    
     def get_frame(self) -> ttk.LabelFrame:
         """Get the main frame widget"""
         return self.slicer_frame
@@ -246,6 +341,25 @@ class SlicerSection:
         """Get current offset slider value"""
         return float(self.offset_slider.get())
     
+    def get_extraction_mode(self) -> str:
+        """Get the selected frame selection mode"""
+        return self.EXTRACTION_MODES.get(self.mode_combobox.get(), "exact")
+    
+    def get_sample_step(self) -> int:
+        """Get how many frames to advance between sharpness samples"""
+        try:
+            return max(1, int(self.sample_step_spinbox.get()))
+        except ValueError:
+            return 1
+    
+    def get_output_format(self) -> str:
+        """Get the selected image encoder backend"""
+        return self.OUTPUT_FORMATS.get(self.format_combobox.get(), "jpeg")
+    
+    def get_output_kind(self) -> str:
+        """Get whether to export images or video segments ("images", "fast" or "accurate")"""
+        return self.OUTPUT_KINDS.get(self.output_kind_combobox.get(), "images")
+    
     def get_export_directory(self) -> Optional[str]:
         """Get selected export directory"""
         return self.export_directory
@@ -298,7 +412,10 @@ class SlicerSection:
                      offset_change: Optional[Callable[[float], None]] = None,
                      refresh_preview: Optional[Callable[[], None]] = None,
                      choose_directory: Optional[Callable[[str], None]] = None,
-                     cut_video: Optional[Callable[[], None]] = None):
+                     cut_video: Optional[Callable[[], None]] = None,
+                     pause_cut: Optional[Callable[[bool], None]] = None,
+                     stop_cut: Optional[Callable[[], None]] = None,
+                     calibrate: Optional[Callable[[], None]] = None):
         """Set callback functions"""
         if duration_change:
             self.duration_change_callback = duration_change
@@ -310,3 +427,9 @@ class SlicerSection:
             self.choose_directory_callback = choose_directory
         if cut_video:
             self.cut_video_callback = cut_video
+        if pause_cut:
+            self.pause_cut_callback = pause_cut
+        if stop_cut:
+            self.stop_cut_callback = stop_cut
+        if calibrate:
+            self.calibrate_callback = calibrate
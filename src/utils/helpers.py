@@ -2,6 +2,8 @@
 Helper utility functions
 """
 import os
+import re
+import shutil
 from typing import Tuple
 
 
@@ -30,3 +32,40 @@ def create_progress_bar(progress: float, width: int = 20) -> str:
     """Create ASCII progress bar"""
     filled = int(progress // (100 / width))
     return "█" * filled + "░" * (width - filled)
+
+
+def format_speed(bytes_per_second: float) -> str:
+    """Format a transfer rate in bytes/second to human readable format"""
+    if bytes_per_second >= 1024 * 1024:
+        return f"{bytes_per_second / (1024 * 1024):.1f} MB/s"
+    return f"{bytes_per_second / 1024:.1f} KB/s"
+
+
+def get_app_data_dir(*subdirs: str) -> str:
+    """Get (and create) the per-user application data directory"""
+    base = os.environ.get("SMV_EXTRACTER_HOME")
+    if not base:
+        if os.name == "nt":
+            base = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "SMV-Extracter")
+        else:
+            base = os.path.join(os.path.expanduser("~"), ".smv-extracter")
+    path = os.path.join(base, *subdirs)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def link_or_copy(source_path: str, target_path: str):
+    """Hard-link source_path to target_path, copying when links are not supported"""
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        return
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copy2(source_path, target_path)
+
+
+def safe_filename_part(text: str, max_length: int = 40) -> str:
+    """Reduce free text (e.g. a subtitle line) to something safe inside a file name"""
+    return re.sub(r"[^\w.-]+", "_", text).strip("._")[:max_length]
@@ -0,0 +1,348 @@
+"""
+Per-stage timing histograms and opt-in cProfile / sampling profiles for extraction and preview jobs
+"""
+import cProfile
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import BinaryIO, Callable, Dict, List, Optional
+from .helpers import get_app_data_dir, safe_filename_part
+
+
+PROFILE_ENV = "SMV_EXTRACTER_PROFILE"
+PROFILE_OFF = "off"
+PROFILE_STAGES = "stages"
+PROFILE_CPROFILE = "cprofile"
+PROFILE_SAMPLE = "sample"
+PROFILE_MODES = (PROFILE_OFF, PROFILE_STAGES, PROFILE_CPROFILE, PROFILE_SAMPLE)
+
+# Histogram buckets per doubling of duration (about 9% resolution)
+BUCKETS_PER_OCTAVE = 8
+SAMPLE_INTERVAL = 0.005
+
+
+def profile_mode_from_env() -> str:
+    """Profiling mode from SMV_EXTRACTER_PROFILE, off unless set to a known mode"""
+    mode = os.environ.get(PROFILE_ENV, PROFILE_OFF).strip().lower()
+    return mode if mode in PROFILE_MODES else PROFILE_OFF
+
+
+class StageStats:
+    """Log-bucketed latency histogram of one stage"""
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets: Dict[int, int] = {}
+    
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = math.floor(math.log2(max(seconds, 1e-7) * 1e6) * BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+    
+    def percentile(self, fraction: float) -> float:
+        """Upper edge of the bucket holding the given fraction of samples, capped at the slowest sample"""
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE) / 1e6)
+        return self.max
+    
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+        }
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every hook is a no-op"""
+    
+    enabled = False
+    mode = PROFILE_OFF
+    report_path: Optional[str] = None
+    
+    def stage(self, name: str) -> _NullStage:
+        return _NULL_STAGE
+    
+    def record(self, name: str, seconds: float):
+        pass
+    
+    def worker(self) -> _NullStage:
+        return _NULL_STAGE
+    
+    def save(self, filepath: str, encode: Callable[[BinaryIO], None]):
+        """Open filepath and let encode write the file"""
+        with open(filepath, "wb") as f:
+            encode(f)
+    
+    def start(self):
+        pass
+    
+    def finish(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "started")
+    
+    def __init__(self, profiler: "JobProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _WorkerProfile:
+    """Profiles the calling worker thread into its own cProfile.Profile for the duration of the block"""
+    
+    __slots__ = ("profile",)
+    
+    def __init__(self, profile: Optional[cProfile.Profile]):
+        self.profile = profile
+    
+    def __enter__(self):
+        if self.profile:
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile per process, and the job's profiler already sees every thread
+                self.profile = None
+        return self
+    
+    def __exit__(self, *exc):
+        if self.profile:
+            self.profile.disable()
+        return False
+
+
+class _TimedWriter:
+    """File wrapper that times its writes; it has no fileno, so PIL writes through it rather than to the fd"""
+    
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.seconds = 0.0
+    
+    def write(self, data) -> int:
+        started = time.perf_counter()
+        try:
+            return self._f.write(data)
+        finally:
+            self.seconds += time.perf_counter() - started
+    
+    def flush(self):
+        started = time.perf_counter()
+        self._f.flush()
+        self.seconds += time.perf_counter() - started
+    
+    def tell(self) -> int:
+        return self._f.tell()
+    
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._f.seek(offset, whence)
+
+
+class _StackSampler:
+    """Samples the Python stacks of every other thread and counts them in collapsed (flame graph) form"""
+    
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+    
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+    
+    def dump(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class JobProfiler:
+    """Collects per-stage timings for one job and writes a JSON report (plus a profile dump when asked) at the end"""
+    
+    enabled = True
+    
+    def __init__(self, job_name: str, mode: str = PROFILE_STAGES, report_dir: Optional[str] = None):
+        self.job_name = job_name
+        self.mode = mode
+        self.report_dir = report_dir
+        self.report_path: Optional[str] = None
+        self.profile_path: Optional[str] = None
+        self.stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self.seconds = 0.0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._cprofile_thread: Optional[int] = None
+        self._worker_profiles: Dict[int, cProfile.Profile] = {}
+        self._sampler: Optional[_StackSampler] = None
+        self.error: Optional[str] = None
+    
+    def stage(self, name: str) -> _Stage:
+        """Context manager timing one pass through a stage"""
+        return _Stage(self, name)
+    
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = StageStats()
+            stats.add(seconds)
+    
+    def worker(self) -> _WorkerProfile:
+        """Context manager that adds the calling pool thread (e.g. a frame encoder) to the cProfile dump
+        
+        cProfile only sees the thread that enabled it, so in cprofile mode each worker thread gets its own profile,
+        merged into the job's at finish(). Other modes need nothing here: sample mode already covers every thread.
+        """
+        thread_id = threading.get_ident()
+        if self._cprofile is None or thread_id == self._cprofile_thread:
+            return _WorkerProfile(None)
+        with self._lock:
+            profile = self._worker_profiles.get(thread_id)
+            if profile is None:
+                profile = self._worker_profiles[thread_id] = cProfile.Profile()
+        return _WorkerProfile(profile)
+    
+    def save(self, filepath: str, encode: Callable[[BinaryIO], None]):
+        """Let encode write filepath, recording encoding and file I/O (open, writes, close) as separate stages"""
+        started = time.perf_counter()
+        with open(filepath, "wb") as f:
+            opened = time.perf_counter()
+            writer = _TimedWriter(f)
+            encode(writer)
+            encoded = time.perf_counter()
+        closed = time.perf_counter()
+        self.record("encode", encoded - opened - writer.seconds)
+        self.record("write", (opened - started) + writer.seconds + (closed - encoded))
+    
+    def start(self):
+        """Start the clock, and the cProfile or stack sampler for those modes; call from the job's thread"""
+        self._started = time.perf_counter()
+        if self.mode == PROFILE_CPROFILE:
+            self._cprofile = cProfile.Profile()
+            self._cprofile_thread = threading.get_ident()
+            self._cprofile.enable()
+        elif self.mode == PROFILE_SAMPLE:
+            self._sampler = _StackSampler()
+            self._sampler.start()
+    
+    def finish(self) -> Optional[str]:
+        """Stop profiling and write the report; returns the report path"""
+        self.seconds = time.perf_counter() - self._started
+        if self._cprofile:
+            self._cprofile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        try:
+            directory = self.report_dir or get_app_data_dir("profiles")
+            base = os.path.join(directory, f"{safe_filename_part(self.job_name)}-{time.strftime('%Y%m%d-%H%M%S')}"
+                                           f"-{os.getpid()}-{id(self) & 0xffff:04x}")
+            if self._cprofile:
+                self.profile_path = base + ".prof"
+                stats = pstats.Stats(self._cprofile)
+                with self._lock:
+                    workers = list(self._worker_profiles.values())
+                for profile in workers:
+                    if profile.getstats():
+                        stats.add(profile)
+                stats.dump_stats(self.profile_path)
+            elif self._sampler:
+                self.profile_path = base + ".folded"
+                self._sampler.dump(self.profile_path)
+            self.report_path = base + ".json"
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                json.dump(self.as_dict(), f, indent=2)
+        except OSError as e:
+            self.error = f"Could not write profile report: {e}"
+        return self.report_path
+    
+    def as_dict(self) -> dict:
+        with self._lock:
+            stages = {name: stats.as_dict() for name, stats in self.stages.items()}
+        return {
+            'job': self.job_name,
+            'mode': self.mode,
+            'seconds': self.seconds,
+            'stages': stages,
+            'profile': self.profile_path,
+        }
+    
+    def summary(self) -> List[str]:
+        """Log lines with one row per stage, slowest total first"""
+        stages = self.as_dict()['stages']
+        lines = [f"Profile of {self.job_name}: {self.seconds:.2f}s wall",
+                 f"  {'stage':<10}{'count':>7}{'total s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+        for name, stats in sorted(stages.items(), key=lambda item: -item[1]['total']):
+            lines.append(f"  {name:<10}{stats['count']:>7}{stats['total']:>9.2f}{stats['p50'] * 1000:>9.2f}"
+                         f"{stats['p95'] * 1000:>9.2f}{stats['p99'] * 1000:>9.2f}")
+        if self.report_path:
+            lines.append(f"  report: {self.report_path}")
+        if self.profile_path:
+            lines.append(f"  profile: {self.profile_path}")
+        if self.error:
+            lines.append(f"  {self.error}")
+        return lines
+
+
+def create_profiler(job_name: str, mode: Optional[str] = None):
+    """JobProfiler for the mode (SMV_EXTRACTER_PROFILE when None), or the shared no-op profiler when off"""
+    mode = mode or profile_mode_from_env()
+    if mode == PROFILE_OFF:
+        return NULL_PROFILER
+    return JobProfiler(job_name, mode)
@@ -0,0 +1,152 @@
+"""
+Watchdog for the Tk event loop: detects main-thread stalls and logs them with the blocking stack
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, List, Optional
+from .helpers import get_app_data_dir
+
+
+STALL_ENV = "SMV_EXTRACTER_STALL_MS"
+DEFAULT_THRESHOLD_MS = 250
+TICK_INTERVAL = 0.05
+# While a stall lasts, the main thread's stack is sampled again this often, up to MAX_STACKS times
+RESAMPLE_INTERVAL = 1.0
+MAX_STACKS = 5
+SUMMARY_BUCKETS = (0.5, 1.0, 2.0, 5.0)
+
+
+def stall_threshold_from_env() -> Optional[float]:
+    """Stall threshold in seconds from SMV_EXTRACTER_STALL_MS; None when set to 0 (detector disabled)"""
+    try:
+        threshold_ms = float(os.environ.get(STALL_ENV, DEFAULT_THRESHOLD_MS))
+    except ValueError:
+        threshold_ms = DEFAULT_THRESHOLD_MS
+    return threshold_ms / 1000 if threshold_ms > 0 else None
+
+
+class Stall:
+    """One period where the event loop did not run for longer than the threshold"""
+    
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.duration = 0.0
+        self.stacks: List[tuple] = []
+        self.last_sample = 0.0
+
+
+class StallDetector:
+    """Schedules periodic after() ticks on the Tk root; a watchdog thread captures the main stack when ticks stop"""
+    
+    def __init__(self, root, threshold: float = DEFAULT_THRESHOLD_MS / 1000, interval: float = TICK_INTERVAL,
+                 log_path: Optional[str] = None, clock: Callable[[], float] = time.monotonic):
+        self.root = root
+        self.threshold = threshold
+        self.interval = interval
+        self.log_path = log_path or os.path.join(get_app_data_dir("diagnostics"), "stalls.log")
+        self.clock = clock
+        self.stalls: List[Stall] = []
+        self.ticks = 0
+        self.max_latency = 0.0
+        self.main_thread_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._last_tick = 0.0
+        self._current: Optional[Stall] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._after_id = None
+    
+    def start(self):
+        """Begin ticking; call from the Tk thread before mainloop"""
+        self.main_thread_id = threading.get_ident()
+        self._last_tick = self.clock()
+        self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+        self._watchdog = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._watchdog.start()
+        self._write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} session started, "
+                    f"threshold {self.threshold * 1000:.0f} ms\n")
+    
+    def _tick(self):
+        now = self.clock()
+        with self._lock:
+            latency = now - self._last_tick - self.interval
+            self._last_tick = now
+            stall = self._current
+            self._current = None
+            self.ticks += 1
+            self.max_latency = max(self.max_latency, latency)
+        if latency >= self.threshold:
+            self._finish(stall or Stall(now - latency), latency)
+        if not self._stop.is_set():
+            self._after_id = self.root.after(int(self.interval * 1000), self._tick)
+    
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                now = self.clock()
+                if now - self._last_tick - self.interval < self.threshold:
+                    continue
+                if self._current is None:
+                    self._current = Stall(self._last_tick + self.interval)
+                stall = self._current
+                if len(stall.stacks) < MAX_STACKS and (not stall.stacks or
+                                                       now - stall.last_sample >= RESAMPLE_INTERVAL):
+                    stall.stacks.append((now - stall.started_at, self._main_stack()))
+                    stall.last_sample = now
+    
+    def _main_stack(self) -> str:
+        frame = sys._current_frames().get(self.main_thread_id)
+        return "".join(traceback.format_stack(frame)) if frame else "  <main thread stack unavailable>\n"
+    
+    def _finish(self, stall: Stall, duration: float):
+        stall.duration = duration
+        self.stalls.append(stall)
+        lines = [f"{time.strftime('%Y-%m-%d %H:%M:%S')} UI stall of {duration * 1000:.0f} ms\n"]
+        if not stall.stacks:
+            lines.append("  (ended before the watchdog sampled the stack)\n")
+        for offset, stack in stall.stacks:
+            lines.append(f"  main thread stack {offset * 1000:.0f} ms into the stall:\n")
+            lines.extend("  " + line + "\n" for line in stack.rstrip("\n").split("\n"))
+        self._write("".join(lines))
+    
+    def _write(self, text: str):
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Could not write stall log: {e}")
+    
+    def summary(self) -> str:
+        """Stall count, total and longest duration, and a duration histogram for this session"""
+        durations = [stall.duration for stall in self.stalls]
+        if not durations:
+            return (f"UI stalls: none over {self.threshold * 1000:.0f} ms in {self.ticks} ticks "
+                    f"(worst event-loop latency {self.max_latency * 1000:.0f} ms)")
+        edges = (self.threshold,) + SUMMARY_BUCKETS + (float("inf"),)
+        buckets = []
+        for low, high in zip(edges, edges[1:]):
+            count = sum(1 for duration in durations if low <= duration < high)
+            if count and high > low:
+                label = f">={low:g}s" if high == float("inf") else f"{low:g}-{high:g}s"
+                buckets.append(f"{label}: {count}")
+        return (f"UI stalls: {len(durations)} over {self.threshold * 1000:.0f} ms, total {sum(durations):.2f}s, "
+                f"longest {max(durations):.2f}s ({', '.join(buckets)}); details in {self.log_path}")
+    
+    def stop(self) -> str:
+        """Stop the watchdog and append the session summary to the diagnostics log"""
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if self._watchdog:
+            self._watchdog.join()
+            self._watchdog = None
+        summary = self.summary()
+        self._write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} session ended: {summary}\n")
+        return summary
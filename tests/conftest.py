@@ -0,0 +1,58 @@
+"""
+Shared fixtures: a task manager per test, generated video clips and a stand-in for VideoProcessor
+"""
+import time
+import pytest
+from src.core.task_manager import TaskManager
+
+@pytest.fixture
+def task_manager():
+    """A private TaskManager without kind limits, shut down after the test"""
+    manager = TaskManager(kind_limits={})
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture(scope="session")
+def synthetic_clip(tmp_path_factory):
+    """Factory for testsrc2 clips (width, height, duration, fps), generated once per session"""
+    pytest.importorskip("imageio_ffmpeg")
+    from benchmarks.fixtures import synthetic_video
+    directory = str(tmp_path_factory.mktemp("fixtures"))
+    
+    def clip(width: int = 160, height: int = 90, duration: float = 6, fps: float = 10) -> str:
+        return synthetic_video(directory, width, height, duration, fps)
+    
+    return clip
+
+
+class StubProcessor:
+    """Stands in for VideoProcessor where only the callback contract matters
+    
+    A cut reports steps progress events and completes, or runs until cancelled while endless is set.
+    """
+    
+    def __init__(self, task_manager: TaskManager):
+        self.task_manager = task_manager
+        self.steps = 5
+        self.endless = False
+    
+    def cut_video_to_images(self, video_path, export_directory, duration, offset, progress_callback,
+                            completion_callback, error_callback, **options):
+        steps, endless = self.steps, self.endless
+        
+        def do_cut(task):
+            step = 0
+            while step < steps or endless:
+                task.check()
+                step += 1
+                progress_callback(min(step, steps) / steps * 100, f"step {step}", step, steps)
+                time.sleep(0.01)
+            completion_callback(step, export_directory)
+        
+        return self.task_manager.submit(do_cut, f"Stub cut: {video_path}", kind="extract")
+
+
+@pytest.fixture
+def stub_processor(task_manager):
+    return StubProcessor(task_manager)
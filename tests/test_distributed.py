@@ -0,0 +1,120 @@
+"""
+Lease queue: shards cut by in-process workers merge into exactly what a single-node cut writes
+"""
+import filecmp
+import json
+import os
+import threading
+import time
+from src.core.distributed import TASK_DONE, TASK_LEASED, Coordinator, LeaseQueue, Worker
+from src.core.reader_pool import ReaderPool
+from src.core.video_processor import VideoProcessor
+
+
+def comparable(manifest_path: str) -> dict:
+    """Manifest without the fields that differ between runs (creation time, output directory)"""
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.pop('created')
+    for rendition in data['renditions']:
+        rendition.pop('directory')
+    return data
+
+
+def test_two_workers_match_single_node_cut(tmp_path, task_manager, synthetic_clip):
+    video = synthetic_clip(160, 90, 12, 10)
+    reader_pool = ReaderPool()
+    queue_path = str(tmp_path / "queue.db")
+    coordinator_queue = LeaseQueue(queue_path)
+    worker_queues = [LeaseQueue(queue_path) for _ in range(2)]
+    sharded, single = tmp_path / "sharded", tmp_path / "single"
+    try:
+        coordinator = Coordinator(coordinator_queue, reader_pool=reader_pool, log=lambda message: None)
+        job_id = coordinator.submit(video, str(sharded), 1.0, [0.0, 0.5], shards=4)
+        assert len(coordinator_queue.job_tasks(job_id)) == 4
+        
+        workers = [Worker(queue, VideoProcessor(task_manager, reader_pool), worker_id=f"worker-{n}", poll=0.01,
+                          log=lambda message: None)
+                   for n, queue in enumerate(worker_queues)]
+        threads = [threading.Thread(target=worker.run, args=(True,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(120)
+        assert sum(worker.completed for worker in workers) == 4
+        assert coordinator.wait([job_id], poll=0.01)
+        
+        errors = []
+        task = VideoProcessor(task_manager, reader_pool).cut_video_to_images(
+            video, str(single), 1.0, 0.0, lambda *args: None, lambda count, directory: None, errors.append,
+            offsets=[0.0, 0.5])
+        assert task.wait(120) and not errors
+    finally:
+        reader_pool.close()
+        for queue in [coordinator_queue] + worker_queues:
+            queue.close()
+    
+    name = os.path.splitext(os.path.basename(video))[0]
+    assert comparable(str(sharded / f"{name}_manifest.json")) == comparable(str(single / f"{name}_manifest.json"))
+    images = sorted(os.listdir(single))
+    assert sorted(os.listdir(sharded)) == images
+    images.remove(f"{name}_manifest.json")
+    match, mismatch, errors = filecmp.cmpfiles(sharded, single, images, shallow=False)
+    assert not mismatch and not errors and len(match) == len(images) > 0
+
+
+def test_expired_lease_is_leased_again(tmp_path):
+    now = [1000.0]
+    queue = LeaseQueue(str(tmp_path / "queue.db"), lease_seconds=10, clock=lambda: now[0])
+    try:
+        job_id = queue.add_job({}, [{'time_range': [0.0, 1.0]}])
+        first = queue.lease("crashed")
+        assert first is not None and first.attempts == 1
+        assert queue.lease("other") is None
+        
+        now[0] += 11
+        second = queue.lease("other")
+        assert second is not None
+        assert second.task_id == first.task_id and second.attempts == 2
+        assert queue.job_counts(job_id) == {TASK_LEASED: 1}
+        
+        assert not queue.heartbeat(first, "crashed")
+        assert not queue.complete(first, "crashed", {'images': 1})
+        assert queue.complete(second, "other", {'images': 1})
+        assert queue.job_counts(job_id) == {TASK_DONE: 1}
+    finally:
+        queue.close()
+
+
+def test_worker_gives_up_a_cut_cancelled_before_it_starts(tmp_path, task_manager):
+    release = threading.Event()
+    task_manager.max_workers = 1
+    task_manager.submit(lambda task: release.wait(30), "busy")
+    queue = LeaseQueue(str(tmp_path / "queue.db"))
+    submitted = []
+    
+    class RecordingProcessor(VideoProcessor):
+        def cut_video_to_images(self, *args, **kwargs):
+            task = super().cut_video_to_images(*args, **kwargs)
+            submitted.append(task)
+            return task
+    
+    try:
+        job_id = queue.add_job({}, [{'video': str(tmp_path / "clip.mp4"), 'output': str(tmp_path), 'duration': 2.0,
+                            'offsets': [0.0], 'mode': "exact", 'sample_step': 1, 'format': "jpeg",
+                            'encoder_options': {}, 'time_range': [0.0, 10.0]}])
+        worker = Worker(queue, RecordingProcessor(task_manager), worker_id="worker", log=lambda message: None)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(worker.run_once()))
+        thread.start()
+        deadline = time.monotonic() + 10
+        while not submitted and time.monotonic() < deadline:
+            time.sleep(0.01)
+        submitted[0].cancel()
+        thread.join(10)
+        assert result == [True]
+        assert worker.completed == 0
+        assert queue.job_counts(job_id) == {TASK_LEASED: 1}
+    finally:
+        release.set()
+        queue.close()
@@ -0,0 +1,101 @@
+"""
+Job API on an ephemeral localhost port: submit, follow progress over SSE, cancel
+"""
+import http.client
+import json
+import threading
+import pytest
+from src.core.job_api import JOB_CANCELLED, JOB_COMPLETED, JobApiServer, JobQueue
+
+
+@pytest.fixture
+def api(tmp_path, stub_processor):
+    queue = JobQueue(stub_processor, downloader=object(), segment_exporter=object(),
+                     download_dir=str(tmp_path / "downloads"))
+    server = JobApiServer(queue, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"")
+    try:
+        yield server.server_address[1], str(video), str(tmp_path / "out"), stub_processor
+    finally:
+        server.shutdown()
+        server.server_close()
+        queue.shutdown()
+
+
+def request(port: int, method: str, path: str, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def events(port: int, job_id: int):
+    """Yield (event, data) pairs from the job's SSE stream until the server closes it"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("GET", f"/jobs/{job_id}/events")
+    response = connection.getresponse()
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "text/event-stream"
+    event = None
+    try:
+        for line in iter(response.readline, b""):
+            line = line.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+    finally:
+        connection.close()
+
+
+def test_submit_and_follow_progress(api):
+    port, video, output, processor = api
+    status, job = request(port, "POST", "/jobs", {'source': video, 'output': output, 'duration': 1.0})
+    assert status == 202
+    
+    received = list(events(port, job['id']))
+    progress = [data for event, data in received if event == "progress"]
+    assert [data['current'] for data in progress] == list(range(1, processor.steps + 1))
+    assert progress[-1]['percent'] == 100
+    event, end = received[-1]
+    assert event == "end"
+    assert end['state'] == JOB_COMPLETED and end['outputs'] == processor.steps
+    assert request(port, "GET", f"/jobs/{job['id']}")[1]['state'] == JOB_COMPLETED
+
+
+def test_cancel_running_job(api):
+    port, video, output, processor = api
+    processor.endless = True
+    status, job = request(port, "POST", "/jobs", {'source': video, 'output': output})
+    assert status == 202
+    
+    stream = events(port, job['id'])
+    for event, data in stream:
+        if event == "progress":
+            break
+    status, cancelled = request(port, "DELETE", f"/jobs/{job['id']}")
+    assert status == 200
+    event, end = list(stream)[-1]
+    assert event == "end"
+    assert end['state'] == JOB_CANCELLED
+    assert request(port, "GET", f"/jobs/{job['id']}")[1]['state'] == JOB_CANCELLED
+
+
+def test_cancel_queued_job(api):
+    port, video, output, processor = api
+    processor.endless = True
+    first = request(port, "POST", "/jobs", {'source': video, 'output': output})[1]
+    request(port, "POST", "/jobs", {'source': video, 'output': output})
+    status, queued = request(port, "POST", "/jobs", {'source': video, 'output': output})
+    assert queued['state'] == "queued"
+    
+    assert request(port, "DELETE", f"/jobs/{queued['id']}")[1]['state'] == JOB_CANCELLED
+    assert list(events(port, queued['id']))[-1][1]['state'] == JOB_CANCELLED
+    request(port, "DELETE", f"/jobs/{first['id']}")
+    assert list(events(port, first['id']))[-1][1]['state'] == JOB_CANCELLED
@@ -0,0 +1,87 @@
+"""
+The memory budget never hands out more than its limit, including under previews and cuts running together
+"""
+import threading
+import pytest
+from src.core.memory_budget import SUBSYSTEM_EXTRACTION, SUBSYSTEM_PREVIEW, MemoryBudget
+
+MB = 1024 * 1024
+
+
+def test_try_reserve_refuses_past_limit():
+    budget = MemoryBudget(10 * MB)
+    assert budget.try_reserve(SUBSYSTEM_PREVIEW, 6 * MB)
+    assert not budget.try_reserve(SUBSYSTEM_EXTRACTION, 5 * MB)
+    assert budget.try_reserve(SUBSYSTEM_EXTRACTION, 4 * MB)
+    assert budget.available == 0
+    budget.release(SUBSYSTEM_PREVIEW, 6 * MB)
+    assert budget.reserved == 4 * MB
+    assert budget.peak_reserved == 10 * MB
+
+
+def test_fit_count_leaves_room_for_extra_bytes():
+    budget = MemoryBudget(10 * MB)
+    budget.reserve(SUBSYSTEM_PREVIEW, 2 * MB)
+    assert budget.fit_count(MB, wanted=16, extra_bytes=3 * MB) == 5
+    assert budget.fit_count(MB, wanted=4, extra_bytes=3 * MB) == 4
+    assert budget.fit_count(MB, wanted=16, minimum=2, extra_bytes=10 * MB) == 2
+
+
+def test_reserve_going_over_shows_in_peak():
+    budget = MemoryBudget(4 * MB)
+    budget.reserve(SUBSYSTEM_EXTRACTION, 5 * MB)
+    assert budget.peak_reserved > budget.limit_bytes
+    budget.release(SUBSYSTEM_EXTRACTION, 5 * MB)
+    assert budget.reserved == 0
+
+
+def test_concurrent_try_reserve_stays_within_limit():
+    budget = MemoryBudget(32 * MB)
+    start = threading.Barrier(8)
+    
+    def churn(subsystem: str):
+        start.wait()
+        for _ in range(2000):
+            if budget.try_reserve(subsystem, 3 * MB):
+                budget.release(subsystem, 3 * MB)
+    
+    threads = [threading.Thread(target=churn, args=(SUBSYSTEM_PREVIEW if i % 2 else SUBSYSTEM_EXTRACTION,))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert budget.reserved == 0
+    assert 0 < budget.peak_reserved <= budget.limit_bytes
+
+
+def test_previews_and_cuts_stay_within_budget(tmp_path_factory):
+    pytest.importorskip("imageio_ffmpeg")
+    from benchmarks.fixtures import synthetic_video
+    from src.core.reader_pool import ReaderPool
+    from src.core.task_manager import TaskManager
+    from src.core.thumbnail_manager import ThumbnailManager
+    from src.core.video_processor import MODE_EXACT, MODE_SHARPEST, VideoProcessor
+    
+    video = synthetic_video(str(tmp_path_factory.mktemp("fixtures")), 640, 360, 20, 10)
+    budget = MemoryBudget(24 * MB)
+    task_manager = TaskManager()
+    reader_pool = ReaderPool(memory_budget=budget)
+    processor = VideoProcessor(task_manager, reader_pool, budget)
+    thumbnails = ThumbnailManager(task_manager=task_manager, reader_pool=reader_pool, memory_budget=budget,
+                                  photo_factory=lambda image: image)
+    errors = []
+    try:
+        tasks = [thumbnails.generate_preview_thumbnails(video, 1.0, offset, lambda previews: None)
+                 for offset in (0.0, 5.0, 10.0)]
+        for mode, duration, output in ((MODE_EXACT, 0.5, "exact"), (MODE_SHARPEST, 2.0, "sharpest")):
+            tasks.append(processor.cut_video_to_images(
+                video, str(tmp_path_factory.mktemp(output)), duration, 0.0,
+                lambda *args: None, lambda count, directory: None, errors.append, mode=mode))
+        for task in tasks:
+            assert task.wait(120)
+    finally:
+        task_manager.shutdown()
+        reader_pool.close()
+    assert not errors
+    assert budget.peak_reserved <= budget.limit_bytes, budget.report()
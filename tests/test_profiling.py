@@ -0,0 +1,36 @@
+"""
+Job profiler: cProfile dumps cover work done on encoder pool threads
+"""
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.profiling import PROFILE_CPROFILE, JobProfiler
+
+
+def encode_on_pool_thread(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_cprofile_dump_includes_worker_threads(tmp_path):
+    profiler = JobProfiler("cut clip", PROFILE_CPROFILE, report_dir=str(tmp_path))
+    profiler.start()
+    
+    def work(n: int) -> int:
+        with profiler.worker():
+            return encode_on_pool_thread(n)
+    
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(work, [1000] * 8))
+    profiler.finish()
+    
+    assert profiler.error is None
+    names = {function for _, _, function in pstats.Stats(profiler.profile_path).stats}
+    assert "encode_on_pool_thread" in names
+
+
+def test_unwritable_report_is_logged_in_summary(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    profiler = JobProfiler("cut clip", report_dir=str(blocker / "profiles"))
+    profiler.start()
+    profiler.finish()
+    assert profiler.error and profiler.error in "\n".join(profiler.summary())
@@ -0,0 +1,32 @@
+"""
+Reader pool probes kept in the media store across processes
+"""
+import pytest
+
+pytest.importorskip("imageio_ffmpeg")
+
+from benchmarks.fixtures import synthetic_video
+from src.core import reader_pool
+from src.core.media_store import MediaStore
+from src.core.reader_pool import ReaderPool
+
+
+def test_new_pool_reuses_stored_probe(tmp_path, monkeypatch):
+    video = synthetic_video(str(tmp_path / "fixtures"), 160, 90, 2, 10)
+    info = ReaderPool(media_store=MediaStore(str(tmp_path / "store"))).probe(video)
+    assert (info['width'], info['height'], info['fps']) == (160, 90, 10)
+    
+    def no_ffmpeg(path):
+        raise AssertionError("probed again")
+    
+    monkeypatch.setattr(reader_pool, "probe_video", no_ffmpeg)
+    assert ReaderPool(media_store=MediaStore(str(tmp_path / "store"))).probe(video) == info
+
+
+def test_incomplete_stored_probe_is_refreshed(tmp_path):
+    video = synthetic_video(str(tmp_path / "fixtures"), 160, 90, 2, 10)
+    store = MediaStore(str(tmp_path / "store"))
+    store.save_probe(store.resolve_local(video), {'duration': 2.0})
+    info = ReaderPool(media_store=store).probe(video)
+    assert info['fps'] == 10
+    assert MediaStore(str(tmp_path / "store")).resolve_local(video).probe['width'] == 160
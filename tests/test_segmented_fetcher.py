@@ -0,0 +1,100 @@
+"""
+Segmented fetcher against a local HTTP Range server: progress ordering and resume
+"""
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.core.segmented_fetcher import PART_SUFFIX, STATE_SUFFIX, SegmentedFetcher
+
+SIZE = 8 * 1024 * 1024
+DATA = os.urandom(SIZE)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves DATA with single byte-range support, counting the body bytes it sends"""
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        start, end = (int(match.group(1)), int(match.group(2) or SIZE - 1)) if match else (0, SIZE - 1)
+        body = DATA[start:end + 1]
+        self.send_response(206 if match else 200)
+        if match:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{SIZE}")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"fixture"')
+        self.end_headers()
+        for offset in range(0, len(body), 64 * 1024):
+            self.wfile.write(body[offset:offset + 64 * 1024])
+            with self.server.lock:
+                self.server.served += min(64 * 1024, len(body) - offset)
+
+
+@pytest.fixture
+def media_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.served = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/clip.mp4", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fetcher() -> SegmentedFetcher:
+    return SegmentedFetcher(max_connections=8, min_segment_size=SIZE // 8, chunk_size=16 * 1024)
+
+
+def test_progress_totals_only_increase(media_url, tmp_path):
+    url, _ = media_url
+    reports = []
+    dest = str(tmp_path / "clip.mp4")
+    
+    def slow_hook(d):
+        # a hook that takes a moment lets segment threads overlap inside it
+        time.sleep(0.0005)
+        reports.append(d['downloaded_bytes'])
+    
+    fetcher().fetch(url, dest, slow_hook)
+    
+    downloading = reports[:-1]
+    assert len(downloading) > 8
+    assert all(a < b for a, b in zip(downloading, downloading[1:]))
+    assert reports[-1] == downloading[-1] == SIZE
+    with open(dest, "rb") as f:
+        assert f.read() == DATA
+
+
+def test_resume_fetches_only_missing_bytes(media_url, tmp_path):
+    url, server = media_url
+    dest = str(tmp_path / "clip.mp4")
+    
+    def abort_halfway(d):
+        if d['downloaded_bytes'] >= SIZE // 2:
+            raise RuntimeError("stop")
+    
+    with pytest.raises(RuntimeError):
+        fetcher().fetch(url, dest, abort_halfway)
+    assert os.path.exists(dest + PART_SUFFIX) and os.path.exists(dest + STATE_SUFFIX)
+    
+    with server.lock:
+        server.served = 0
+    reports = []
+    fetcher().fetch(url, dest, lambda d: reports.append(d['downloaded_bytes']))
+    
+    resumed = reports[0]
+    assert resumed >= SIZE // 2
+    assert server.served <= SIZE - resumed + 16 * 1024 * 8 + 1
+    assert all(a < b for a, b in zip(reports[:-1], reports[1:-1]))
+    assert not os.path.exists(dest + STATE_SUFFIX)
+    with open(dest, "rb") as f:
+        assert f.read() == DATA
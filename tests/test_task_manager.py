@@ -0,0 +1,58 @@
+"""
+Task manager done callbacks report every way a task can end
+"""
+import threading
+from src.core.task_manager import TASK_CANCELLED, TASK_COMPLETED, TASK_FAILED, TaskManager
+
+
+def test_done_callbacks_see_final_state():
+    task_manager = TaskManager(kind_limits={})
+    states = {}
+    try:
+        def fail(task):
+            raise ValueError("boom")
+        
+        for name, fn in (("ok", lambda task: 1), ("fail", fail)):
+            task = task_manager.submit(fn, name)
+            task.add_done_callback(lambda task: states.__setitem__(task.name, task.state))
+            assert task.wait(5)
+    finally:
+        task_manager.shutdown()
+    assert states == {"ok": TASK_COMPLETED, "fail": TASK_FAILED}
+
+
+def test_cancelling_a_queued_task_fires_at_once():
+    task_manager = TaskManager(max_workers=1, kind_limits={})
+    release = threading.Event()
+    task_manager.submit(lambda task: release.wait(10), "busy")
+    queued = task_manager.submit(lambda task: None, "queued")
+    states = []
+    queued.add_done_callback(lambda task: states.append(task.state))
+    try:
+        queued.cancel()
+        assert states == [TASK_CANCELLED]
+        queued.add_done_callback(lambda task: states.append(task.state))
+        assert states == [TASK_CANCELLED, TASK_CANCELLED]
+    finally:
+        release.set()
+        task_manager.shutdown()
+
+
+def test_cancelling_a_running_task_reports_cancelled():
+    task_manager = TaskManager(kind_limits={})
+    started = threading.Event()
+    
+    def run(task):
+        started.set()
+        while True:
+            task.check()
+            started.wait(0.01)
+    
+    task = task_manager.submit(run, "loop")
+    try:
+        assert started.wait(5)
+        task.cancel()
+        assert task.wait(5)
+        assert task.state == TASK_CANCELLED
+    finally:
+        task_manager.shutdown()
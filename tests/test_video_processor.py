@@ -0,0 +1,52 @@
+"""
+Cutting a synthetic clip through the real VideoProcessor
+"""
+import os
+import threading
+import pytest
+
+pytest.importorskip("imageio_ffmpeg")
+
+from benchmarks.fixtures import synthetic_video
+from src.core.encoders import JpegEncoder
+from src.core.task_manager import TaskManager
+from src.core.video_processor import VideoProcessor
+
+
+class FailingEncoder(JpegEncoder):
+    """JPEG encoder that writes a few bytes and then fails on its fail_at-th frame"""
+    
+    def __init__(self, fail_at: int):
+        super().__init__(quality=80)
+        self.fail_at = fail_at
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def encode(self, frame, stream):
+        with self._lock:
+            self.calls += 1
+            failing = self.calls == self.fail_at
+        if failing:
+            stream.write(b"\xff\xd8")
+            raise OSError("disk full")
+        super().encode(frame, stream)
+
+
+def test_failed_encode_fails_the_cut(tmp_path):
+    video = synthetic_video(str(tmp_path / "fixtures"), 160, 90, 6, 10)
+    output = tmp_path / "out"
+    task_manager = TaskManager(kind_limits={})
+    completed, errors = [], []
+    try:
+        task = VideoProcessor(task_manager).cut_video_to_images(
+            video, str(output), 1.0, 0.0, lambda *args: None,
+            lambda count, directory: completed.append(count), errors.append,
+            encoder=FailingEncoder(fail_at=6))
+        assert task.wait(60)
+    finally:
+        task_manager.shutdown()
+    assert errors == ["disk full"]
+    assert not completed
+    files = [name for name in os.listdir(output) if name.endswith(".jpg")]
+    assert len(files) == 5
+    assert all(os.path.getsize(output / name) > 0 for name in files)